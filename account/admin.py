@@ -7,16 +7,22 @@ from .models import (
     PasswordResetCode,
     BankAccountDetails,
     ReferralCommission,
+    UserBalanceAggregate,
+    LedgerEntry,
+    BalanceDriftRecord,
+    Wallet,
 )
+from .balances import balances_from_totals
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = (
         'email', 'full_name', 'level', 'is_verified', 'phone_number',
-        'referral_code', 'referred_by', 'referral_count', 'withdrawable_balance',
-        'created_at',
+        'referral_code', 'referred_by', 'referral_count', 'pending_balance',
+        'withdrawable_balance', 'created_at',
     )
+    list_select_related = ('wallet',)
     search_fields = ('email', 'full_name', 'referral_code', 'referred_by__email')
     list_filter = ('level', 'is_verified', 'status', 'created_at')
     readonly_fields = ('referral_code', 'referral_count', 'created_at', 'last_login')
@@ -24,6 +30,15 @@ class UserProfileAdmin(admin.ModelAdmin):
     def referral_count(self, obj):
         return obj.referrals.count()
 
+    # Balances are derived by the balance engine and never edited by hand.
+    @admin.display(description='Pending balance')
+    def pending_balance(self, obj):
+        return obj.wallet.pending_balance
+
+    @admin.display(description='Withdrawable balance')
+    def withdrawable_balance(self, obj):
+        return obj.wallet.withdrawable_balance
+
 
 @admin.register(ReferralCommission)
 class ReferralCommissionAdmin(admin.ModelAdmin):
@@ -36,6 +51,72 @@ class ReferralCommissionAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+@admin.register(UserBalanceAggregate)
+class UserBalanceAggregateAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'derived_pending_balance', 'derived_withdrawable_balance',
+        'orders_approved_total', 'withdrawals_pending_total', 'referral_commissions_paid_total',
+        'updated_at',
+    )
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = [*UserBalanceAggregate.total_fields(), 'updated_at']
+
+    @admin.display(description='Pending balance')
+    def derived_pending_balance(self, obj):
+        return balances_from_totals(obj)[0]
+
+    @admin.display(description='Withdrawable balance')
+    def derived_withdrawable_balance(self, obj):
+        return balances_from_totals(obj)[1]
+
+
+@admin.register(Wallet)
+class WalletAdmin(admin.ModelAdmin):
+    list_display = ('user', 'pending_balance', 'withdrawable_balance', 'version', 'updated_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = ('user', 'pending_balance', 'withdrawable_balance', 'version', 'updated_at')
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'user', 'account', 'amount', 'running_balance',
+        'source_type', 'source_id', 'memo', 'created_at',
+    )
+    list_filter = ('account', 'source_type')
+    list_select_related = ('user',)
+    search_fields = ('user__email', 'transaction_id')
+
+    # The ledger is append-only.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BalanceDriftRecord)
+class BalanceDriftRecordAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'pending_delta', 'withdrawable_delta',
+        'stored_withdrawable', 'computed_withdrawable', 'detected_at', 'last_detected_at',
+        'times_detected', 'resolved_at',
+    )
+    list_filter = ('resolved_at',)
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    readonly_fields = (
+        'user', 'stored_pending', 'stored_withdrawable', 'computed_pending', 'computed_withdrawable',
+        'ledger_pending', 'ledger_withdrawable', 'pending_delta', 'withdrawable_delta',
+        'recent_records', 'detected_at', 'last_detected_at', 'times_detected',
+    )
+
+
 admin.site.register(Level2Credentials)
 admin.site.register(Level3Credentials)
 admin.site.register(EmailVerificationCode)
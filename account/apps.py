@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountConfig(AppConfig):
     name = 'account'
+
+    def ready(self):
+        # Import signals to connect them
+        import account.signals
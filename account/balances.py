@@ -0,0 +1,844 @@
+"""
+Balance engine for user pending and withdrawable balances.
+
+Every order, withdrawal and referral commission transition applies a signed
+delta to the owner's UserBalanceAggregate row in the same transaction as the
+state change, and the balances stored on the user's Wallet are derived
+from that single row.
+Rebuilding the totals from the source records stays available for
+reconciliation and verification. Each delta is also posted to the
+append-only ledger (account.ledger) with its source record, and rebuilds post
+an adjustment so the ledger always agrees with the aggregate.
+
+Inside a BalanceUnitOfWork (opened per request by
+account.middleware.BalanceUnitOfWorkMiddleware) the stored balances are
+refreshed once per dirty user on commit instead of after every delta.
+
+Every write bumps the aggregate's version and, after commit, the user's
+balance cache generation; get_balance_snapshot() serves reads from the
+snapshot cached under the current generation without locking or writing
+anything.
+"""
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from account.ledger import (
+    get_bulk_ledger_balances,
+    get_ledger_balances,
+    post_transaction,
+    reconcile_ledger,
+)
+from account.models import BalanceDriftRecord, DailyBalanceSnapshot, LedgerEntry, ReferralCommission, UserBalanceAggregate, UserProfile, Wallet
+from account.profile_versions import bump_profile_version
+from gtx.cache_generations import bump_generation, get_generation
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = {'Pending'}
+WITHDRAWABLE_STATUSES = {'Approved', 'Completed'}
+WITHDRAWAL_RESERVED_STATUSES = {'Pending', 'Processing', 'Approved', 'Completed'}
+REFERRAL_COMMISSION_PAID_STATUS = 'Paid'
+
+BALANCE_ENGINE_INCREMENTAL = 'incremental'
+BALANCE_ENGINE_FULL = 'full'
+
+ZERO = Decimal('0.00')
+
+PENDING_FIELDS = [
+    UserBalanceAggregate.ORDER_STATUS_FIELDS[status] for status in sorted(PENDING_STATUSES)
+]
+EARNED_FIELDS = [
+    UserBalanceAggregate.ORDER_STATUS_FIELDS[status] for status in sorted(WITHDRAWABLE_STATUSES)
+] + [UserBalanceAggregate.COMMISSION_PAID_FIELD]
+RESERVED_FIELDS = [
+    UserBalanceAggregate.WITHDRAWAL_STATUS_FIELDS[status] for status in sorted(WITHDRAWAL_RESERVED_STATUSES)
+]
+
+
+def _as_decimal(amount: int | float | Decimal | None) -> Decimal:
+    return Decimal(str(amount or 0))
+
+
+@dataclass(frozen=True)
+class BalanceDelta:
+    """Signed change to one or more UserBalanceAggregate totals."""
+    totals: dict[str, Decimal] = field(default_factory=dict)
+
+    @classmethod
+    def for_field(cls, field_name: str | None, amount) -> 'BalanceDelta':
+        if not field_name:
+            return cls()
+        return cls({field_name: _as_decimal(amount)})
+
+    @property
+    def pending(self) -> Decimal:
+        return sum((self.totals.get(name, ZERO) for name in PENDING_FIELDS), ZERO)
+
+    @property
+    def withdrawable(self) -> Decimal:
+        earned = sum((self.totals.get(name, ZERO) for name in EARNED_FIELDS), ZERO)
+        reserved = sum((self.totals.get(name, ZERO) for name in RESERVED_FIELDS), ZERO)
+        return earned - reserved
+
+    def __bool__(self) -> bool:
+        return any(self.totals.values())
+
+    def __add__(self, other: 'BalanceDelta') -> 'BalanceDelta':
+        totals = dict(self.totals)
+        for name, amount in other.totals.items():
+            totals[name] = totals.get(name, ZERO) + amount
+        return BalanceDelta({name: amount for name, amount in totals.items() if amount})
+
+    def __neg__(self) -> 'BalanceDelta':
+        return BalanceDelta({name: -amount for name, amount in self.totals.items()})
+
+    def __sub__(self, other: 'BalanceDelta') -> 'BalanceDelta':
+        return self + (-other)
+
+
+class BalanceWriteConflict(Exception):
+    """Stored balances could not be written within the retry budget."""
+
+
+@dataclass(frozen=True)
+class BalanceCheck:
+    """Result of comparing stored and ledger balances against a full recomputation."""
+    user_id: int
+    stored_pending: Decimal
+    stored_withdrawable: Decimal
+    computed_pending: Decimal
+    computed_withdrawable: Decimal
+    ledger_pending: Decimal
+    ledger_withdrawable: Decimal
+
+    @property
+    def matches(self) -> bool:
+        return (
+            self.stored_pending == self.computed_pending == self.ledger_pending
+            and self.stored_withdrawable == self.computed_withdrawable == self.ledger_withdrawable
+        )
+
+
+BALANCE_CACHE_GENERATION_KEY = 'account:balance:{user_id}:generation'
+BALANCE_CACHE_KEY = 'account:balance:{user_id}:{generation}'
+
+LEDGER_SOURCE_TYPES = {
+    'order.giftcardorder': 'order',
+    'withdrawal.withdrawal': 'withdrawal',
+    'account.referralcommission': 'referral_commission',
+}
+
+
+def get_balance_engine_mode() -> str:
+    return getattr(settings, 'BALANCE_ENGINE_MODE', BALANCE_ENGINE_INCREMENTAL)
+
+
+def order_contribution(status: str | None, amount) -> BalanceDelta:
+    """Aggregate contribution of a single order in the given status."""
+    return BalanceDelta.for_field(UserBalanceAggregate.ORDER_STATUS_FIELDS.get(status), amount)
+
+
+def withdrawal_contribution(status: str | None, amount) -> BalanceDelta:
+    """Aggregate contribution of a single withdrawal in the given status."""
+    return BalanceDelta.for_field(UserBalanceAggregate.WITHDRAWAL_STATUS_FIELDS.get(status), amount)
+
+
+def commission_contribution(status: str | None, amount) -> BalanceDelta:
+    """Aggregate contribution of a single referral commission in the given status."""
+    if status != REFERRAL_COMMISSION_PAID_STATUS:
+        return BalanceDelta()
+    return BalanceDelta.for_field(UserBalanceAggregate.COMMISSION_PAID_FIELD, amount)
+
+
+def balances_from_totals(totals) -> tuple[Decimal, Decimal]:
+    """
+    Derive (pending_balance, withdrawable_balance) from aggregate totals.
+
+    Accepts either a UserBalanceAggregate instance or a mapping of field
+    names to totals.
+    """
+    def total(name):
+        if isinstance(totals, dict):
+            return _as_decimal(totals.get(name))
+        return _as_decimal(getattr(totals, name))
+
+    pending_balance = sum((total(name) for name in PENDING_FIELDS), ZERO)
+    earned = sum((total(name) for name in EARNED_FIELDS), ZERO)
+    # Reserve funds for all active or completed withdrawals.
+    # This ensures:
+    # - Pending withdrawals are deducted immediately
+    # - Approved/Completed withdrawals stay deducted
+    # - Rejected/Cancelled/Failed withdrawals are returned automatically
+    reserved = sum((total(name) for name in RESERVED_FIELDS), ZERO)
+    return pending_balance, max(ZERO, earned - reserved)
+
+
+def compute_user_totals(user_id: int) -> dict[str, Decimal]:
+    """
+    Compute aggregate totals from the source records with one grouped query
+    per source table. Nothing is locked or written.
+    """
+    return compute_bulk_user_totals([user_id])[user_id]
+
+
+def compute_bulk_user_totals(user_ids) -> dict[int, dict[str, Decimal]]:
+    """
+    Compute aggregate totals for many users at once with one
+    ``GROUP BY user_id, status`` query per source table.
+    """
+    from order.models import GiftCardOrder
+    from withdrawal.models import Withdrawal
+
+    user_ids = list(user_ids)
+    totals = {
+        user_id: {name: ZERO for name in UserBalanceAggregate.total_fields()}
+        for user_id in user_ids
+    }
+
+    order_rows = GiftCardOrder.objects.filter(user_id__in=user_ids).values(
+        'user_id', 'status',
+    ).annotate(total=Sum('amount')).order_by()
+    for row in order_rows:
+        name = UserBalanceAggregate.ORDER_STATUS_FIELDS.get(row['status'])
+        if name:
+            totals[row['user_id']][name] = _as_decimal(row['total'])
+
+    withdrawal_rows = Withdrawal.objects.filter(user_id__in=user_ids).values(
+        'user_id', 'status',
+    ).annotate(total=Sum('amount')).order_by()
+    for row in withdrawal_rows:
+        name = UserBalanceAggregate.WITHDRAWAL_STATUS_FIELDS.get(row['status'])
+        if name:
+            totals[row['user_id']][name] = _as_decimal(row['total'])
+
+    commission_rows = ReferralCommission.objects.filter(
+        referrer_id__in=user_ids,
+        status=REFERRAL_COMMISSION_PAID_STATUS,
+    ).values('referrer_id').annotate(total=Sum('amount')).order_by()
+    for row in commission_rows:
+        totals[row['referrer_id']][UserBalanceAggregate.COMMISSION_PAID_FIELD] = _as_decimal(row['total'])
+
+    return totals
+
+
+def compute_user_balances(user_id: int) -> tuple[Decimal, Decimal]:
+    """
+    Compute balances from scratch from the source records without locking or
+    writing anything.
+
+    Returns:
+        Tuple of (pending_balance, withdrawable_balance)
+    """
+    return balances_from_totals(compute_user_totals(user_id))
+
+
+class BalanceUnitOfWork:
+    """
+    Collects users whose stored balances need refreshing and refreshes each
+    of them exactly once when the surrounding transaction commits.
+
+    Aggregate totals are still updated immediately; only the derived
+    balances stored on the user's Wallet are deferred. Code that needs exact
+    balances mid-transaction should use get_user_balances().
+    """
+
+    def __init__(self):
+        self.dirty: set[int] = set()
+        self.requested = 0
+        self.recalculated = 0
+        self._token = None
+
+    @property
+    def saved(self) -> int:
+        """Number of recalculations avoided by coalescing."""
+        return self.requested - self.recalculated - len(self.dirty)
+
+    @classmethod
+    def current(cls) -> 'BalanceUnitOfWork | None':
+        return _current_unit_of_work.get()
+
+    def mark(self, user_id: int) -> None:
+        self.requested += 1
+        self.dirty.add(user_id)
+
+    def discard(self, user_id: int) -> None:
+        if user_id in self.dirty:
+            self.dirty.discard(user_id)
+            self.requested -= 1
+
+    def flush(self) -> None:
+        user_ids = sorted(self.dirty)
+        self.dirty.clear()
+        for user_id in user_ids:
+            if UserProfile.objects.filter(pk=user_id).exists():
+                _recalculate(user_id)
+            self.recalculated += 1
+        if self.requested:
+            logger.info(
+                "Balance unit of work refreshed %s user(s) for %s request(s); %s recalculation(s) saved",
+                self.recalculated, self.requested, self.saved,
+            )
+
+    def __enter__(self) -> 'BalanceUnitOfWork':
+        outer = _current_unit_of_work.get()
+        if outer is not None:
+            # Nested scopes join the outermost unit of work.
+            return outer
+        self._token = _current_unit_of_work.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        _current_unit_of_work.reset(self._token)
+        self._token = None
+        if self.dirty:
+            # Runs immediately when no transaction is open.
+            transaction.on_commit(self.flush)
+
+
+_current_unit_of_work: ContextVar[BalanceUnitOfWork | None] = ContextVar('balance_unit_of_work', default=None)
+
+
+def _store_balances(user_id: int, aggregate: UserBalanceAggregate) -> tuple[Decimal, Decimal]:
+    """
+    Write the derived balances to the user's Wallet with a compare-and-swap
+    on its version instead of a row lock, retrying a bounded number of times.
+    """
+    pending_balance, withdrawable_balance = balances_from_totals(aggregate)
+    max_retries = getattr(settings, 'BALANCE_CAS_MAX_RETRIES', 5)
+
+    for _ in range(max_retries):
+        version = Wallet.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+        if version is None:
+            if not UserProfile.objects.filter(pk=user_id).exists():
+                # The user is gone; there is nothing to store.
+                return pending_balance, withdrawable_balance
+            Wallet.objects.get_or_create(user_id=user_id)
+            continue
+        updated = Wallet.objects.filter(user_id=user_id, version=version).update(
+            pending_balance=pending_balance,
+            withdrawable_balance=withdrawable_balance,
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            return pending_balance, withdrawable_balance
+
+    raise BalanceWriteConflict(
+        f"Could not store balances for user {user_id} after {max_retries} attempts."
+    )
+
+
+def _lock_aggregate(user_id: int) -> UserBalanceAggregate:
+    """
+    Lock the user's aggregate row, creating an empty one first if needed.
+    Balance writers serialize on this row, never on UserProfile.
+    """
+    if not UserProfile.objects.filter(pk=user_id).exists():
+        raise UserProfile.DoesNotExist(f"User {user_id} does not exist.")
+    UserBalanceAggregate.objects.get_or_create(user_id=user_id)
+    return UserBalanceAggregate.objects.select_for_update().get(user_id=user_id)
+
+
+def rebuild_balance_aggregate(user: UserProfile | int) -> UserBalanceAggregate:
+    """
+    Rebuild a user's aggregate totals from the source records. An aggregate
+    that already holds those totals is left as it is, so a rebuild that
+    finds nothing to fix does not invalidate the cached balance or profile.
+    """
+    user_id = getattr(user, 'pk', user)
+
+    with transaction.atomic():
+        aggregate = _lock_aggregate(user_id)
+        totals = compute_user_totals(user_id)
+        if any(getattr(aggregate, name) != amount for name, amount in totals.items()):
+            for name, amount in totals.items():
+                setattr(aggregate, name, amount)
+            aggregate.version += 1
+            aggregate.save()
+            invalidate_balance_cache(user_id)
+        raw = BalanceDelta(totals)
+        reconcile_ledger(user_id, raw.pending, raw.withdrawable)
+    return aggregate
+
+
+def reconcile_user_balances(user: UserProfile | int) -> tuple[Decimal, Decimal]:
+    """
+    Rebuild the aggregate from source records and store the derived balances.
+    This is the verification/reconciliation path.
+
+    Returns:
+        Tuple of (pending_balance, withdrawable_balance)
+    """
+    user_id = getattr(user, 'pk', user)
+
+    with transaction.atomic():
+        aggregate = rebuild_balance_aggregate(user_id)
+        return _store_balances(user_id, aggregate)
+
+
+def _recalculate(user_id: int) -> tuple[Decimal, Decimal]:
+    if get_balance_engine_mode() != BALANCE_ENGINE_INCREMENTAL:
+        return reconcile_user_balances(user_id)
+
+    with transaction.atomic():
+        aggregate = UserBalanceAggregate.objects.select_for_update().filter(user_id=user_id).first()
+        if aggregate is None:
+            aggregate = rebuild_balance_aggregate(user_id)
+        return _store_balances(user_id, aggregate)
+
+
+def recalculate_user_balances(user: UserProfile | int) -> tuple[Decimal, Decimal]:
+    """
+    Store balances derived from the user's aggregate row. The aggregate is
+    rebuilt from source records if it does not exist yet.
+
+    This always runs immediately; a pending refresh for the same user in the
+    current unit of work is dropped because it would be redundant.
+
+    Returns:
+        Tuple of (pending_balance, withdrawable_balance)
+    """
+    user_id = getattr(user, 'pk', user)
+
+    unit_of_work = BalanceUnitOfWork.current()
+    if unit_of_work is not None:
+        unit_of_work.discard(user_id)
+    return _recalculate(user_id)
+
+
+def request_balance_recalculation(user: UserProfile | int) -> None:
+    """
+    Refresh a user's stored balances, deferring to the active unit of work
+    so repeated requests for the same user collapse into one refresh.
+    """
+    user_id = getattr(user, 'pk', user)
+
+    unit_of_work = BalanceUnitOfWork.current()
+    if unit_of_work is None:
+        _recalculate(user_id)
+    else:
+        unit_of_work.mark(user_id)
+
+
+def get_user_balances(user: UserProfile | int, for_update: bool = False) -> tuple[Decimal, Decimal]:
+    """
+    Return (pending_balance, withdrawable_balance) derived from the user's
+    aggregate row, which is always current inside the transaction. With
+    for_update the row stays locked until the caller's transaction ends.
+    """
+    user_id = getattr(user, 'pk', user)
+
+    queryset = UserBalanceAggregate.objects.filter(user_id=user_id)
+    if for_update:
+        queryset = queryset.select_for_update()
+    aggregate = queryset.first()
+    if aggregate is None:
+        aggregate = rebuild_balance_aggregate(user_id)
+        if for_update:
+            aggregate = UserBalanceAggregate.objects.select_for_update().get(user_id=user_id)
+    return balances_from_totals(aggregate)
+
+
+def is_owner_deletion(origin, user_id: int) -> bool:
+    """
+    True if ``origin`` (the ``origin`` of a post_delete signal) is the
+    deletion of the user who owns the balance, so no ledger entry or
+    aggregate row should be written for them.
+    """
+    if isinstance(origin, UserProfile):
+        return origin.pk == user_id
+    if isinstance(origin, QuerySet) and issubclass(origin.model, UserProfile):
+        return origin.filter(pk=user_id).exists()
+    return False
+
+
+def post_ledger_delta(user_id: int, delta: BalanceDelta, source=None) -> None:
+    """Post a delta to the ledger, attributed to the source record if given."""
+    source_type, source_id, memo = 'adjustment', None, ''
+    if source is not None:
+        source_type = LEDGER_SOURCE_TYPES[source._meta.label_lower]
+        source_id = source.pk
+        memo = f"{source._meta.verbose_name.capitalize()} #{source.pk} {getattr(source, 'status', '')}".strip()
+    post_transaction(
+        user_id,
+        {
+            LedgerEntry.ACCOUNT_PENDING: delta.pending,
+            LedgerEntry.ACCOUNT_WITHDRAWABLE: delta.withdrawable,
+        },
+        source_type=source_type,
+        source_id=source_id,
+        memo=memo,
+    )
+
+
+def apply_balance_delta(
+    user_id: int,
+    delta: BalanceDelta,
+    rebuild_missing: bool = True,
+    source=None,
+) -> None:
+    """
+    Apply a signed delta to a user's aggregate totals inside the caller's
+    transaction and refresh the derived balances (deferred when a unit of
+    work is active).
+
+    The cost is a single UPDATE plus a primary-key read, independent of how
+    many orders or withdrawals the user has. If the user has no aggregate
+    row yet it is rebuilt from the source records, which already include the
+    change being applied. Deletions pass rebuild_missing=False so cascading
+    user deletes do not recreate the row.
+
+    The delta is posted to the ledger against ``source`` (the order,
+    withdrawal or commission that changed) in the same transaction.
+    """
+    if not delta:
+        return
+
+    if get_balance_engine_mode() != BALANCE_ENGINE_INCREMENTAL:
+        if UserProfile.objects.filter(pk=user_id).exists():
+            with transaction.atomic():
+                _lock_aggregate(user_id)
+                post_ledger_delta(user_id, delta, source)
+                reconcile_user_balances(user_id)
+        return
+
+    unit_of_work = BalanceUnitOfWork.current()
+
+    with transaction.atomic():
+        updated = UserBalanceAggregate.objects.filter(user_id=user_id).update(
+            version=F('version') + 1,
+            updated_at=timezone.now(),
+            **{name: F(name) + amount for name, amount in delta.totals.items()},
+        )
+        if updated:
+            # The UPDATE holds the aggregate row lock, which serializes
+            # running balances for this user.
+            post_ledger_delta(user_id, delta, source)
+        else:
+            if not rebuild_missing or not UserProfile.objects.filter(pk=user_id).exists():
+                return
+            # Rebuilding reconciles the ledger, including this change.
+            rebuild_balance_aggregate(user_id)
+        invalidate_balance_cache(user_id)
+
+        if unit_of_work is not None:
+            unit_of_work.mark(user_id)
+        else:
+            _store_balances(user_id, UserBalanceAggregate.objects.get(user_id=user_id))
+
+
+def verify_user_balances(user: UserProfile | int) -> BalanceCheck:
+    """Compare stored balances with a fresh computation from source records."""
+    user_id = getattr(user, 'pk', user)
+    stored_pending, stored_withdrawable = Wallet.objects.filter(user_id=user_id).values_list(
+        'pending_balance', 'withdrawable_balance',
+    ).first() or (ZERO, ZERO)
+    computed_pending, computed_withdrawable = compute_user_balances(user_id)
+    ledger_pending, ledger_withdrawable = get_ledger_balances(user_id)
+    return BalanceCheck(
+        user_id=user_id,
+        stored_pending=stored_pending,
+        stored_withdrawable=stored_withdrawable,
+        computed_pending=computed_pending,
+        computed_withdrawable=computed_withdrawable,
+        ledger_pending=ledger_pending,
+        ledger_withdrawable=ledger_withdrawable,
+    )
+
+
+def find_drift_candidates(user_ids) -> list[int]:
+    """
+    Read-only bulk comparison of stored balances against balances computed
+    from source records and against the ledger's running balances. Returns
+    the ids of users for whom either disagrees; callers should confirm each
+    one, since a write may have landed in between.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+
+    totals_by_user = compute_bulk_user_totals(user_ids)
+    ledger_by_user = get_bulk_ledger_balances(user_ids)
+    stored = {
+        user_id: (pending_balance, withdrawable_balance)
+        for user_id, pending_balance, withdrawable_balance in Wallet.objects.filter(
+            user_id__in=user_ids,
+        ).values_list('user_id', 'pending_balance', 'withdrawable_balance')
+    }
+
+    def ledger_balances(user_id):
+        # Clamped like get_ledger_balances and the stored withdrawable balance.
+        accounts = ledger_by_user.get(user_id, {})
+        return (
+            _as_decimal(accounts.get(LedgerEntry.ACCOUNT_PENDING)),
+            max(ZERO, _as_decimal(accounts.get(LedgerEntry.ACCOUNT_WITHDRAWABLE))),
+        )
+
+    candidates = []
+    for user_id in sorted(user_ids):
+        balances = stored.get(user_id, (ZERO, ZERO))
+        if balances != balances_from_totals(totals_by_user[user_id]) or balances != ledger_balances(user_id):
+            candidates.append(user_id)
+    return candidates
+
+
+def recent_contributing_records(user_id: int, limit: int = 5) -> dict[str, list[dict]]:
+    """Latest orders, withdrawals and commissions behind a user's balances."""
+    from order.models import GiftCardOrder
+    from withdrawal.models import Withdrawal
+
+    def rows(queryset):
+        return [
+            {'id': row['id'], 'status': row['status'], 'amount': str(row['amount'])}
+            for row in queryset.order_by('-id').values('id', 'status', 'amount')[:limit]
+        ]
+
+    return {
+        'orders': rows(GiftCardOrder.objects.filter(user_id=user_id)),
+        'withdrawals': rows(Withdrawal.objects.filter(user_id=user_id)),
+        'referral_commissions': rows(ReferralCommission.objects.filter(referrer_id=user_id)),
+    }
+
+
+def record_balance_drift(check: BalanceCheck) -> tuple[BalanceDriftRecord, bool]:
+    """
+    Persist a failed BalanceCheck with the records most likely behind it.
+
+    A drift that is still open with the same amounts updates its existing
+    record instead of adding another, so a drift left unresolved across
+    detector runs stays one record. Returns ``(record, created)``.
+    """
+    amounts = {
+        'stored_pending': check.stored_pending,
+        'stored_withdrawable': check.stored_withdrawable,
+        'computed_pending': check.computed_pending,
+        'computed_withdrawable': check.computed_withdrawable,
+    }
+    now = timezone.now()
+    recent_records = recent_contributing_records(check.user_id)
+    with transaction.atomic():
+        open_record = (
+            BalanceDriftRecord.objects.select_for_update()
+            .filter(user_id=check.user_id, resolved_at__isnull=True)
+            .order_by('-detected_at', '-id')
+            .first()
+        )
+        if open_record is not None and all(
+            getattr(open_record, name) == value for name, value in amounts.items()
+        ):
+            open_record.ledger_pending = check.ledger_pending
+            open_record.ledger_withdrawable = check.ledger_withdrawable
+            open_record.recent_records = recent_records
+            open_record.last_detected_at = now
+            open_record.times_detected += 1
+            open_record.save(update_fields=[
+                'ledger_pending', 'ledger_withdrawable', 'recent_records', 'last_detected_at', 'times_detected',
+            ])
+            return open_record, False
+
+        record = BalanceDriftRecord.objects.create(
+            user_id=check.user_id,
+            **amounts,
+            ledger_pending=check.ledger_pending,
+            ledger_withdrawable=check.ledger_withdrawable,
+            pending_delta=check.stored_pending - check.computed_pending,
+            withdrawable_delta=check.stored_withdrawable - check.computed_withdrawable,
+            recent_records=recent_records,
+            last_detected_at=now,
+        )
+        return record, True
+
+
+SNAPSHOT_FIELDS = ('pending_balance', 'withdrawable_balance', 'lifetime_approved', 'lifetime_withdrawn')
+
+
+def end_of_day(day: date) -> datetime:
+    """The first instant after ``day`` in the current time zone."""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def write_daily_balance_snapshots(user_ids, snapshot_date: date) -> int:
+    """
+    Write DailyBalanceSnapshot rows for ``snapshot_date`` as they stood at
+    the end of that day, so late runs and backfills record that day rather
+    than the current balances. Users whose values are unchanged since their
+    previous snapshot (or who never had a balance) are skipped.
+
+    Balances are the ledger's running balances at the cutoff. The lifetime
+    totals come from the source records, like the balance engine's, so
+    history from before the ledger is included: lifetime approved counts
+    approved and completed orders created by then (orders keep no approval
+    time), and lifetime withdrawn counts approved and completed withdrawals
+    processed by then (created, for withdrawals without a processing time).
+
+    Returns the number of rows written.
+    """
+    from order.models import GiftCardOrder
+    from withdrawal.models import Withdrawal
+
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+
+    cutoff = end_of_day(snapshot_date)
+    ledger_balances = get_bulk_ledger_balances(user_ids, cutoff)
+    approved = {
+        row['user_id']: row['total']
+        for row in GiftCardOrder.objects.filter(
+            user_id__in=user_ids, status__in=['Approved', 'Completed'], created_at__lt=cutoff,
+        )
+        .values('user_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    }
+    withdrawn = {
+        row['user_id']: row['total']
+        for row in Withdrawal.objects.filter(user_id__in=user_ids, status__in=['Approved', 'Completed'])
+        .annotate(done_at=Coalesce('processed_at', 'created_at'))
+        .filter(done_at__lt=cutoff)
+        .values('user_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    }
+    previous_date = DailyBalanceSnapshot.objects.filter(
+        user_id=OuterRef('user_id'),
+        date__lt=snapshot_date,
+    ).order_by('-date').values('date')[:1]
+    previous = {
+        row['user_id']: tuple(row[name] for name in SNAPSHOT_FIELDS)
+        for row in DailyBalanceSnapshot.objects.filter(
+            user_id__in=user_ids,
+            date=Subquery(previous_date),
+        ).values('user_id', *SNAPSHOT_FIELDS)
+    }
+
+    snapshots = []
+    for user_id in user_ids:
+        accounts = ledger_balances.get(user_id, {})
+        values = (
+            _as_decimal(accounts.get(LedgerEntry.ACCOUNT_PENDING)),
+            max(ZERO, _as_decimal(accounts.get(LedgerEntry.ACCOUNT_WITHDRAWABLE))),
+            _as_decimal(approved.get(user_id)),
+            _as_decimal(withdrawn.get(user_id)),
+        )
+        if values == previous.get(user_id, (ZERO,) * len(SNAPSHOT_FIELDS)):
+            continue
+        snapshots.append(DailyBalanceSnapshot(
+            user_id=user_id,
+            date=snapshot_date,
+            **dict(zip(SNAPSHOT_FIELDS, values)),
+        ))
+
+    DailyBalanceSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=list(SNAPSHOT_FIELDS),
+    )
+    return len(snapshots)
+
+
+def get_balance_curve(user: UserProfile | int, start: date, end: date) -> list[dict]:
+    """
+    One point per day in [start, end] from the user's daily snapshots,
+    carrying the latest snapshot forward over days without a row.
+    """
+    user_id = getattr(user, 'pk', user)
+    snapshots = DailyBalanceSnapshot.objects.filter(user_id=user_id)
+
+    seed = snapshots.filter(date__lt=start).order_by('-date').values(*SNAPSHOT_FIELDS).first()
+    current = seed or {name: ZERO for name in SNAPSHOT_FIELDS}
+    by_date = {
+        row['date']: row
+        for row in snapshots.filter(date__range=(start, end)).values('date', *SNAPSHOT_FIELDS)
+    }
+
+    points = []
+    day = start
+    while day <= end:
+        if day in by_date:
+            current = by_date[day]
+        points.append({'date': day, **{name: current[name] for name in SNAPSHOT_FIELDS}})
+        day += timedelta(days=1)
+    return points
+
+
+def _balance_generation_key(user_id: int) -> str:
+    return BALANCE_CACHE_GENERATION_KEY.format(user_id=user_id)
+
+
+def _drop_cached_balance(user_id: int) -> None:
+    # Snapshots cached under the old generation are never read again, even
+    # one a reader that loaded the old row stores after this point.
+    bump_generation(_balance_generation_key(user_id))
+    # The profile shows the balances too.
+    bump_profile_version(user_id)
+
+
+def invalidate_balance_cache(user: UserProfile | int) -> None:
+    """Drop the user's cached balance snapshot once the current transaction commits."""
+    user_id = getattr(user, 'pk', user)
+    transaction.on_commit(lambda: _drop_cached_balance(user_id))
+
+
+def balance_snapshot(aggregate: UserBalanceAggregate) -> dict:
+    """Read-side view of one aggregate row, as served by the balance endpoint."""
+    pending_balance, withdrawable_balance = balances_from_totals(aggregate)
+    return {
+        'balance_version': aggregate.version,
+        'pending_balance': pending_balance,
+        'withdrawable_balance': withdrawable_balance,
+        'total_balance': pending_balance + withdrawable_balance,
+        'total_earned': aggregate.orders_approved_total + aggregate.orders_completed_total,
+        'total_withdrawn': aggregate.withdrawals_approved_total + aggregate.withdrawals_completed_total,
+        'referral_earnings': aggregate.referral_commissions_paid_total,
+    }
+
+
+def get_balance_snapshot(user: UserProfile | int) -> dict:
+    """
+    Return the user's balance snapshot from the cache, filling it from the
+    aggregate row on a miss. Nothing is locked or written to the database; a
+    cache outage only costs the single-row read. A user without an aggregate
+    row gets totals computed from the source records, uncached, and the row
+    is left for the next balance write or rebuild to create.
+    """
+    user_id = getattr(user, 'pk', user)
+    # Read before the row, so a write committed in between moves the
+    # generation past the key this snapshot is stored under.
+    generation = get_generation(_balance_generation_key(user_id))
+    key = BALANCE_CACHE_KEY.format(user_id=user_id, generation=generation)
+
+    snapshot = None
+    if generation is not None:
+        try:
+            snapshot = cache.get(key)
+        except Exception as exc:
+            logger.warning("Could not read cached balance for user %s: %s", user_id, exc)
+    if snapshot is not None:
+        return snapshot
+
+    aggregate = UserBalanceAggregate.objects.filter(user_id=user_id).first()
+    if aggregate is None:
+        return balance_snapshot(UserBalanceAggregate(user_id=user_id, **compute_user_totals(user_id)))
+    snapshot = balance_snapshot(aggregate)
+
+    if generation is not None:
+        try:
+            cache.set(key, snapshot, settings.BALANCE_CACHE_TIMEOUT)
+        except Exception as exc:
+            logger.warning("Could not cache balance for user %s: %s", user_id, exc)
+    return snapshot
@@ -0,0 +1,137 @@
+"""
+Append-only double-entry ledger behind user balances.
+
+The balance engine posts every balance change here as a balanced set of
+legs: the signed changes to the user's pending and withdrawable accounts,
+offset by the platform account. Each leg stores the account's running
+balance, so point-in-time balances and statements are indexed range reads
+over (user, account, id) instead of replays of order and withdrawal history.
+
+Withdrawable running balances are not clamped; the stored withdrawable
+balance is max(0, running balance), exactly like the aggregate totals.
+"""
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Max, QuerySet
+
+from account.models import LedgerEntry, UserProfile
+
+ZERO = Decimal('0.00')
+
+USER_ACCOUNTS = (LedgerEntry.ACCOUNT_PENDING, LedgerEntry.ACCOUNT_WITHDRAWABLE)
+
+
+def _running_balance(user_id: int, account: str, at: datetime | None = None) -> Decimal:
+    entries = LedgerEntry.objects.filter(user_id=user_id, account=account)
+    if at is not None:
+        entries = entries.filter(created_at__lte=at)
+    latest = entries.order_by('-id').values_list('running_balance', flat=True).first()
+    return latest if latest is not None else ZERO
+
+
+def post_transaction(
+    user_id: int,
+    changes: dict[str, Decimal],
+    source_type: str,
+    source_id: int | None = None,
+    memo: str = '',
+) -> list[LedgerEntry]:
+    """
+    Post one balanced transaction for a user.
+
+    ``changes`` maps user accounts to signed amounts; the platform leg that
+    balances them is added here. Callers must hold the user's aggregate row
+    lock so running balances are computed against the latest entries.
+    """
+    legs = {account: amount for account, amount in changes.items() if amount}
+    if not legs:
+        return []
+    offset = -sum(legs.values(), ZERO)
+    if offset:
+        legs[LedgerEntry.ACCOUNT_PLATFORM] = offset
+
+    transaction_id = uuid.uuid4()
+    entries = [
+        LedgerEntry(
+            user_id=user_id,
+            transaction_id=transaction_id,
+            account=account,
+            amount=amount,
+            running_balance=_running_balance(user_id, account) + amount,
+            source_type=source_type,
+            source_id=source_id,
+            memo=memo[:255],
+        )
+        for account, amount in legs.items()
+    ]
+    return LedgerEntry.objects.bulk_create(entries)
+
+
+def reconcile_ledger(user_id: int, pending: Decimal, withdrawable: Decimal, source_type: str = 'adjustment') -> list[LedgerEntry]:
+    """
+    Post an adjustment so the ledger's running balances equal the given
+    (unclamped) pending and withdrawable balances.
+    """
+    return post_transaction(
+        user_id,
+        {
+            LedgerEntry.ACCOUNT_PENDING: pending - _running_balance(user_id, LedgerEntry.ACCOUNT_PENDING),
+            LedgerEntry.ACCOUNT_WITHDRAWABLE: (
+                withdrawable - _running_balance(user_id, LedgerEntry.ACCOUNT_WITHDRAWABLE)
+            ),
+        },
+        source_type=source_type,
+        memo='Balances reconciled from source records',
+    )
+
+
+def get_ledger_balances(user: UserProfile | int, at: datetime | None = None) -> tuple[Decimal, Decimal]:
+    """
+    Return (pending_balance, withdrawable_balance) as of ``at`` (default: now),
+    read from the latest ledger entry per account.
+    """
+    user_id = getattr(user, 'pk', user)
+    pending = _running_balance(user_id, LedgerEntry.ACCOUNT_PENDING, at)
+    withdrawable = _running_balance(user_id, LedgerEntry.ACCOUNT_WITHDRAWABLE, at)
+    return pending, max(ZERO, withdrawable)
+
+
+def get_bulk_ledger_balances(user_ids, before: datetime | None = None) -> dict[int, dict[str, Decimal]]:
+    """
+    Unclamped running balances of the users' pending and withdrawable
+    accounts from the entries created before ``before`` (default: all of
+    them), with one grouped query. Users without entries are omitted.
+    """
+    entries = LedgerEntry.objects.filter(user_id__in=user_ids, account__in=USER_ACCOUNTS)
+    if before is not None:
+        entries = entries.filter(created_at__lt=before)
+    latest_ids = (
+        entries
+        .values('user_id', 'account')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    balances: dict[int, dict[str, Decimal]] = {}
+    for user_id, account, running_balance in LedgerEntry.objects.filter(id__in=latest_ids).values_list(
+        'user_id', 'account', 'running_balance',
+    ):
+        balances.setdefault(user_id, {})[account] = running_balance
+    return balances
+
+
+def get_ledger_statement(
+    user: UserProfile | int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    accounts=USER_ACCOUNTS,
+) -> QuerySet:
+    """Ledger entries for the user's accounts in [start, end], oldest first."""
+    user_id = getattr(user, 'pk', user)
+    entries = LedgerEntry.objects.filter(user_id=user_id, account__in=accounts)
+    if start is not None:
+        entries = entries.filter(created_at__gte=start)
+    if end is not None:
+        entries = entries.filter(created_at__lte=end)
+    return entries.order_by('id')
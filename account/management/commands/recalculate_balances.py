@@ -2,22 +2,139 @@
 Management command to recalculate all user balances based on their order history.
 This is useful for data consistency checks or migration from legacy systems.
 
+Balances are computed exactly like the balance engine
+(account.balances.compute_user_balances), including paid referral
+commissions.
+
 Usage:
     python manage.py recalculate_balances
     python manage.py recalculate_balances --user-id 123  # Single user
     python manage.py recalculate_balances --dry-run      # Preview changes
+    python manage.py recalculate_balances --bulk         # Set-based, chunked
+    python manage.py recalculate_balances --bulk --chunk-size 2000 --workers 4
 """
 
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import connections, transaction
 from django.db.models import Sum
 from decimal import Decimal
-from order.models import GiftCardOrder
-from withdrawal.models import Withdrawal
+
+from account.balances import (
+    BalanceDelta,
+    balances_from_totals,
+    compute_bulk_user_totals,
+    compute_user_balances,
+    invalidate_balance_cache,
+    reconcile_user_balances,
+)
+from account.ledger import reconcile_ledger
+from account.models import UserBalanceAggregate, Wallet
 
 User = get_user_model()
 
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def reconcile_chunk(user_ids: list[int], dry_run: bool) -> list[dict]:
+    """
+    Recompute balances for one chunk of users with grouped queries and write
+    the changed rows with bulk updates in a single short transaction. A dry
+    run reads plain rows and takes no locks.
+
+    Returns the list of balance changes found in the chunk.
+    """
+    changes = []
+
+    with transaction.atomic():
+        # Balance writers serialize on the aggregate rows, not on UserProfile.
+        # A preview writes nothing, so it must not hold them up.
+        aggregates = UserBalanceAggregate.objects.filter(user_id__in=user_ids)
+        if not dry_run:
+            aggregates = aggregates.select_for_update()
+        existing = {aggregate.user_id: aggregate for aggregate in aggregates}
+        # Totals are read under the locks, so a delta committed before this
+        # point is included rather than overwritten with stale totals.
+        totals_by_user = compute_bulk_user_totals(user_ids)
+        users = list(User.objects.filter(pk__in=user_ids).only('pk', 'email').order_by('pk'))
+        wallets = {wallet.user_id: wallet for wallet in Wallet.objects.filter(user_id__in=user_ids)}
+        changed_wallets = []
+        for user in users:
+            pending_balance, withdrawable_balance = balances_from_totals(totals_by_user[user.pk])
+            wallet = wallets.get(user.pk)
+            missing = wallet is None
+            if missing:
+                wallet = Wallet(user_id=user.pk)
+            changed = (
+                pending_balance != wallet.pending_balance
+                or withdrawable_balance != wallet.withdrawable_balance
+            )
+
+            if changed:
+                changes.append({
+                    'user_id': user.pk,
+                    'email': user.email,
+                    'old_pending': wallet.pending_balance,
+                    'new_pending': pending_balance,
+                    'old_withdrawable': wallet.withdrawable_balance,
+                    'new_withdrawable': withdrawable_balance,
+                })
+                wallet.pending_balance = pending_balance
+                wallet.withdrawable_balance = withdrawable_balance
+                wallet.version += 1
+            # Missing wallets are created even when their balances are zero.
+            if changed or missing:
+                changed_wallets.append(wallet)
+
+        if not dry_run:
+            Wallet.objects.bulk_create(
+                changed_wallets,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=['pending_balance', 'withdrawable_balance', 'version', 'updated_at'],
+            )
+
+            stale = []
+            for user in users:
+                totals = totals_by_user[user.pk]
+                current = existing.get(user.pk)
+                if current is not None and all(
+                    getattr(current, name) == amount for name, amount in totals.items()
+                ):
+                    continue
+                version = current.version + 1 if current is not None else 1
+                stale.append(UserBalanceAggregate(user_id=user.pk, version=version, **totals))
+
+            UserBalanceAggregate.objects.bulk_create(
+                stale,
+                update_conflicts=True,
+                unique_fields=['user'],
+                update_fields=[*UserBalanceAggregate.total_fields(), 'version', 'updated_at'],
+            )
+            for aggregate in stale:
+                raw = BalanceDelta(totals_by_user[aggregate.user_id])
+                reconcile_ledger(aggregate.user_id, raw.pending, raw.withdrawable)
+                invalidate_balance_cache(aggregate.user_id)
+
+    return changes
+
+
+def iter_user_id_chunks(chunk_size: int):
+    """Yield lists of user ids in primary key order without OFFSET scans."""
+    last_id = 0
+    while True:
+        chunk = list(
+            User.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
 
 class Command(BaseCommand):
     help = 'Recalculate all user balances based on their order history'
@@ -33,12 +150,33 @@ class Command(BaseCommand):
             action='store_true',
             help='Preview changes without saving',
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Compute all users with grouped queries and commit per chunk',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Users per chunk in bulk mode (default: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Process chunks in parallel with this many worker processes (bulk mode only)',
+        )
 
-    @transaction.atomic
     def handle(self, *args, **options):
         user_id = options['user_id']
         dry_run = options['dry_run']
 
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
         if user_id:
             users = User.objects.filter(id=user_id)
             if not users.exists():
@@ -47,93 +185,100 @@ class Command(BaseCommand):
             users = User.objects.all()
 
         total_users = users.count()
-        updated_count = 0
-        changes = []
 
         self.stdout.write(f'Recalculating balances for {total_users} user(s)...')
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN - No changes will be saved'))
         self.stdout.write('')
 
-        for user in users:
-            # Calculate pending balance (orders with status 'Pending' or 'Processing')
-            pending_result = GiftCardOrder.objects.filter(
-                user=user,
-                status__in=['Pending', 'Processing']
-            ).aggregate(total=Sum('amount'))
-            pending_balance = pending_result['total'] or Decimal('0.00')
-
-            # Calculate gross withdrawable balance from approved/completed orders
-            withdrawable_result = GiftCardOrder.objects.filter(
-                user=user,
-                status__in=['Approved', 'Completed']
-            ).aggregate(total=Sum('amount'))
-            gross_withdrawable_balance = withdrawable_result['total'] or Decimal('0.00')
-
-            # Reserve funds for active/completed withdrawals.
-            reserved_withdrawals_result = Withdrawal.objects.filter(
-                user=user,
-                status__in=['Pending', 'Processing', 'Approved', 'Completed'],
-            ).aggregate(total=Sum('amount'))
-            reserved_withdrawals_total = reserved_withdrawals_result['total'] or Decimal('0.00')
-
-            withdrawable_balance = max(
-                Decimal('0.00'),
-                gross_withdrawable_balance - reserved_withdrawals_total
-            )
-
-            # Check if balances have changed
-            old_pending = user.pending_balance
-            old_withdrawable = user.withdrawable_balance
+        if options['bulk'] and not user_id:
+            changes = self.handle_bulk(dry_run, options['chunk_size'], options['workers'])
+        else:
+            changes = self.handle_per_user(users, dry_run)
 
-            pending_changed = pending_balance != old_pending
-            withdrawable_changed = withdrawable_balance != old_withdrawable
-
-            if pending_changed or withdrawable_changed:
-                updated_count += 1
-                change_info = {
-                    'user': user,
-                    'old_pending': old_pending,
-                    'new_pending': pending_balance,
-                    'old_withdrawable': old_withdrawable,
-                    'new_withdrawable': withdrawable_balance,
-                }
-                changes.append(change_info)
-
-                if not dry_run:
-                    user.pending_balance = pending_balance
-                    user.withdrawable_balance = withdrawable_balance
-                    user.save()
-
-                # Display change
-                self.stdout.write(f'User: {user.email} (ID: {user.id})')
-                if pending_changed:
-                    self.stdout.write(
-                        f'  Pending: {old_pending} → {pending_balance}',
-                        style='WARNING' if pending_balance > old_pending else ''
-                    )
-                if withdrawable_changed:
-                    self.stdout.write(
-                        f'  Withdrawable: {old_withdrawable} → {withdrawable_balance}',
-                        style='WARNING' if withdrawable_balance > old_withdrawable else ''
-                    )
-                self.stdout.write('')
+        for change in changes:
+            self.write_change(change)
+        updated_count = len(changes)
 
         # Summary
         self.stdout.write('=' * 50)
         self.stdout.write(f'Summary:')
         self.stdout.write(f'  Total users processed: {total_users}')
         self.stdout.write(f'  Users with balance changes: {updated_count}')
-        
+
         if dry_run:
             self.stdout.write(self.style.WARNING('\nDRY RUN completed. No changes were saved.'))
         else:
             self.stdout.write(self.style.SUCCESS(f'\nSuccessfully updated {updated_count} user(s).'))
 
         # Show total balances
-        total_pending = User.objects.aggregate(total=Sum('pending_balance'))['total'] or Decimal('0.00')
-        total_withdrawable = User.objects.aggregate(total=Sum('withdrawable_balance'))['total'] or Decimal('0.00')
-        
+        totals = Wallet.objects.aggregate(
+            total_pending=Sum('pending_balance'),
+            total_withdrawable=Sum('withdrawable_balance'),
+        )
+        total_pending = totals['total_pending'] or Decimal('0.00')
+        total_withdrawable = totals['total_withdrawable'] or Decimal('0.00')
+
         self.stdout.write(f'\nTotal System Balances:')
         self.stdout.write(f'  Total Pending: ₦{total_pending:,.2f}')
         self.stdout.write(f'  Total Withdrawable: ₦{total_withdrawable:,.2f}')
+
+    def handle_per_user(self, users, dry_run: bool) -> list[dict]:
+        changes = []
+        for user in users.iterator():
+            old_pending, old_withdrawable = Wallet.objects.filter(user_id=user.pk).values_list(
+                'pending_balance', 'withdrawable_balance',
+            ).first() or (Decimal('0.00'), Decimal('0.00'))
+            if dry_run:
+                pending_balance, withdrawable_balance = compute_user_balances(user.pk)
+            else:
+                # Each user commits on its own so no lock outlives its row.
+                pending_balance, withdrawable_balance = reconcile_user_balances(user)
+
+            if pending_balance != old_pending or withdrawable_balance != old_withdrawable:
+                changes.append({
+                    'user_id': user.pk,
+                    'email': user.email,
+                    'old_pending': old_pending,
+                    'new_pending': pending_balance,
+                    'old_withdrawable': old_withdrawable,
+                    'new_withdrawable': withdrawable_balance,
+                })
+        return changes
+
+    def handle_bulk(self, dry_run: bool, chunk_size: int, workers: int) -> list[dict]:
+        chunks = iter_user_id_chunks(chunk_size)
+        if workers == 1:
+            changes = []
+            for chunk in chunks:
+                changes.extend(reconcile_chunk(chunk, dry_run))
+            return changes
+
+        chunks = list(chunks)
+        # Forked workers must open their own database connections.
+        connections.close_all()
+        changes = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_changes in executor.map(reconcile_chunk, chunks, [dry_run] * len(chunks)):
+                changes.extend(chunk_changes)
+        return changes
+
+    def write_change(self, change: dict) -> None:
+        old_pending = change['old_pending']
+        new_pending = change['new_pending']
+        old_withdrawable = change['old_withdrawable']
+        new_withdrawable = change['new_withdrawable']
+
+        # Display change
+        self.stdout.write(f"User: {change['email']} (ID: {change['user_id']})")
+        if new_pending != old_pending:
+            self.stdout.write(
+                f'  Pending: {old_pending} → {new_pending}',
+                style_func=self.style.WARNING if new_pending > old_pending else None,
+            )
+        if new_withdrawable != old_withdrawable:
+            self.stdout.write(
+                f'  Withdrawable: {old_withdrawable} → {new_withdrawable}',
+                style_func=self.style.WARNING if new_withdrawable > old_withdrawable else None,
+            )
+        self.stdout.write('')
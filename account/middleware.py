@@ -0,0 +1,19 @@
+"""
+Middleware that scopes balance refreshes to a single request.
+"""
+from account.balances import BalanceUnitOfWork
+
+
+class BalanceUnitOfWorkMiddleware:
+    """
+    Open a BalanceUnitOfWork for every request so that each user touched by
+    the request has their stored balances refreshed once, after commit.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with BalanceUnitOfWork() as unit_of_work:
+            request.balance_unit_of_work = unit_of_work
+            return self.get_response(request)
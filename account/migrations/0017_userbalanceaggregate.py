@@ -0,0 +1,88 @@
+# Generated by Django 6.0 on 2026-10-17 06:05
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+ORDER_STATUS_FIELDS = {
+    'Pending': 'orders_pending_total',
+    'Approved': 'orders_approved_total',
+    'Completed': 'orders_completed_total',
+    'Rejected': 'orders_rejected_total',
+}
+WITHDRAWAL_STATUS_FIELDS = {
+    'Pending': 'withdrawals_pending_total',
+    'Processing': 'withdrawals_processing_total',
+    'Approved': 'withdrawals_approved_total',
+    'Completed': 'withdrawals_completed_total',
+    'Rejected': 'withdrawals_rejected_total',
+    'Cancelled': 'withdrawals_cancelled_total',
+    'Failed': 'withdrawals_failed_total',
+}
+
+
+def backfill_balance_aggregates(apps, schema_editor):
+    UserProfile = apps.get_model('account', 'UserProfile')
+    UserBalanceAggregate = apps.get_model('account', 'UserBalanceAggregate')
+    ReferralCommission = apps.get_model('account', 'ReferralCommission')
+    GiftCardOrder = apps.get_model('order', 'GiftCardOrder')
+    Withdrawal = apps.get_model('withdrawal', 'Withdrawal')
+
+    totals = {user_id: {} for user_id in UserProfile.objects.values_list('pk', flat=True)}
+
+    order_rows = GiftCardOrder.objects.values('user_id', 'status').annotate(total=Sum('amount'))
+    for row in order_rows:
+        name = ORDER_STATUS_FIELDS.get(row['status'])
+        if name and row['user_id'] in totals:
+            totals[row['user_id']][name] = Decimal(str(row['total'] or 0))
+
+    withdrawal_rows = Withdrawal.objects.values('user_id', 'status').annotate(total=Sum('amount'))
+    for row in withdrawal_rows:
+        name = WITHDRAWAL_STATUS_FIELDS.get(row['status'])
+        if name and row['user_id'] in totals:
+            totals[row['user_id']][name] = Decimal(str(row['total'] or 0))
+
+    commission_rows = ReferralCommission.objects.filter(status='Paid').values('referrer_id').annotate(total=Sum('amount'))
+    for row in commission_rows:
+        if row['referrer_id'] in totals:
+            totals[row['referrer_id']]['referral_commissions_paid_total'] = Decimal(str(row['total'] or 0))
+
+    UserBalanceAggregate.objects.bulk_create(
+        [UserBalanceAggregate(user_id=user_id, **fields) for user_id, fields in totals.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0016_alter_phoneverificationrequest_pin_id'),
+        ('order', '0006_alter_giftcardorder_status'),
+        ('withdrawal', '0003_withdrawallimitusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBalanceAggregate',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance_aggregate', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('orders_pending_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('orders_approved_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('orders_completed_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('orders_rejected_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_pending_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_processing_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_approved_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_completed_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_rejected_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_cancelled_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('withdrawals_failed_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('referral_commissions_paid_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_balance_aggregates, migrations.RunPython.noop),
+    ]
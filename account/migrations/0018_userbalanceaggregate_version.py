@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0017_userbalanceaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbalanceaggregate',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, help_text='Incremented on every balance write; used for cache keys and conditional requests'),
+        ),
+    ]
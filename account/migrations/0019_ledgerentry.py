@@ -0,0 +1,76 @@
+# Generated by Django 6.0 on 2026-10-17 06:15
+
+import uuid
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+PENDING_FIELDS = ['orders_pending_total']
+EARNED_FIELDS = ['orders_approved_total', 'orders_completed_total', 'referral_commissions_paid_total']
+RESERVED_FIELDS = [
+    'withdrawals_pending_total',
+    'withdrawals_processing_total',
+    'withdrawals_approved_total',
+    'withdrawals_completed_total',
+]
+
+
+def post_opening_balances(apps, schema_editor):
+    UserBalanceAggregate = apps.get_model('account', 'UserBalanceAggregate')
+    LedgerEntry = apps.get_model('account', 'LedgerEntry')
+
+    entries = []
+    for aggregate in UserBalanceAggregate.objects.iterator():
+        pending = sum((getattr(aggregate, name) for name in PENDING_FIELDS), Decimal('0.00'))
+        withdrawable = (
+            sum((getattr(aggregate, name) for name in EARNED_FIELDS), Decimal('0.00'))
+            - sum((getattr(aggregate, name) for name in RESERVED_FIELDS), Decimal('0.00'))
+        )
+        legs = {'pending': pending, 'withdrawable': withdrawable, 'platform': -(pending + withdrawable)}
+        transaction_id = uuid.uuid4()
+        for account, amount in legs.items():
+            if amount:
+                entries.append(LedgerEntry(
+                    user_id=aggregate.user_id,
+                    transaction_id=transaction_id,
+                    account=account,
+                    amount=amount,
+                    running_balance=amount,
+                    source_type='opening',
+                    memo='Opening balance',
+                ))
+
+    LedgerEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0018_userbalanceaggregate_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_id', models.UUIDField(db_index=True)),
+                ('account', models.CharField(choices=[('pending', 'Pending'), ('withdrawable', 'Withdrawable'), ('platform', 'Platform')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Signed change: positive credits the account, negative debits it', max_digits=14)),
+                ('running_balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('source_type', models.CharField(choices=[('order', 'Gift card order'), ('withdrawal', 'Withdrawal'), ('referral_commission', 'Referral commission'), ('adjustment', 'Reconciliation adjustment'), ('opening', 'Opening balance')], max_length=30)),
+                ('source_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('memo', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='ledger_user_id_idx'), models.Index(fields=['user', 'account', 'id'], name='ledger_user_account_id_idx'), models.Index(fields=['source_type', 'source_id'], name='ledger_source_idx')],
+            },
+        ),
+        migrations.RunPython(post_opening_balances, migrations.RunPython.noop),
+    ]
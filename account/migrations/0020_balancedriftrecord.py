@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 06:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0019_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceDriftRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stored_pending', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('stored_withdrawable', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('computed_pending', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('computed_withdrawable', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('ledger_pending', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('ledger_withdrawable', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('pending_delta', models.DecimalField(decimal_places=2, help_text='Stored minus computed pending balance', max_digits=14)),
+                ('withdrawable_delta', models.DecimalField(decimal_places=2, help_text='Stored minus computed withdrawable balance', max_digits=14)),
+                ('recent_records', models.JSONField(blank=True, default=dict, help_text='Most recent orders, withdrawals and commissions contributing to the balance')),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_drift_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-detected_at'],
+                'indexes': [models.Index(fields=['user', '-detected_at'], name='balance_drift_user_idx'), models.Index(fields=['resolved_at', '-detected_at'], name='balance_drift_open_idx')],
+            },
+        ),
+    ]
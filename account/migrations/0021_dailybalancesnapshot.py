@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 06:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0020_balancedriftrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('pending_balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('withdrawable_balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('lifetime_approved', models.DecimalField(decimal_places=2, help_text='Total of approved and completed orders', max_digits=14)),
+                ('lifetime_withdrawn', models.DecimalField(decimal_places=2, help_text='Total of approved and completed withdrawals', max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_balance_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['user', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_balance_snapshot')],
+            },
+        ),
+    ]
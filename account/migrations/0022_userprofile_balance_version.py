@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0021_dailybalancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='balance_version',
+            field=models.PositiveBigIntegerField(default=0, help_text='Incremented by every balance write; balance writes compare-and-swap on it'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-17 06:55
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_balances_to_wallets(apps, schema_editor):
+    UserProfile = apps.get_model('account', 'UserProfile')
+    Wallet = apps.get_model('account', 'Wallet')
+
+    Wallet.objects.bulk_create(
+        [
+            Wallet(
+                user_id=user_id,
+                pending_balance=pending_balance,
+                withdrawable_balance=withdrawable_balance,
+                version=balance_version,
+            )
+            for user_id, pending_balance, withdrawable_balance, balance_version in UserProfile.objects.values_list(
+                'pk', 'pending_balance', 'withdrawable_balance', 'balance_version',
+            ).iterator()
+        ],
+        batch_size=500,
+    )
+
+
+def copy_balances_to_profiles(apps, schema_editor):
+    UserProfile = apps.get_model('account', 'UserProfile')
+    Wallet = apps.get_model('account', 'Wallet')
+
+    for wallet in Wallet.objects.iterator():
+        UserProfile.objects.filter(pk=wallet.user_id).update(
+            pending_balance=wallet.pending_balance,
+            withdrawable_balance=wallet.withdrawable_balance,
+            balance_version=wallet.version,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0022_userprofile_balance_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Wallet',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='wallet', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pending_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text="Total amount from orders with 'Pending' status (awaiting admin approval)", max_digits=12)),
+                ('withdrawable_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text="Total amount from orders with 'Approved' status (available for withdrawal)", max_digits=12)),
+                ('version', models.PositiveBigIntegerField(default=0, help_text='Incremented by every balance write; balance writes compare-and-swap on it')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(copy_balances_to_wallets, copy_balances_to_profiles),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='balance_version',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='pending_balance',
+        ),
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='withdrawable_balance',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0023_wallet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balancedriftrecord',
+            name='last_detected_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='balancedriftrecord',
+            name='times_detected',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -9,6 +9,8 @@ import random
 import secrets
 import string
 
+from gtx.tracking import TrackedFieldsMixin
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -80,7 +82,7 @@ class BankAccountDetails(models.Model):
         return f"{self.bank_name} - {self.account_number}"
 
 
-class UserProfile(AbstractBaseUser, PermissionsMixin):
+class UserProfile(TrackedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     STATUS = [
         ("Active", "Active"),
         ("Warning", "Warning"),
@@ -93,6 +95,8 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
         ("Level 2", "Level 2"),
         ("Level 3", "Level 3"),
     ]
+    # Referrals show the referrer's email in their profile.
+    tracked_fields = ("email",)
 
     # Required fields for AbstractBaseUser
     email = models.EmailField(unique=True)
@@ -126,14 +130,8 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
         blank=True,
         related_name='referrals',
     )
-    
-    # Balance fields for gift card redemption system
-    pending_balance = models.DecimalField(decimal_places=2, max_digits=12, default=Decimal("0.00"),
-        help_text="Total amount from orders with 'Pending' status (awaiting admin approval)"
-    )
-    withdrawable_balance = models.DecimalField(decimal_places=2, max_digits=12, default=Decimal("0.00"),
-        help_text="Total amount from orders with 'Approved' status (available for withdrawal)"
-    )
+
+    # Balances live on the one-to-one Wallet row (user.wallet).
     
     status = models.CharField(choices=STATUS, default="Active", max_length=12)
     disabled = models.BooleanField(default=False)
@@ -157,6 +155,8 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
     def save(self, *args, **kwargs):
         if not self.referral_code:
             self.referral_code = self.generate_referral_code()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'referral_code'}
         super().save(*args, **kwargs)
 
     def set_transaction_pin(self, raw_pin):
@@ -170,12 +170,13 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
         return self.email
 
 
-class ReferralCommission(models.Model):
+class ReferralCommission(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ("Pending", "Pending"),
         ("Paid", "Paid"),
         ("Cancelled", "Cancelled"),
     ]
+    tracked_fields = ('status', 'amount')
 
     referrer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -216,6 +217,245 @@ class ReferralCommission(models.Model):
         return f"{self.referrer.email} earned {self.amount} for {self.referred_user.email}"
 
 
+class UserBalanceAggregate(models.Model):
+    """
+    Running per-status totals behind a user's balances.
+
+    Kept up to date transactionally by the balance engine so balances can be
+    derived from this single row instead of scanning orders and withdrawals.
+    """
+    ORDER_STATUS_FIELDS = {
+        "Pending": "orders_pending_total",
+        "Approved": "orders_approved_total",
+        "Completed": "orders_completed_total",
+        "Rejected": "orders_rejected_total",
+    }
+    WITHDRAWAL_STATUS_FIELDS = {
+        "Pending": "withdrawals_pending_total",
+        "Processing": "withdrawals_processing_total",
+        "Approved": "withdrawals_approved_total",
+        "Completed": "withdrawals_completed_total",
+        "Rejected": "withdrawals_rejected_total",
+        "Cancelled": "withdrawals_cancelled_total",
+        "Failed": "withdrawals_failed_total",
+    }
+    COMMISSION_PAID_FIELD = "referral_commissions_paid_total"
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='balance_aggregate',
+    )
+
+    orders_pending_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    orders_approved_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    orders_completed_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    orders_rejected_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+
+    withdrawals_pending_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    withdrawals_processing_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    withdrawals_approved_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    withdrawals_completed_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    withdrawals_rejected_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    withdrawals_cancelled_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+    withdrawals_failed_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+
+    referral_commissions_paid_total = models.DecimalField(decimal_places=2, max_digits=14, default=Decimal("0.00"))
+
+    version = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Incremented on every balance write; used for cache keys and conditional requests",
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def total_fields(cls) -> list[str]:
+        return [
+            *cls.ORDER_STATUS_FIELDS.values(),
+            *cls.WITHDRAWAL_STATUS_FIELDS.values(),
+            cls.COMMISSION_PAID_FIELD,
+        ]
+
+    def __str__(self):
+        return f"Balance totals for {self.user.email}"
+
+
+class Wallet(models.Model):
+    """
+    A user's stored balances, kept on a narrow row of their own so balance
+    writes never touch (or wait on) the wide UserProfile row that
+    authentication reads on every request.
+
+    Written only by account.balances, with a compare-and-swap on version.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='wallet',
+    )
+    pending_balance = models.DecimalField(decimal_places=2, max_digits=12, default=Decimal("0.00"),
+        help_text="Total amount from orders with 'Pending' status (awaiting admin approval)"
+    )
+    withdrawable_balance = models.DecimalField(decimal_places=2, max_digits=12, default=Decimal("0.00"),
+        help_text="Total amount from orders with 'Approved' status (available for withdrawal)"
+    )
+    version = models.PositiveBigIntegerField(default=0,
+        help_text="Incremented by every balance write; balance writes compare-and-swap on it"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Wallet for {self.user.email}"
+
+
+class LedgerEntry(models.Model):
+    """
+    One leg of an append-only, double-entry balance journal.
+
+    Every balance change posts legs that share a transaction_id and sum to
+    zero: the user's pending and withdrawable accounts on one side and the
+    platform account on the other. running_balance is the account balance
+    after the entry, so the balance at any point is the latest row for the
+    (user, account) pair at that point.
+    """
+    ACCOUNT_PENDING = "pending"
+    ACCOUNT_WITHDRAWABLE = "withdrawable"
+    ACCOUNT_PLATFORM = "platform"
+    ACCOUNT_CHOICES = [
+        (ACCOUNT_PENDING, "Pending"),
+        (ACCOUNT_WITHDRAWABLE, "Withdrawable"),
+        (ACCOUNT_PLATFORM, "Platform"),
+    ]
+
+    SOURCE_CHOICES = [
+        ("order", "Gift card order"),
+        ("withdrawal", "Withdrawal"),
+        ("referral_commission", "Referral commission"),
+        ("adjustment", "Reconciliation adjustment"),
+        ("opening", "Opening balance"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ledger_entries',
+    )
+    transaction_id = models.UUIDField(db_index=True)
+    account = models.CharField(max_length=20, choices=ACCOUNT_CHOICES)
+    amount = models.DecimalField(
+        decimal_places=2, max_digits=14,
+        help_text="Signed change: positive credits the account, negative debits it",
+    )
+    running_balance = models.DecimalField(decimal_places=2, max_digits=14)
+    source_type = models.CharField(max_length=30, choices=SOURCE_CHOICES)
+    source_id = models.PositiveBigIntegerField(null=True, blank=True)
+    memo = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='ledger_user_id_idx'),
+            models.Index(fields=['user', 'account', 'id'], name='ledger_user_account_id_idx'),
+            models.Index(fields=['source_type', 'source_id'], name='ledger_source_idx'),
+        ]
+
+    @property
+    def entry_type(self) -> str:
+        return "credit" if self.amount > 0 else "debit"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Ledger entries are append-only and cannot be modified.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are append-only and cannot be deleted.")
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} {self.account} for user {self.user_id}"
+
+
+class DailyBalanceSnapshot(models.Model):
+    """
+    A user's balances at the end of one day, written by the nightly snapshot
+    task. Rows are only written when something changed since the user's
+    previous snapshot; a missing day carries the previous row forward.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_balance_snapshots',
+    )
+    date = models.DateField()
+    pending_balance = models.DecimalField(decimal_places=2, max_digits=14)
+    withdrawable_balance = models.DecimalField(decimal_places=2, max_digits=14)
+    lifetime_approved = models.DecimalField(
+        decimal_places=2, max_digits=14,
+        help_text="Total of approved and completed orders",
+    )
+    lifetime_withdrawn = models.DecimalField(
+        decimal_places=2, max_digits=14,
+        help_text="Total of approved and completed withdrawals",
+    )
+
+    class Meta:
+        ordering = ['user', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_balance_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"Balances for {self.user_id} on {self.date}"
+
+
+class BalanceDriftRecord(models.Model):
+    """
+    Stored balances that disagreed with a fresh computation from source
+    records, as found by the background drift detector.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='balance_drift_records',
+    )
+    stored_pending = models.DecimalField(decimal_places=2, max_digits=14)
+    stored_withdrawable = models.DecimalField(decimal_places=2, max_digits=14)
+    computed_pending = models.DecimalField(decimal_places=2, max_digits=14)
+    computed_withdrawable = models.DecimalField(decimal_places=2, max_digits=14)
+    ledger_pending = models.DecimalField(decimal_places=2, max_digits=14)
+    ledger_withdrawable = models.DecimalField(decimal_places=2, max_digits=14)
+    pending_delta = models.DecimalField(
+        decimal_places=2, max_digits=14,
+        help_text="Stored minus computed pending balance",
+    )
+    withdrawable_delta = models.DecimalField(
+        decimal_places=2, max_digits=14,
+        help_text="Stored minus computed withdrawable balance",
+    )
+    recent_records = models.JSONField(
+        default=dict, blank=True,
+        help_text="Most recent orders, withdrawals and commissions contributing to the balance",
+    )
+    detected_at = models.DateTimeField(auto_now_add=True)
+    # The detector updates an open record while the drift stays the same.
+    last_detected_at = models.DateTimeField(null=True, blank=True)
+    times_detected = models.PositiveIntegerField(default=1)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-detected_at']
+        indexes = [
+            models.Index(fields=['user', '-detected_at'], name='balance_drift_user_idx'),
+            models.Index(fields=['resolved_at', '-detected_at'], name='balance_drift_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"Balance drift for {self.user.email} at {self.detected_at}"
+
+
 class EmailVerificationCode(models.Model):
     """Stores 6-digit verification codes for email verification."""
     user = models.ForeignKey(
@@ -0,0 +1,38 @@
+"""
+Per-user profile versions for conditional GETs of the current user.
+
+CurrentUserView tags its response with the user's profile version, a
+generation number kept in the cache. Every write to something the profile
+shows (the user row, credentials, bank details, balances and referrals)
+bumps the version on commit, so a matching If-None-Match is answered with
+304 before the profile is loaded.
+"""
+from gtx.cache_generations import bump_generation, bump_generation_on_commit, get_generation
+
+PROFILE_VERSION_KEY = 'account:profile:{user_id}:version'
+
+
+def _profile_version_key(user_id: int) -> str:
+    return PROFILE_VERSION_KEY.format(user_id=user_id)
+
+
+def get_profile_version(user_id: int) -> int | None:
+    return get_generation(_profile_version_key(user_id))
+
+
+def profile_etag(user_id: int) -> str | None:
+    version = get_profile_version(user_id)
+    if version is None:
+        return None
+    return f'"profile-{user_id}-{version}"'
+
+
+def bump_profile_version(user_id: int) -> None:
+    bump_generation(_profile_version_key(user_id))
+
+
+def invalidate_profiles(user_ids) -> None:
+    """Bump the profile version of each user once the current transaction commits."""
+    for user_id in set(user_ids):
+        if user_id is not None:
+            bump_generation_on_commit(_profile_version_key(user_id))
@@ -1,3 +1,6 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
@@ -126,6 +129,12 @@ class UserProfileSerializer(serializers.ModelSerializer):
     bank_details = BankAccountDetailsSerializer(read_only=True)
     referred_by = serializers.EmailField(source='referred_by.email', read_only=True)
     referral_count = serializers.SerializerMethodField()
+    pending_balance = serializers.DecimalField(
+        source='wallet.pending_balance', max_digits=12, decimal_places=2, read_only=True,
+    )
+    withdrawable_balance = serializers.DecimalField(
+        source='wallet.withdrawable_balance', max_digits=12, decimal_places=2, read_only=True,
+    )
     # account_information = BankAccountDetailsSerializer(source='bank_details', read_only=True)
 
     class Meta:
@@ -176,3 +185,37 @@ class AddPhoneNumberSerializer(serializers.Serializer):
 
 class VerifyPhoneNumberSerializer(serializers.Serializer):
     code = serializers.CharField(max_length=8, min_length=4)
+
+
+class TransactionHistoryFilterSerializer(serializers.Serializer):
+    """Query parameters for the user transaction history."""
+    BUCKET_CHOICES = ("pending", "approved", "rejected")
+
+    paginated = serializers.BooleanField(required=False, default=False)
+    summary = serializers.BooleanField(required=False, default=False)
+    bucket = serializers.ChoiceField(choices=BUCKET_CHOICES, required=False)
+    cursor = serializers.CharField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get("cursor") and not attrs.get("bucket"):
+            raise serializers.ValidationError({"cursor": "A cursor pages through one bucket; pass bucket as well."})
+        if attrs.get("summary") and attrs.get("bucket"):
+            raise serializers.ValidationError({"bucket": "Choose either summary or a bucket."})
+        start_date, end_date = attrs.get("start_date"), attrs.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError({"start_date": "Start date cannot be after end date."})
+        return attrs
+
+    def filter_queryset(self, queryset):
+        # Whole days in the active timezone, as created_at ranges so the
+        # (user, created_at) index stays usable.
+        start_date = self.validated_data.get("start_date")
+        end_date = self.validated_data.get("end_date")
+        if start_date:
+            queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min)))
+        if end_date:
+            next_day = end_date + timedelta(days=1)
+            queryset = queryset.filter(created_at__lt=timezone.make_aware(datetime.combine(next_day, time.min)))
+        return queryset
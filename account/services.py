@@ -5,12 +5,12 @@ from django.db import IntegrityError, transaction
 from django.db.models import Sum
 from django.utils import timezone
 
+from account.balances import REFERRAL_COMMISSION_PAID_STATUS
 from account.models import ReferralCommission, UserProfile
 from order.models import GiftCardOrder
 
 
 SUCCESSFUL_ORDER_STATUSES = {"Approved", "Completed"}
-REFERRAL_COMMISSION_PAID_STATUS = "Paid"
 
 
 def get_referral_qualifying_amount() -> Decimal:
@@ -32,13 +32,14 @@ def process_referral_commission_for_order(order: GiftCardOrder) -> ReferralCommi
         return None
 
     with transaction.atomic():
-        referred_user = UserProfile.objects.select_for_update().get(pk=order.user_id)
+        # No profile locks: the unique (referrer, referred_user) constraint
+        # guarantees a single commission, and the commission signal writes
+        # the referrer's balance through the balance engine.
+        referred_user = UserProfile.objects.select_related('referred_by').get(pk=order.user_id)
         referrer = referred_user.referred_by
         if not referrer or referrer_id_matches(referrer, referred_user):
             return None
 
-        referrer = UserProfile.objects.select_for_update().get(pk=referrer.pk)
-
         if ReferralCommission.objects.filter(
             referrer=referrer,
             referred_user=referred_user,
@@ -56,25 +57,23 @@ def process_referral_commission_for_order(order: GiftCardOrder) -> ReferralCommi
 
         commission_amount = calculate_referral_commission(order.amount)
         try:
-            commission = ReferralCommission.objects.create(
-                referrer=referrer,
-                referred_user=referred_user,
-                qualifying_transaction=order,
-                amount=commission_amount,
-                percentage=get_referral_commission_percent(),
-                status=REFERRAL_COMMISSION_PAID_STATUS,
-                paid_at=timezone.now(),
-                metadata={
-                    "qualifying_total": str(total_successful),
-                    "threshold": str(qualifying_amount),
-                },
-            )
+            with transaction.atomic():
+                commission = ReferralCommission.objects.create(
+                    referrer=referrer,
+                    referred_user=referred_user,
+                    qualifying_transaction=order,
+                    amount=commission_amount,
+                    percentage=get_referral_commission_percent(),
+                    status=REFERRAL_COMMISSION_PAID_STATUS,
+                    paid_at=timezone.now(),
+                    metadata={
+                        "qualifying_total": str(total_successful),
+                        "threshold": str(qualifying_amount),
+                    },
+                )
         except IntegrityError:
             return None
 
-    from order.signals import recalculate_user_balances
-
-    recalculate_user_balances(referrer)
     return commission
 
 
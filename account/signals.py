@@ -0,0 +1,96 @@
+"""
+Django signals for user wallets, for keeping referrer balances in step
+with referral commissions, and for bumping profile versions when anything
+the profile shows changes.
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from account.balances import apply_balance_delta, commission_contribution, is_owner_deletion
+from account.models import (
+    BankAccountDetails,
+    Level2Credentials,
+    Level3Credentials,
+    ReferralCommission,
+    UserProfile,
+    Wallet,
+)
+from account.profile_versions import invalidate_profiles
+
+
+@receiver(post_save, sender=UserProfile)
+def create_user_wallet(sender, instance, created, **kwargs):
+    """
+    Give every new user an empty wallet row for their stored balances.
+    """
+    if created:
+        Wallet.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=ReferralCommission)
+def handle_commission_saved(sender, instance, created, **kwargs):
+    """
+    Credit paid commissions to the referrer and reverse them if they are cancelled.
+    """
+    if created:
+        delta = commission_contribution(instance.status, instance.amount)
+    else:
+        delta = (
+            commission_contribution(instance.status, instance.amount)
+            - commission_contribution(
+                instance.initial_value('status'),
+                instance.initial_value('amount'),
+            )
+        )
+    apply_balance_delta(instance.referrer_id, delta, source=instance)
+
+
+@receiver(post_delete, sender=ReferralCommission)
+def handle_commission_deleted(sender, instance, **kwargs):
+    """
+    Keep referrer balances consistent if a commission is deleted.
+    """
+    if is_owner_deletion(kwargs.get('origin'), instance.referrer_id):
+        return
+
+    apply_balance_delta(
+        instance.referrer_id,
+        -commission_contribution(instance.status, instance.amount),
+        rebuild_missing=False,
+        source=instance,
+    )
+
+
+@receiver(post_save, sender=UserProfile)
+def bump_saved_profile(sender, instance, created, **kwargs):
+    user_ids = [instance.pk]
+    if created:
+        # The referrer's referral count changed.
+        user_ids.append(instance.referred_by_id)
+    elif instance.has_changed('email'):
+        user_ids.extend(instance.referrals.values_list('pk', flat=True))
+    invalidate_profiles(user_ids)
+
+
+@receiver(pre_delete, sender=UserProfile)
+def bump_profiles_of_deleted_user(sender, instance, **kwargs):
+    # Collected before the delete clears referred_by on the referrals.
+    invalidate_profiles([instance.referred_by_id, *instance.referrals.values_list('pk', flat=True)])
+
+
+@receiver(post_save, sender=Level2Credentials)
+@receiver(pre_delete, sender=Level2Credentials)
+def bump_level2_profiles(sender, instance, **kwargs):
+    invalidate_profiles(UserProfile.objects.filter(level2_credentials_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Level3Credentials)
+@receiver(pre_delete, sender=Level3Credentials)
+def bump_level3_profiles(sender, instance, **kwargs):
+    invalidate_profiles(UserProfile.objects.filter(level3_credentials_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=BankAccountDetails)
+@receiver(pre_delete, sender=BankAccountDetails)
+def bump_bank_details_profiles(sender, instance, **kwargs):
+    invalidate_profiles(UserProfile.objects.filter(bank_details_id=instance.pk).values_list('pk', flat=True))
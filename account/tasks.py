@@ -1,7 +1,24 @@
 from celery import shared_task
 import logging
+import random
+import time
+from datetime import date, timedelta
 
-logger = logging.getLogger("__name__")
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from account.balances import (
+    find_drift_candidates,
+    record_balance_drift,
+    verify_user_balances,
+    write_daily_balance_snapshots,
+)
+
+logger = logging.getLogger(__name__)
+
+BALANCE_DRIFT_CURSOR_KEY = 'account:balance-drift:cursor'
 
 
 
@@ -10,4 +27,120 @@ logger = logging.getLogger("__name__")
 def periodictask():
   print("running")
   logger.info("running task")
-  return
\ No newline at end of file
+  return
+
+
+def _get_drift_cursor() -> int:
+    try:
+        return int(cache.get(BALANCE_DRIFT_CURSOR_KEY) or 0)
+    except Exception as exc:
+        logger.warning("Could not read balance drift cursor: %s", exc)
+        return 0
+
+
+def _set_drift_cursor(last_id: int) -> None:
+    try:
+        cache.set(BALANCE_DRIFT_CURSOR_KEY, last_id, None)
+    except Exception as exc:
+        logger.warning("Could not store balance drift cursor: %s", exc)
+
+
+@shared_task(name="account.tasks.detect_balance_drift")
+def detect_balance_drift(sample_rate=None, time_budget_seconds=None, chunk_size=None):
+    """
+    Compare stored balances with balances computed from source records and
+    record every disagreement as a BalanceDriftRecord. A drift that is still
+    open and unchanged updates its record rather than adding one.
+
+    Users are walked in primary key order in keyset-paginated chunks,
+    resuming where the previous run stopped. Each user is checked with
+    probability ``sample_rate`` and the run stops once ``time_budget_seconds``
+    is spent, so the task can be scheduled frequently. Nothing is locked or
+    written apart from the drift rows.
+    """
+    sample_rate = settings.BALANCE_DRIFT_SAMPLE_RATE if sample_rate is None else sample_rate
+    time_budget_seconds = (
+        settings.BALANCE_DRIFT_TIME_BUDGET_SECONDS if time_budget_seconds is None else time_budget_seconds
+    )
+    chunk_size = chunk_size or settings.BALANCE_DRIFT_CHUNK_SIZE
+
+    User = get_user_model()
+    deadline = time.monotonic() + time_budget_seconds
+    last_id = _get_drift_cursor()
+    scanned = checked = drifted = new_drift = 0
+    completed_pass = False
+
+    while time.monotonic() < deadline:
+        chunk = list(
+            User.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            # Reached the end of the table; the next run starts over.
+            completed_pass = True
+            last_id = 0
+            break
+
+        last_id = chunk[-1]
+        scanned += len(chunk)
+        sampled = [user_id for user_id in chunk if random.random() < sample_rate]
+        checked += len(sampled)
+
+        for user_id in find_drift_candidates(sampled):
+            # Re-check one by one so a write that landed mid-chunk is not reported.
+            check = verify_user_balances(user_id)
+            if not check.matches:
+                _, created = record_balance_drift(check)
+                drifted += 1
+                new_drift += created
+
+    _set_drift_cursor(last_id)
+
+    if new_drift:
+        logger.warning("New balance drift detected for %s of %s checked users", new_drift, checked)
+    logger.info(
+        "Balance drift check scanned %s users, checked %s, found %s drifted (cursor %s)",
+        scanned, checked, drifted, last_id,
+    )
+    return {
+        "scanned": scanned,
+        "checked": checked,
+        "drifted": drifted,
+        "new_drift": new_drift,
+        "cursor": last_id,
+        "completed_pass": completed_pass,
+    }
+
+
+@shared_task(name="account.tasks.snapshot_daily_balances")
+def snapshot_daily_balances(snapshot_date=None, chunk_size=1000):
+    """
+    Write each user's end-of-day balances for ``snapshot_date`` (default:
+    yesterday, as the task runs just after midnight), read from the ledger
+    as of the end of that day, so a late run or a backfill records the day
+    it names. One grouped query per source per chunk of users.
+    """
+    if snapshot_date is None:
+        snapshot_date = timezone.localdate() - timedelta(days=1)
+    elif isinstance(snapshot_date, str):
+        snapshot_date = date.fromisoformat(snapshot_date)
+
+    User = get_user_model()
+    last_id = 0
+    users = written = 0
+
+    while True:
+        chunk = list(
+            User.objects.filter(pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        users += len(chunk)
+        written += write_daily_balance_snapshots(chunk, snapshot_date)
+
+    logger.info("Wrote %s daily balance snapshots for %s users on %s", written, users, snapshot_date)
+    return {"date": str(snapshot_date), "users": users, "written": written}
@@ -1,12 +1,26 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from order.models import GiftCardOrder
-from .models import PhoneVerificationRequest, ReferralCommission, UserProfile
+from withdrawal.models import Withdrawal
+from . import balances
+from .balances import BalanceUnitOfWork, get_user_balances, rebuild_balance_aggregate, verify_user_balances
+from .ledger import get_ledger_balances, get_ledger_statement, post_transaction
+from .models import BalanceDriftRecord, LedgerEntry, PhoneVerificationRequest, ReferralCommission, UserBalanceAggregate, UserProfile, Wallet
+from .tasks import detect_balance_drift
 
 
 class MockTwilioResponse:
@@ -446,7 +460,7 @@ class ReferralFlowTests(APITestCase):
         self.assertEqual(ReferralCommission.objects.count(), 1)
 
         referrer.refresh_from_db()
-        self.assertEqual(str(referrer.withdrawable_balance), '2.00')
+        self.assertEqual(str(referrer.wallet.withdrawable_balance), '2.00')
 
     def test_failed_or_pending_transactions_do_not_trigger_reward(self):
         referrer = UserProfile.objects.create_user(email='referrer@example.com', password='StrongPassword123')
@@ -460,3 +474,376 @@ class ReferralFlowTests(APITestCase):
         GiftCardOrder.objects.create(user=referred, type='E-Code', card=None, amount=1000, status='Rejected')
 
         self.assertFalse(ReferralCommission.objects.exists())
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    BALANCE_ENGINE_MODE='incremental',
+)
+class BalanceEngineTests(APITestCase):
+    def create_withdrawal(self, user, amount):
+        return Withdrawal.objects.create(
+            user=user,
+            amount=Decimal(amount),
+            bank_name='Test Bank',
+            account_name='Test User',
+            account_number='1234567890',
+        )
+
+    def test_status_transitions_match_full_recalculation(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        first = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=500)
+        second = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=300)
+
+        first.status = 'Approved'
+        first.save()
+        second.status = 'Rejected'
+        second.save()
+
+        withdrawal = self.create_withdrawal(user, '200.00')
+        withdrawal.reject(admin_user=user, reason='Invalid account')
+
+        user.refresh_from_db()
+        self.assertEqual(user.wallet.pending_balance, Decimal('0.00'))
+        self.assertEqual(user.wallet.withdrawable_balance, Decimal('500.00'))
+        self.assertTrue(verify_user_balances(user).matches)
+
+    def test_negative_running_total_stays_clamped_at_zero(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=100, status='Approved')
+        self.create_withdrawal(user, '100.00')
+
+        # Reversing the order leaves more reserved than earned; the stored
+        # balance clamps at zero while the running total is negative.
+        order.status = 'Rejected'
+        order.save()
+        GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=60, status='Approved')
+
+        user.refresh_from_db()
+        self.assertEqual(user.wallet.withdrawable_balance, Decimal('0.00'))
+        self.assertTrue(verify_user_balances(user).matches)
+
+    def test_aggregate_tracks_running_totals_per_status(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=400)
+        order.status = 'Approved'
+        order.save()
+        withdrawal = self.create_withdrawal(user, '150.00')
+        withdrawal.cancel()
+        self.create_withdrawal(user, '100.00')
+
+        aggregate = UserBalanceAggregate.objects.get(user=user)
+        self.assertEqual(aggregate.orders_pending_total, Decimal('0.00'))
+        self.assertEqual(aggregate.orders_approved_total, Decimal('400.00'))
+        self.assertEqual(aggregate.withdrawals_cancelled_total, Decimal('150.00'))
+        self.assertEqual(aggregate.withdrawals_pending_total, Decimal('100.00'))
+
+        rebuilt = rebuild_balance_aggregate(user)
+        for name in UserBalanceAggregate.total_fields():
+            self.assertEqual(getattr(rebuilt, name), getattr(aggregate, name), name)
+
+        user.refresh_from_db()
+        self.assertEqual(user.wallet.withdrawable_balance, Decimal('300.00'))
+
+    def test_bulk_recalculate_command_matches_balance_engine(self):
+        referrer = UserProfile.objects.create_user(email='referrer@example.com', password='StrongPassword123')
+        referred = UserProfile.objects.create_user(
+            email='referred@example.com',
+            password='StrongPassword123',
+            referred_by=referrer,
+        )
+        GiftCardOrder.objects.create(user=referred, type='E-Code', card=None, amount=1000, status='Approved')
+        GiftCardOrder.objects.create(user=referred, type='E-Code', card=None, amount=250)
+        self.create_withdrawal(referred, '300.00')
+        self.assertTrue(ReferralCommission.objects.filter(referrer=referrer).exists())
+
+        expected = {
+            wallet.user_id: (wallet.pending_balance, wallet.withdrawable_balance)
+            for wallet in Wallet.objects.all()
+        }
+        Wallet.objects.all().delete()
+        UserBalanceAggregate.objects.all().delete()
+
+        call_command('recalculate_balances', '--bulk', '--chunk-size', '1', stdout=StringIO())
+
+        for user in UserProfile.objects.select_related('wallet'):
+            self.assertEqual((user.wallet.pending_balance, user.wallet.withdrawable_balance), expected[user.pk])
+            self.assertTrue(verify_user_balances(user).matches)
+        self.assertEqual(UserBalanceAggregate.objects.count(), 2)
+
+    def test_bulk_dry_run_takes_no_locks_and_writes_nothing(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=1000, status='Approved')
+        Wallet.objects.filter(user=user).update(withdrawable_balance=Decimal('0.00'))
+        out = StringIO()
+
+        with patch.object(QuerySet, 'select_for_update', side_effect=AssertionError('dry run took a lock')):
+            call_command('recalculate_balances', '--bulk', '--dry-run', stdout=out)
+
+        self.assertIn('Withdrawable: 0.00 → 1000.00', out.getvalue())
+        self.assertEqual(Wallet.objects.get(user=user).withdrawable_balance, Decimal('0.00'))
+
+    def test_unit_of_work_refreshes_each_user_once_on_commit(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+
+        with patch('account.balances._store_balances', wraps=balances._store_balances) as store:
+            with self.captureOnCommitCallbacks(execute=True):
+                with BalanceUnitOfWork() as unit_of_work:
+                    order = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=500)
+                    order.status = 'Approved'
+                    order.save()
+                    self.create_withdrawal(user, '200.00')
+
+                    # Stored balances wait for commit; the aggregate does not.
+                    self.assertEqual(get_user_balances(user), (Decimal('0.00'), Decimal('300.00')))
+                    user.refresh_from_db()
+                    self.assertEqual(user.wallet.withdrawable_balance, Decimal('0.00'))
+
+        self.assertEqual(store.call_count, 1)
+        self.assertEqual(unit_of_work.requested, 3)
+        self.assertEqual(unit_of_work.recalculated, 1)
+        self.assertEqual(unit_of_work.saved, 2)
+        user.refresh_from_db()
+        self.assertEqual(user.wallet.withdrawable_balance, Decimal('300.00'))
+
+    def test_ledger_posts_balanced_entries_with_running_balances(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=500)
+        order.status = 'Approved'
+        order.save()
+        checkpoint = LedgerEntry.objects.filter(user=user).latest('id').created_at
+        withdrawal = self.create_withdrawal(user, '200.00')
+
+        for transaction_id in LedgerEntry.objects.filter(user=user).values_list('transaction_id', flat=True):
+            legs = LedgerEntry.objects.filter(transaction_id=transaction_id)
+            self.assertEqual(sum(leg.amount for leg in legs), Decimal('0.00'))
+
+        reservation = LedgerEntry.objects.get(
+            source_type='withdrawal', source_id=withdrawal.pk, account=LedgerEntry.ACCOUNT_WITHDRAWABLE,
+        )
+        self.assertEqual(reservation.entry_type, 'debit')
+        self.assertEqual(reservation.running_balance, Decimal('300.00'))
+        self.assertEqual(get_ledger_balances(user), (Decimal('0.00'), Decimal('300.00')))
+        self.assertEqual(get_ledger_balances(user, at=checkpoint), (Decimal('0.00'), Decimal('500.00')))
+        self.assertEqual(
+            [entry.amount for entry in get_ledger_statement(user)],
+            [Decimal('500.00'), Decimal('-500.00'), Decimal('500.00'), Decimal('-200.00')],
+        )
+        with self.assertRaises(ValueError):
+            reservation.save()
+        self.assertTrue(verify_user_balances(user).matches)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_drift_detector_records_stored_balance_drift(self):
+        cache.clear()
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=700, status='Approved')
+        UserProfile.objects.create_user(email='other@example.com', password='StrongPassword123')
+        Wallet.objects.filter(user=user).update(withdrawable_balance=Decimal('900.00'))
+
+        result = detect_balance_drift(sample_rate=1, time_budget_seconds=30, chunk_size=1)
+
+        self.assertEqual(result['checked'], 2)
+        self.assertEqual(result['drifted'], 1)
+        self.assertTrue(result['completed_pass'])
+        drift = BalanceDriftRecord.objects.get(user=user)
+        self.assertEqual(drift.withdrawable_delta, Decimal('200.00'))
+        self.assertEqual(drift.recent_records['orders'][0]['id'], order.pk)
+
+        # The same unresolved drift updates its record on the next run...
+        self.assertEqual(detect_balance_drift(sample_rate=1, time_budget_seconds=30)['new_drift'], 0)
+        drift.refresh_from_db()
+        self.assertEqual(drift.times_detected, 2)
+        # ...while a different amount opens a new one.
+        Wallet.objects.filter(user=user).update(withdrawable_balance=Decimal('950.00'))
+        self.assertEqual(detect_balance_drift(sample_rate=1, time_budget_seconds=30)['new_drift'], 1)
+        self.assertEqual(BalanceDriftRecord.objects.filter(user=user).count(), 2)
+
+        # Sampling everything out checks nobody.
+        self.assertEqual(detect_balance_drift(sample_rate=0, time_budget_seconds=30)['checked'], 0)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_drift_detector_records_ledger_drift(self):
+        cache.clear()
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=700, status='Approved')
+        # The stored balances still agree with the source records.
+        post_transaction(user.pk, {LedgerEntry.ACCOUNT_WITHDRAWABLE: Decimal('50.00')}, source_type='adjustment')
+
+        result = detect_balance_drift(sample_rate=1, time_budget_seconds=30)
+
+        self.assertEqual(result['drifted'], 1)
+        drift = BalanceDriftRecord.objects.get(user=user)
+        self.assertEqual(drift.withdrawable_delta, Decimal('0.00'))
+        self.assertEqual(drift.ledger_withdrawable, Decimal('750.00'))
+
+    def test_plain_profile_save_does_not_clobber_balances(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        stale = UserProfile.objects.get(pk=user.pk)
+        stale_wallet = Wallet.objects.get(user=user)
+        GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=800, status='Approved')
+
+        stale.full_name = 'Stale Copy'
+        stale.save()
+
+        user.refresh_from_db()
+        self.assertEqual(user.full_name, 'Stale Copy')
+        self.assertEqual(user.wallet.withdrawable_balance, Decimal('800.00'))
+        self.assertGreater(user.wallet.version, stale_wallet.version)
+        self.assertTrue(verify_user_balances(user).matches)
+
+    def test_order_transitions_use_load_time_state(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=500)
+        order = GiftCardOrder.objects.get(user=user)
+
+        order.status = 'Approved'
+        self.assertEqual(order.changed_fields(), {'status': ('Pending', 'Approved')})
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+
+        order_table = GiftCardOrder._meta.db_table
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and order_table in query['sql']]
+        self.assertEqual(reads, [])
+        self.assertEqual(order.changed_fields(), {})
+        self.assertEqual(order.initial_value('status'), 'Approved')
+        self.assertEqual(get_user_balances(user), (Decimal('0.00'), Decimal('500.00')))
+
+    def test_deferred_order_transition_reads_old_values_before_saving(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=500)
+        order = GiftCardOrder.objects.only('id', 'user').get(user=user)
+
+        order.status = 'Approved'
+        order.save()
+
+        self.assertEqual(order.initial_value('status'), 'Approved')
+        self.assertEqual(get_user_balances(user), (Decimal('0.00'), Decimal('500.00')))
+        self.assertTrue(verify_user_balances(user).matches)
+
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class TransactionHistoryTests(APITestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('user-transaction-history')
+
+    def create_order(self, amount, order_status='Pending'):
+        return GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=amount, status=order_status)
+
+    def test_summary_is_a_single_aggregate_query(self):
+        self.create_order(100)
+        self.create_order(200, 'Processing')
+        self.create_order(300, 'Approved')
+        self.create_order(50, 'Rejected')
+        GiftCardOrder.objects.create(
+            user=UserProfile.objects.create_user(email='other@example.com', password='StrongPassword123'),
+            type='E-Code', card=None, amount=999,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'summary': 'true'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'summary': {
+            'pending': {'count': 2, 'total_amount': 300},
+            'approved': {'count': 1, 'total_amount': 300},
+            'rejected': {'count': 1, 'total_amount': 50},
+        }})
+        order_table = GiftCardOrder._meta.db_table
+        self.assertEqual(len([query for query in queries if order_table in query['sql']]), 1)
+
+    def test_buckets_page_newest_first_by_cursor(self):
+        orders = [self.create_order(amount) for amount in (10, 20, 30)]
+        self.create_order(40, 'Approved')
+
+        response = self.client.get(self.url, {'paginated': 'true', 'limit': 2})
+        pending = response.data['pending']
+        self.assertEqual([row['id'] for row in pending['results']], [orders[2].id, orders[1].id])
+        self.assertEqual(len(response.data['approved']['results']), 1)
+        self.assertIsNone(response.data['approved']['next'])
+
+        next_page = self.client.get(pending['next'])
+        self.assertEqual([row['id'] for row in next_page.data['results']], [orders[0].id])
+        self.assertIsNone(next_page.data['next'])
+
+    def test_date_range_limits_summary_and_buckets(self):
+        old = self.create_order(100)
+        GiftCardOrder.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+        recent = self.create_order(200)
+        today = timezone.localdate()
+
+        response = self.client.get(
+            self.url, {'paginated': 'true', 'start_date': (today - timedelta(days=1)).isoformat()},
+        )
+
+        self.assertEqual(response.data['summary']['pending'], {'count': 1, 'total_amount': 200})
+        self.assertEqual([row['id'] for row in response.data['pending']['results']], [recent.id])
+
+    def test_cursor_without_bucket_is_rejected(self):
+        self.assertEqual(
+            self.client.get(self.url, {'cursor': 'abc'}).status_code, status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_default_response_keeps_the_three_full_lists(self):
+        pending = [self.create_order(amount) for amount in (10, 20)]
+        approved = self.create_order(30, 'Approved')
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(set(response.data), {'pending', 'approved', 'rejected'})
+        self.assertEqual([row['id'] for row in response.data['pending']], [pending[1].id, pending[0].id])
+        self.assertEqual([row['id'] for row in response.data['approved']], [approved.id])
+        self.assertEqual(response.data['rejected'], [])
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class CurrentUserConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('current-user')
+
+    def test_unchanged_profile_is_answered_with_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(BALANCE_ENGINE_MODE='full')
+    def test_full_reconcile_keeps_an_unchanged_profile_etag(self):
+        with patch('notification.outbox._kick_dispatcher'), self.captureOnCommitCallbacks(execute=True):
+            GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=500)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.get(self.url)
+        self.assertEqual(first.data['pending_balance'], '500.00')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_profile_and_balance_changes_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.user.full_name = 'Ada Seller'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['full_name'], 'Ada Seller')
+
+        etag = response['ETag']
+        with patch('notification.outbox._kick_dispatcher'), self.captureOnCommitCallbacks(execute=True):
+            GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=500)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['pending_balance'], '500.00')
@@ -11,6 +11,7 @@ from rest_framework.response import Response
 from rest_framework.request import Request
 from rest_framework import serializers, status
 from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -20,7 +21,11 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http.response import HttpResponseBase
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from requests import RequestException
 import secrets
 
@@ -36,7 +41,7 @@ from .serializers import (
     UserProfileSerializer, ProfilePictureSerializer, ChangePasswordSerializer,
     AddPhoneNumberSerializer, VerifyPhoneNumberSerializer,
     SaveBankAccountDetailsSerializer, EditBankAccountDetailsSerializer,
-    BankAccountDetailsSerializer
+    BankAccountDetailsSerializer, TransactionHistoryFilterSerializer,
 )
 from order.models import GiftCardOrder
 from order.serializers import (
@@ -44,7 +49,9 @@ from order.serializers import (
     GiftCardOrderSerializer,
     GiftCardOrderHistorySerializer,
 )
-from order.signals import recalculate_user_balances
+from account.balances import recalculate_user_balances
+from account.profile_versions import profile_etag
+from gtx.pagination import CreatedAtKeysetPagination
 
 
 logger = logging.getLogger(__name__)
@@ -335,7 +342,7 @@ class SignupView(APIView):
             user = UserProfile.objects.create_user(email=email, password=password, referred_by=referrer)
             user.full_name = full_name
             user.is_verified = False
-            user.save()
+            user.save(update_fields=['full_name', 'is_verified'])
 
         # Generate and send verification code
         verification = EmailVerificationCode.create_for_user(user)
@@ -393,7 +400,7 @@ class VerifyEmailView(APIView):
 
         # Verify user
         user.is_verified = True
-        user.save()
+        user.save(update_fields=['is_verified'])
         verification.delete()
 
         # Send welcome email
@@ -593,7 +600,7 @@ class PasswordResetVerifyView(APIView):
 
         # Set new password
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
         reset_code.delete()
 
         # Send password reset success email
@@ -645,7 +652,7 @@ class LoginView(APIView):
         ip_address = get_client_ip(request)
         user.last_login = timezone.now()
         user.ip_address = ip_address
-        user.save()
+        user.save(update_fields=['last_login', 'ip_address'])
 
         # Send new login notification email
         send_new_login_email(user, ip_address)
@@ -680,7 +687,7 @@ class CreateTransactionPinView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         user.set_transaction_pin(serializer.validated_data['pin'])
-        user.save()
+        user.save(update_fields=['transaction_pin', 'has_pin'])
 
         return Response(
             {'detail': 'Transaction PIN created successfully.'},
@@ -713,7 +720,7 @@ class UpdateTransactionPinView(APIView):
             )
 
         user.set_transaction_pin(serializer.validated_data['new_pin'])
-        user.save()
+        user.save(update_fields=['transaction_pin', 'has_pin'])
 
         return Response(
             {'detail': 'Transaction PIN updated successfully.'},
@@ -777,7 +784,7 @@ class SubmitLevel2CredentialsView(APIView):
         )
 
         user.level2_credentials = credentials
-        user.save()
+        user.save(update_fields=['level2_credentials'])
 
         return Response(
             {'detail': 'Level 2 credentials submitted successfully. Awaiting approval.'},
@@ -829,7 +836,7 @@ class SubmitLevel3CredentialsView(APIView):
         )
 
         user.level3_credentials = credentials
-        user.save()
+        user.save(update_fields=['level3_credentials'])
 
         return Response(
             {'detail': 'Level 3 credentials submitted successfully. Awaiting approval.'},
@@ -842,12 +849,23 @@ class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserProfileSerializer
 
-    def get(self, request: Request) -> Response:
+    def get(self, request: Request) -> Response | HttpResponseBase:
+        # The ETag is the profile version, which every change to the data
+        # below bumps, so an unchanged profile costs no queries beyond auth.
+        etag = profile_etag(request.user.pk)
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
         # Always reconcile balances from source transactions before returning profile.
         recalculate_user_balances(request.user)
-        request.user.refresh_from_db(fields=['pending_balance', 'withdrawable_balance'])
+        request.user.wallet.refresh_from_db()
         serializer = self.serializer_class(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
 
 
 class DeleteAccountView(APIView):
@@ -883,7 +901,7 @@ class UploadProfilePictureView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         user.dp = serializer.validated_data['dp']
-        user.save()
+        user.save(update_fields=['dp'])
 
         return Response(
             {'detail': 'Profile picture uploaded successfully.'},
@@ -909,7 +927,7 @@ class UpdateProfilePictureView(APIView):
             user.dp.delete(save=False)
 
         user.dp = serializer.validated_data['dp']
-        user.save()
+        user.save(update_fields=['dp'])
 
         return Response(
             {'detail': 'Profile picture updated successfully.'},
@@ -939,7 +957,7 @@ class ChangePasswordView(APIView):
             )
 
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
 
         return Response(
             {'detail': 'Password changed successfully.'},
@@ -1247,34 +1265,87 @@ class DeleteBankDetailsView(APIView):
         )
 
 
+class TransactionHistoryPagination(CreatedAtKeysetPagination):
+    newest_first = True
+    page_size = 20
+    max_page_size = 100
+
+
 class UserTransactionHistoryView(APIView):
-    """Get grouped transaction history for the authenticated user."""
+    """
+    Transaction history for the authenticated user, grouped into pending,
+    approved and rejected buckets.
+
+    By default the response is the original three full lists, which
+    released mobile clients expect. ``paginated=true`` returns each
+    bucket's count and total and its first page instead. ``summary=true``
+    returns only the counts and totals, from a single aggregate query.
+    ``bucket`` pages through one bucket, newest first, following its
+    ``next`` link. ``start_date`` and ``end_date`` narrow every mode to a
+    date range.
+    """
     permission_classes = [IsAuthenticated]
     serializer_class = GiftCardOrderHistorySerializer
+    pagination_class = TransactionHistoryPagination
 
-    pending_statuses = ("Pending", "Processing")
-    approved_statuses = ("Approved", "Completed")
-    rejected_statuses = ("Rejected",)
+    buckets = {
+        "pending": ("Pending", "Processing"),
+        "approved": ("Approved", "Completed"),
+        "rejected": ("Rejected",),
+    }
 
+    @extend_schema(parameters=[TransactionHistoryFilterSerializer])
     def get(self, request: Request) -> Response:
-        user = request.user
-        user_orders = GiftCardOrder.objects.filter(user=user).select_related(
-            "card",
-            "card__store",
-        ).order_by("-created_at", "-id")
+        filters = TransactionHistoryFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        user_orders = filters.filter_queryset(GiftCardOrder.objects.filter(user=request.user))
 
-        pending_orders = user_orders.filter(status__in=self.pending_statuses)
-        approved_orders = user_orders.filter(status__in=self.approved_statuses)
-        rejected_orders = user_orders.filter(status__in=self.rejected_statuses)
+        bucket = filters.validated_data.get("bucket")
+        if bucket:
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(self.get_bucket_queryset(user_orders, bucket), request, view=self)
+            return paginator.get_paginated_response(self.serializer_class(page, many=True).data)
 
-        return Response(
-            {
-                "pending": self.serializer_class(pending_orders, many=True).data,
-                "approved": self.serializer_class(approved_orders, many=True).data,
-                "rejected": self.serializer_class(rejected_orders, many=True).data,
-            },
-            status=status.HTTP_200_OK,
-        )
+        if not filters.validated_data["summary"] and not filters.validated_data["paginated"]:
+            return Response(
+                {
+                    name: self.serializer_class(
+                        self.get_bucket_queryset(user_orders, name).order_by("-created_at", "-id"), many=True,
+                    ).data
+                    for name in self.buckets
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        data = {"summary": self.summarize(user_orders)}
+        if not filters.validated_data["summary"]:
+            for name in self.buckets:
+                data[name] = self.get_first_page(user_orders, name, request)
+        return Response(data, status=status.HTTP_200_OK)
+
+    def get_bucket_queryset(self, user_orders, bucket: str):
+        return user_orders.filter(status__in=self.buckets[bucket]).select_related("card", "card__store")
+
+    def summarize(self, user_orders) -> dict:
+        aggregates = {}
+        for name, statuses in self.buckets.items():
+            in_bucket = Q(status__in=statuses)
+            aggregates[f"{name}_count"] = Count("id", filter=in_bucket)
+            aggregates[f"{name}_total"] = Coalesce(Sum("amount", filter=in_bucket), 0)
+        totals = user_orders.aggregate(**aggregates)
+        return {
+            name: {"count": totals[f"{name}_count"], "total_amount": totals[f"{name}_total"]}
+            for name in self.buckets
+        }
+
+    def get_first_page(self, user_orders, bucket: str, request: Request) -> dict:
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(self.get_bucket_queryset(user_orders, bucket), request, view=self)
+        next_link = paginator.get_next_link()
+        return {
+            "next": replace_query_param(next_link, "bucket", bucket) if next_link else None,
+            "results": self.serializer_class(page, many=True).data,
+        }
 
 
 class UserOrdersView(ListAPIView):
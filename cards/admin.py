@@ -1,6 +1,20 @@
 from django.contrib import admin
-from .models import GiftCardNames, GiftCardStore
+from .models import CardRateVersion, GiftCardNames, GiftCardStore
 
 
 admin.site.register(GiftCardStore)
 admin.site.register(GiftCardNames)
+
+
+@admin.register(CardRateVersion)
+class CardRateVersionAdmin(admin.ModelAdmin):
+  list_display = ("card_name", "store_name", "version", "rate", "created_at")
+  list_filter = ("store_name",)
+  search_fields = ("card_name", "store_name")
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    # Rate history is append-only; edit the card's rate instead.
+    return False
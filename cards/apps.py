@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CardsConfig(AppConfig):
     name = 'cards'
+
+    def ready(self):
+        # Import signals to connect them
+        import cards.signals
@@ -0,0 +1,78 @@
+"""
+Cached gift card catalog.
+
+The catalog (every store with its cards) is built with one prefetch query,
+rendered to JSON once and kept in the cache as bytes under the catalog
+version. Any store or card write bumps the version on commit, so the next
+request builds a fresh snapshot; until then requests are answered with the
+stored bytes without touching the database or the serializers. The version
+is also the catalog endpoints' ETag.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from cards.models import GiftCardNames, GiftCardStore
+from cards.serializers import GiftCardStoreListSerializer
+from gtx.cache_generations import bump_generation_on_commit, get_generation
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'cards:catalog:version'
+CATALOG_KEY = 'cards:catalog:{version}:{origin}'
+
+
+def catalog_queryset():
+    return GiftCardStore.objects.prefetch_related(
+        Prefetch('giftcardnames_set', queryset=GiftCardNames.objects.order_by('id')),
+    ).order_by('id')
+
+
+def render_catalog(request) -> bytes:
+    data = GiftCardStoreListSerializer(catalog_queryset(), many=True, context={'request': request}).data
+    return JSONRenderer().render(data)
+
+
+def invalidate_catalog() -> None:
+    """Drop the catalog snapshot once the current transaction commits."""
+    bump_generation_on_commit(CATALOG_VERSION_KEY)
+
+
+def get_catalog_version() -> int | None:
+    """Current catalog version; None when the cache is unavailable."""
+    return get_generation(CATALOG_VERSION_KEY)
+
+
+def catalog_etag(version: int | None, variant: str) -> str | None:
+    if version is None:
+        return None
+    return f'"catalog-{variant}-{version}"'
+
+
+def get_catalog_snapshot(request, version: int | None) -> bytes:
+    """
+    Return the rendered catalog of ``version`` for ``request``, rendering
+    and caching it on a miss. Image URLs are absolute, so snapshots are kept
+    per scheme and host.
+    """
+    if version is None:
+        return render_catalog(request)
+
+    origin = hashlib.sha256(request.build_absolute_uri('/').encode()).hexdigest()[:16]
+    key = CATALOG_KEY.format(version=version, origin=origin)
+    try:
+        content = cache.get(key)
+    except Exception as exc:
+        logger.warning("Could not read the cached catalog: %s", exc)
+        content = None
+    if content is None:
+        content = render_catalog(request)
+        try:
+            cache.set(key, content, settings.CARD_CATALOG_CACHE_TIMEOUT)
+        except Exception as exc:
+            logger.warning("Could not cache the catalog: %s", exc)
+    return content
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def publish_current_rates(apps, schema_editor):
+    GiftCardNames = apps.get_model('cards', 'GiftCardNames')
+    CardRateVersion = apps.get_model('cards', 'CardRateVersion')
+
+    CardRateVersion.objects.bulk_create(
+        CardRateVersion(card=card, version=1, rate=card.rate, card_name=card.name, store_name=card.store.name)
+        for card in GiftCardNames.objects.select_related('store').iterator()
+    )
+    GiftCardNames.objects.update(rate_version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0013_alter_giftcardnames_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='giftcardnames',
+            name='rate_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='CardRateVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('card_name', models.CharField(max_length=150)),
+                ('store_name', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('card', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rate_versions', to='cards.giftcardnames')),
+            ],
+            options={
+                'ordering': ['card_id', '-version'],
+                'constraints': [models.UniqueConstraint(fields=('card', 'version'), name='card_rate_version_unique')],
+            },
+        ),
+        migrations.RunPython(publish_current_rates, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from gtx.tracking import TrackedFieldsMixin
+
 user = get_user_model()
 
 class GiftCardStore(models.Model):
@@ -22,13 +24,15 @@ class GiftCardStore(models.Model):
     return self.name
 
 
-class GiftCardNames(models.Model):
+class GiftCardNames(TrackedFieldsMixin, models.Model):
   TYPE_CHOICES = [
     ("Both", "Both"),
     ("Physical", "Physical"),
     ("E-code", "E-code"),
 
   ]
+  tracked_fields = ("rate",)
+
   type = models.CharField(choices=TYPE_CHOICES, max_length=50, default="Both")
   name = models.CharField(max_length=150)
   store = models.ForeignKey(GiftCardStore, on_delete=models.CASCADE)
@@ -39,8 +43,46 @@ class GiftCardNames(models.Model):
     default=Decimal("0.00"),
     validators=[MinValueValidator(Decimal("0.00"))],
   )
+  # Number of the CardRateVersion that holds the current rate.
+  rate_version = models.PositiveIntegerField(default=0, editable=False)
   created_at = models.DateTimeField(auto_now_add=True, null=True)
 
   def __str__(self) -> str:
     return self.name
 
+  def save(self, *args, **kwargs):
+    # rate_version is only set by cards.rates, under a lock on the row. A
+    # card loaded before another edit or a rate sheet must not write its
+    # old number back, nor a rate it did not change.
+    if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+      skipped = {"rate_version"} if self.has_changed("rate") else {"rate_version", "rate"}
+      kwargs["update_fields"] = [
+        field.name for field in self._meta.concrete_fields
+        if not field.primary_key and field.name not in skipped
+      ]
+    super().save(*args, **kwargs)
+
+
+class CardRateVersion(models.Model):
+  """
+  One published rate of a gift card. Rows are never edited: every rate
+  change adds the next version, and orders point at the version they were
+  quoted with. Card and store names are copied so a past payout can be
+  explained after the card is renamed or deleted.
+  """
+  card = models.ForeignKey(GiftCardNames, on_delete=models.SET_NULL, null=True, related_name="rate_versions")
+  version = models.PositiveIntegerField()
+  rate = models.DecimalField(decimal_places=2, max_digits=12)
+  card_name = models.CharField(max_length=150)
+  store_name = models.CharField(max_length=50)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    ordering = ["card_id", "-version"]
+    constraints = [
+      models.UniqueConstraint(fields=["card", "version"], name="card_rate_version_unique"),
+    ]
+
+  def __str__(self) -> str:
+    return f"{self.card_name} v{self.version} @ {self.rate}"
+
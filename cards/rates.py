@@ -0,0 +1,218 @@
+"""
+Card rate history and payout quotes.
+
+Every rate a card has had is kept as a CardRateVersion, and
+GiftCardNames.rate_version names the current one. Orders lock the version
+and the payout they were quoted with, so a later rate edit never changes
+what an order already placed is worth.
+
+Quotes read a rate table (card id -> current version) cached at two
+levels: a dict in each process and the shared cache. The shared cache also
+holds a generation number that is bumped whenever a rate changes. A process
+keeps the table of the generation it loaded and reloads once the number
+moves, so a rate edit reaches every worker on its next quote. Without the
+shared cache, quotes read the database.
+
+Rate sheets (apply_rate_sheet) set many rates in one transaction and
+invalidate the rate table and the catalog once for the whole sheet.
+"""
+import logging
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from cards.catalog import invalidate_catalog
+from cards.models import CardRateVersion, GiftCardNames
+from gtx.cache_generations import bump_generation_on_commit, get_generation
+
+logger = logging.getLogger(__name__)
+
+RATE_TABLE_GENERATION_KEY = 'cards:rate_table:generation'
+RATE_TABLE_KEY = 'cards:rate_table:{generation}'
+
+
+@dataclass(frozen=True)
+class RateEntry:
+    version_id: int
+    version: int
+    rate: Decimal
+
+
+@dataclass(frozen=True)
+class PayoutQuote:
+    card_id: int
+    amount: int
+    rate: Decimal
+    rate_version: int
+    rate_version_id: int
+    payout: Decimal
+
+
+@dataclass(frozen=True)
+class RateChange:
+    card_id: int
+    old_rate: Decimal
+    rate: Decimal
+    rate_version: int
+
+
+class UnknownCardsError(Exception):
+    def __init__(self, card_ids: list[int]):
+        super().__init__(f"Gift cards not found: {card_ids}")
+        self.card_ids = card_ids
+
+
+# (generation, table) of the rate table this process loaded last.
+_local_table: tuple[int, dict[int, RateEntry]] | None = None
+
+
+def record_rate_version(card: GiftCardNames) -> CardRateVersion:
+    """
+    Publish the card's committed rate as its next version. The rate is read
+    from the locked row, not the instance, so a save that raced another
+    edit cannot publish a rate the card no longer has.
+    """
+    with transaction.atomic():
+        locked = GiftCardNames.objects.select_for_update().select_related('store').get(pk=card.pk)
+        version = CardRateVersion.objects.create(
+            card=locked,
+            version=locked.rate_version + 1,
+            rate=locked.rate,
+            card_name=locked.name,
+            store_name=locked.store.name,
+        )
+        GiftCardNames.objects.filter(pk=card.pk).update(rate_version=version.version)
+    card.rate, card.rate_version = version.rate, version.version
+    invalidate_rate_table()
+    return version
+
+
+def apply_rate_sheet(rates: dict[int, Decimal]) -> list[RateChange]:
+    """
+    Set the rates of many cards (card id -> rate) in one transaction. Each
+    changed rate is published as the card's next version; cards already at
+    their sheet rate are left alone. Raises UnknownCardsError, changing
+    nothing, if any card does not exist.
+    """
+    with transaction.atomic():
+        cards = list(
+            GiftCardNames.objects.select_for_update().select_related('store')
+            .filter(pk__in=rates)
+            .order_by('id')
+        )
+        missing = sorted(set(rates) - {card.pk for card in cards})
+        if missing:
+            raise UnknownCardsError(missing)
+
+        changes, versions, changed_cards = [], [], []
+        for card in cards:
+            rate = rates[card.pk]
+            if card.rate == rate:
+                continue
+            changes.append(RateChange(card.pk, card.rate, rate, card.rate_version + 1))
+            card.rate = rate
+            card.rate_version += 1
+            changed_cards.append(card)
+            versions.append(CardRateVersion(
+                card=card,
+                version=card.rate_version,
+                rate=rate,
+                card_name=card.name,
+                store_name=card.store.name,
+            ))
+        if not changes:
+            return changes
+
+        # bulk_update skips the save signals, so the caches are invalidated
+        # here, once for the sheet rather than once per card.
+        GiftCardNames.objects.bulk_update(changed_cards, ['rate', 'rate_version'])
+        CardRateVersion.objects.bulk_create(versions)
+        invalidate_rate_table()
+        invalidate_catalog()
+    return changes
+
+
+def _forget_local_table() -> None:
+    global _local_table
+    _local_table = None
+
+
+def invalidate_rate_table() -> None:
+    """Make every process reload the rate table once the current transaction commits."""
+    bump_generation_on_commit(RATE_TABLE_GENERATION_KEY, _forget_local_table)
+
+
+def load_rate_table() -> dict[int, RateEntry]:
+    rows = CardRateVersion.objects.filter(card__isnull=False, version=F('card__rate_version'))
+    return {
+        card_id: RateEntry(version_id=version_id, version=version, rate=rate)
+        for card_id, version_id, version, rate in rows.values_list('card_id', 'id', 'version', 'rate')
+    }
+
+
+def get_rate_table() -> dict[int, RateEntry]:
+    global _local_table
+    generation = get_generation(RATE_TABLE_GENERATION_KEY)
+    if generation is None:
+        return load_rate_table()
+
+    local = _local_table
+    if local is not None and local[0] == generation:
+        return local[1]
+
+    key = RATE_TABLE_KEY.format(generation=generation)
+    try:
+        table = cache.get(key)
+    except Exception as exc:
+        logger.warning("Could not read the cached card rate table: %s", exc)
+        table = None
+    if table is None:
+        table = load_rate_table()
+        try:
+            cache.set(key, table, settings.CARD_RATE_TABLE_TIMEOUT)
+        except Exception as exc:
+            logger.warning("Could not cache the card rate table: %s", exc)
+    _local_table = (generation, table)
+    return table
+
+
+def calculate_payout(amount, rate: Decimal) -> Decimal:
+    return (Decimal(str(amount)) * rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _quote(card_id: int, amount, entry: RateEntry) -> PayoutQuote:
+    return PayoutQuote(
+        card_id=card_id,
+        amount=amount,
+        rate=entry.rate,
+        rate_version=entry.version,
+        rate_version_id=entry.version_id,
+        payout=calculate_payout(amount, entry.rate),
+    )
+
+
+def quote_payout(card: GiftCardNames | int, amount) -> PayoutQuote | None:
+    """Quote from the cached rate table; None for cards without a published rate."""
+    card_id = getattr(card, 'pk', card)
+    entry = get_rate_table().get(card_id)
+    if entry is None:
+        return None
+    return _quote(card_id, amount, entry)
+
+
+def lock_payout_quote(card: GiftCardNames, amount) -> PayoutQuote | None:
+    """
+    Quote for an order being placed. ``card`` must be freshly loaded: the
+    cached entry is only used if it is the card's current version.
+    """
+    entry = get_rate_table().get(card.pk)
+    if entry is None or entry.version != card.rate_version:
+        version = CardRateVersion.objects.filter(card=card, version=card.rate_version).first()
+        if version is None:
+            return None
+        entry = RateEntry(version_id=version.pk, version=version.version, rate=version.rate)
+    return _quote(card.pk, amount, entry)
@@ -0,0 +1,181 @@
+"""
+In-memory fuzzy search over gift card stores and cards.
+
+Each process keeps an index of store and card names built from one query.
+The index is tagged with the catalog version and rebuilt on the first search
+after the version moves, so typing never costs a database round trip.
+
+Names are split into lowercase words. A query word matches an indexed word
+when it is a prefix of it ("amaz" -> "amazon") or shares enough trigrams
+with it ("amazn" -> "amazon"). A card is scored on its own words and its
+store's words. Results rank by how many query words matched, then by how
+well they matched.
+"""
+import bisect
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from cards.catalog import get_catalog_version
+from cards.models import GiftCardNames, GiftCardStore
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+MIN_SIMILARITY = 0.3
+PREFIX_SCORE = 0.9
+# How long an index is trusted while the catalog version cannot be read.
+UNVERSIONED_MAX_AGE_SECONDS = 60
+
+
+def words(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def trigrams(word: str) -> set[str]:
+    padded = f'  {word} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class StoreEntry:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class CardEntry:
+    id: int
+    name: str
+    type: str
+    rate: Decimal
+    store: StoreEntry
+
+
+@dataclass
+class SearchIndex:
+    stores: list[StoreEntry]
+    cards: list[CardEntry]
+    # Vocabulary in sorted order for prefix lookups, with trigram sizes.
+    vocabulary: list[str] = field(default_factory=list)
+    trigram_counts: list[int] = field(default_factory=list)
+    postings: dict[str, list[int]] = field(default_factory=dict)
+    store_words: dict[int, set[int]] = field(default_factory=dict)
+    card_words: dict[int, set[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, stores: list[StoreEntry], cards: list[CardEntry]) -> 'SearchIndex':
+        index = cls(stores=stores, cards=cards)
+        store_text = {store.id: words(store.name) for store in stores}
+        card_text = {card.id: words(card.name) for card in cards}
+
+        index.vocabulary = sorted({
+            word for text in (*store_text.values(), *card_text.values()) for word in text
+        })
+        word_ids = {word: word_id for word_id, word in enumerate(index.vocabulary)}
+        postings = defaultdict(list)
+        for word_id, word in enumerate(index.vocabulary):
+            grams = trigrams(word)
+            index.trigram_counts.append(len(grams))
+            for gram in grams:
+                postings[gram].append(word_id)
+        index.postings = dict(postings)
+        index.store_words = {store_id: {word_ids[word] for word in text} for store_id, text in store_text.items()}
+        index.card_words = {card_id: {word_ids[word] for word in text} for card_id, text in card_text.items()}
+        return index
+
+    def match_word(self, query_word: str) -> dict[int, float]:
+        """Similarity of ``query_word`` to each vocabulary word it matches."""
+        grams = trigrams(query_word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for word_id in self.postings.get(gram, ()):
+                shared[word_id] += 1
+        matches = {}
+        for word_id, count in shared.items():
+            similarity = count / (len(grams) + self.trigram_counts[word_id] - count)
+            if similarity >= MIN_SIMILARITY:
+                matches[word_id] = similarity
+
+        start = bisect.bisect_left(self.vocabulary, query_word)
+        for word_id in range(start, len(self.vocabulary)):
+            word = self.vocabulary[word_id]
+            if not word.startswith(query_word):
+                break
+            score = 1.0 if word == query_word else PREFIX_SCORE
+            matches[word_id] = max(matches.get(word_id, 0.0), score)
+        return matches
+
+    @staticmethod
+    def _score(word_ids: set[int], matches: list[dict[int, float]]) -> tuple[int, float]:
+        matched, total = 0, 0.0
+        for query_matches in matches:
+            best = max((query_matches.get(word_id, 0.0) for word_id in word_ids), default=0.0)
+            if best:
+                matched += 1
+                total += best
+        return matched, total
+
+    def search(self, query: str, limit: int) -> dict[str, list]:
+        matches = [self.match_word(word) for word in words(query)]
+        if not any(matches):
+            return {'stores': [], 'cards': []}
+
+        ranked_stores = []
+        for store in self.stores:
+            matched, score = self._score(self.store_words[store.id], matches)
+            if matched:
+                ranked_stores.append(((-matched, -score, store.name), store))
+
+        ranked_cards = []
+        for card in self.cards:
+            word_ids = self.card_words[card.id] | self.store_words.get(card.store.id, set())
+            matched, score = self._score(word_ids, matches)
+            if matched:
+                ranked_cards.append(((-matched, -score, card.name), card))
+
+        ranked_stores.sort(key=lambda item: item[0])
+        ranked_cards.sort(key=lambda item: item[0])
+        return {
+            'stores': [store for _, store in ranked_stores[:limit]],
+            'cards': [card for _, card in ranked_cards[:limit]],
+        }
+
+
+def load_search_index() -> SearchIndex:
+    stores = {store.id: store for store in (
+        StoreEntry(id=store_id, name=name)
+        for store_id, name in GiftCardStore.objects.values_list('id', 'name')
+    )}
+    cards = [
+        CardEntry(id=card_id, name=name, type=card_type, rate=rate, store=stores[store_id])
+        for card_id, name, card_type, rate, store_id in GiftCardNames.objects.values_list(
+            'id', 'name', 'type', 'rate', 'store_id',
+        )
+        if store_id in stores
+    ]
+    return SearchIndex.build(list(stores.values()), cards)
+
+
+# (catalog version, built at, index) of the index this process built last.
+_local_index: tuple[int | None, float, SearchIndex] | None = None
+
+
+def get_search_index() -> SearchIndex:
+    global _local_index
+    version = get_catalog_version()
+    local = _local_index
+    if local is not None:
+        local_version, built_at, index = local
+        if version is not None and local_version == version:
+            return index
+        if version is None and time.monotonic() - built_at < UNVERSIONED_MAX_AGE_SECONDS:
+            return index
+
+    index = load_search_index()
+    _local_index = (version, time.monotonic(), index)
+    return index
+
+
+def search_catalog(query: str, limit: int = 10) -> dict[str, list]:
+    return get_search_index().search(query, limit)
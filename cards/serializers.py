@@ -19,5 +19,41 @@ class GiftCardStoreListSerializer(serializers.ModelSerializer):
 
   @extend_schema_field(GiftCardNameSerializer(many=True))
   def get_cards(self, obj) -> list[dict]:
-    cards = GiftCardNames.objects.filter(store=obj)
-    return GiftCardNameSerializer(cards, many=True).data
+    # Served from the prefetch when the queryset has one.
+    return GiftCardNameSerializer(obj.giftcardnames_set.all(), many=True).data
+
+
+class PayoutQuoteRequestSerializer(serializers.Serializer):
+  card = serializers.IntegerField(min_value=1)
+  amount = serializers.IntegerField(min_value=1)
+
+
+class PayoutQuoteSerializer(serializers.Serializer):
+  card = serializers.IntegerField(source="card_id")
+  amount = serializers.IntegerField()
+  rate = serializers.DecimalField(max_digits=12, decimal_places=2)
+  rate_version = serializers.IntegerField()
+  payout = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class GiftCardSearchRequestSerializer(serializers.Serializer):
+  q = serializers.CharField(max_length=100)
+  limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class GiftCardSearchStoreSerializer(serializers.Serializer):
+  id = serializers.IntegerField()
+  name = serializers.CharField()
+
+
+class GiftCardSearchCardSerializer(serializers.Serializer):
+  id = serializers.IntegerField()
+  name = serializers.CharField()
+  type = serializers.CharField()
+  rate = serializers.DecimalField(max_digits=12, decimal_places=2)
+  store = GiftCardSearchStoreSerializer()
+
+
+class GiftCardSearchSerializer(serializers.Serializer):
+  stores = GiftCardSearchStoreSerializer(many=True)
+  cards = GiftCardSearchCardSerializer(many=True)
@@ -0,0 +1,30 @@
+"""
+Django signals that keep card rate history, the cached rate table and the
+cached catalog in step with store and card edits.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cards.catalog import invalidate_catalog
+from cards.models import GiftCardNames, GiftCardStore
+from cards.rates import invalidate_rate_table, record_rate_version
+
+
+@receiver(post_save, sender=GiftCardNames)
+def record_card_rate(sender, instance, created, **kwargs):
+    """Publish a new rate version when a card is created or its rate changes."""
+    if created or instance.has_changed('rate'):
+        record_rate_version(instance)
+
+
+@receiver(post_delete, sender=GiftCardNames)
+def drop_deleted_card_rate(sender, instance, **kwargs):
+    invalidate_rate_table()
+
+
+@receiver(post_save, sender=GiftCardStore)
+@receiver(post_delete, sender=GiftCardStore)
+@receiver(post_save, sender=GiftCardNames)
+@receiver(post_delete, sender=GiftCardNames)
+def drop_catalog_snapshot(sender, **kwargs):
+    invalidate_catalog()
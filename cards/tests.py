@@ -1,3 +1,205 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from account.models import UserProfile
+from cards import rates, search
+from cards.models import CardRateVersion, GiftCardNames, GiftCardStore
+from order.models import GiftCardOrder
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class PayoutQuoteTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        rates._local_table = None
+        store = GiftCardStore.objects.create(name='Apple', category='Popular')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.card = GiftCardNames.objects.create(store=store, name='Apple US', type='E-code', rate=Decimal('1450.00'))
+        self.user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.user)
+
+    def change_rate(self, rate):
+        card = GiftCardNames.objects.get(pk=self.card.pk)
+        card.rate = rate
+        with self.captureOnCommitCallbacks(execute=True):
+            card.save()
+
+    def test_rate_edits_add_versions_and_leave_placed_orders_alone(self):
+        response = self.client.post(
+            reverse('create_order'), {'type': 'E-Code', 'card': self.card.id, 'amount': 100, 'e_code_pin': 'ABCD-1234'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['payout_amount'], Decimal('145000.00'))
+
+        self.change_rate(Decimal('1500.00'))
+
+        order = GiftCardOrder.objects.get(pk=response.data['order_id'])
+        self.assertEqual(order.payout_amount, Decimal('145000.00'))
+        self.assertEqual((order.rate_version.version, order.rate_version.rate), (1, Decimal('1450.00')))
+        self.assertEqual(
+            list(CardRateVersion.objects.filter(card=self.card).values_list('version', 'rate')),
+            [(2, Decimal('1500.00')), (1, Decimal('1450.00'))],
+        )
+        quote = self.client.get(reverse('gift_card_payout_quote'), {'card': self.card.id, 'amount': 100})
+        self.assertEqual(quote.data['rate_version'], 2)
+        self.assertEqual(quote.data['payout'], '150000.00')
+
+    def test_stale_card_save_publishes_the_next_version(self):
+        stale = GiftCardNames.objects.get(pk=self.card.pk)
+        self.change_rate(Decimal('1500.00'))
+
+        stale.rate = Decimal('1550.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.save()
+
+        card = GiftCardNames.objects.get(pk=self.card.pk)
+        self.assertEqual((card.rate, card.rate_version), (Decimal('1550.00'), 3))
+        self.assertEqual(
+            list(CardRateVersion.objects.filter(card=card).values_list('version', 'rate')),
+            [(3, Decimal('1550.00')), (2, Decimal('1500.00')), (1, Decimal('1450.00'))],
+        )
+
+    def test_stale_save_racing_another_edit_publishes_the_committed_rate(self):
+        publish = rates.record_rate_version
+        racing = []
+
+        def edit_before_publishing(card):
+            if not racing:
+                racing.append(card)
+                self.change_rate(Decimal('1600.00'))
+            return publish(card)
+
+        stale = GiftCardNames.objects.get(pk=self.card.pk)
+        stale.rate = Decimal('1550.00')
+        with patch('cards.signals.record_rate_version', side_effect=edit_before_publishing), \
+                self.captureOnCommitCallbacks(execute=True):
+            stale.save()
+
+        card = GiftCardNames.objects.get(pk=self.card.pk)
+        latest = CardRateVersion.objects.filter(card=card).first()
+        self.assertEqual((card.rate, card.rate_version), (Decimal('1600.00'), 3))
+        self.assertEqual((latest.version, latest.rate), (3, Decimal('1600.00')))
+        self.assertEqual(rates.quote_payout(card, 1).rate, Decimal('1600.00'))
+
+    def test_quotes_are_served_from_the_cached_rate_table(self):
+        self.assertEqual(rates.quote_payout(self.card, 10).payout, Decimal('14500.00'))
+
+        with CaptureQueriesContext(connection) as queries:
+            quote = rates.quote_payout(self.card.pk, 3)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(quote.payout, Decimal('4350.00'))
+
+        # Another process only shares the cache, not the in-process table.
+        rates._local_table = None
+        with CaptureQueriesContext(connection) as queries:
+            rates.quote_payout(self.card.pk, 3)
+        self.assertEqual(len(queries), 0)
+
+    def test_unversioned_card_has_no_quote(self):
+        GiftCardNames.objects.filter(pk=self.card.pk).update(rate_version=0)
+        CardRateVersion.objects.all().delete()
+        rates._local_table = None
+        cache.clear()
+
+        response = self.client.get(reverse('gift_card_payout_quote'), {'card': self.card.id, 'amount': 100})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogSnapshotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for index in range(3):
+            store = GiftCardStore.objects.create(name=f'Store {index}', category='Popular')
+            for card_index in range(2):
+                GiftCardNames.objects.create(store=store, name=f'Card {index}-{card_index}', rate=Decimal('100.00'))
+        self.url = reverse('gift_card_store_list_view')
+
+    def test_catalog_is_built_with_one_prefetch_and_then_served_from_cache(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([len(store['cards']) for store in first.json()], [2, 2, 2])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(second.content, first.content)
+
+    def test_card_edit_replaces_the_snapshot(self):
+        self.client.get(self.url)
+        card = GiftCardNames.objects.order_by('id').first()
+        card.rate = Decimal('125.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            card.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()[0]['cards'][0]['rate'], '125.00')
+
+    def test_catalog_endpoints_answer_matching_etags_with_304(self):
+        stores = self.client.get(self.url)
+        cards = self.client.get(reverse('gift_card_list_view'))
+        self.assertNotEqual(stores['ETag'], cards['ETag'])
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=stores['ETag'])
+            cards_not_modified = self.client.get(reverse('gift_card_list_view'), HTTP_IF_NONE_MATCH=cards['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cards_not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GiftCardStore.objects.create(name='New store', category='Popular')
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=stores['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], stores['ETag'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class GiftCardSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        search._local_index = None
+        amazon = GiftCardStore.objects.create(name='Amazon', category='Popular')
+        steam = GiftCardStore.objects.create(name='Steam', category='Popular')
+        GiftCardNames.objects.create(store=amazon, name='Amazon US', rate=Decimal('900.00'))
+        self.wallet = GiftCardNames.objects.create(store=steam, name='Steam Wallet', rate=Decimal('800.00'))
+        GiftCardNames.objects.create(store=steam, name='Steam Germany', rate=Decimal('700.00'))
+        self.url = reverse('gift_card_search')
+
+    def test_typos_and_partial_words_find_ranked_matches(self):
+        response = self.client.get(self.url, {'q': 'amazn'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([store['name'] for store in response.data['stores']], ['Amazon'])
+        self.assertEqual([card['name'] for card in response.data['cards']], ['Amazon US'])
+
+        response = self.client.get(self.url, {'q': 'steam wal'})
+        self.assertEqual(response.data['cards'][0]['id'], self.wallet.id)
+        self.assertEqual(response.data['cards'][0]['store']['name'], 'Steam')
+
+        self.assertEqual(self.client.get(self.url, {'q': 'xbox'}).data, {'stores': [], 'cards': []})
+
+    def test_index_is_reused_until_the_catalog_changes(self):
+        self.client.get(self.url, {'q': 'steam'})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'q': 'steam w'})
+            self.client.get(self.url, {'q': 'steam wa'})
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.wallet.name = 'Steam Card'
+            self.wallet.save()
+        response = self.client.get(self.url, {'q': 'steam card'})
+        self.assertEqual(response.data['cards'][0]['name'], 'Steam Card')
@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import GiftCardStoreListView, GiftCardListView
+from .views import GiftCardStoreListView, GiftCardListView, PayoutQuoteView, GiftCardSearchView
 
 urlpatterns = [
     path('gift-card-stores/', GiftCardStoreListView.as_view(), name="gift_card_store_list_view"),
     path('gift-cards/', GiftCardListView.as_view(), name="gift_card_list_view"),
+    path('gift-cards/quote/', PayoutQuoteView.as_view(), name="gift_card_payout_quote"),
+    path('gift-cards/search/', GiftCardSearchView.as_view(), name="gift_card_search"),
 ] 
\ No newline at end of file
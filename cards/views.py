@@ -1,15 +1,94 @@
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny
-from cards.models import GiftCardStore, GiftCardNames
-from .serializers import GiftCardStoreListSerializer, GiftCardNameSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from cards.catalog import catalog_etag, catalog_queryset, get_catalog_snapshot, get_catalog_version
+from cards.models import GiftCardNames
+from cards.rates import quote_payout
+from cards.search import search_catalog
+from .serializers import (
+    GiftCardSearchRequestSerializer,
+    GiftCardSearchSerializer,
+    GiftCardStoreListSerializer,
+    GiftCardNameSerializer,
+    PayoutQuoteRequestSerializer,
+    PayoutQuoteSerializer,
+)
 
 
 class GiftCardStoreListView(ListAPIView):
+    """
+    The gift card catalog: every store with its cards. Served from the
+    cached snapshot in cards.catalog.
+    """
     serializer_class = GiftCardStoreListSerializer
-    queryset = GiftCardStore.objects.all()
+
+    def get_queryset(self):
+        return catalog_queryset()
+
+    def list(self, request, *args, **kwargs):
+        version = get_catalog_version()
+        etag = catalog_etag(version, 'stores')
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+        response = HttpResponse(get_catalog_snapshot(request, version), content_type='application/json')
+        if etag is not None:
+            response['ETag'] = etag
+        return response
 
 
 class GiftCardListView(ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = GiftCardNameSerializer
-    queryset = GiftCardNames.objects.all()
\ No newline at end of file
+    queryset = GiftCardNames.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        # Card writes bump the catalog version, so it versions this list too.
+        etag = catalog_etag(get_catalog_version(), 'cards')
+        if etag is not None:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+
+class PayoutQuoteView(APIView):
+    """Quote the payout for an amount of a gift card at its current rate."""
+    permission_classes = [AllowAny]
+    serializer_class = PayoutQuoteSerializer
+
+    @extend_schema(parameters=[PayoutQuoteRequestSerializer], responses=PayoutQuoteSerializer)
+    def get(self, request):
+        params = PayoutQuoteRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        quote = quote_payout(params.validated_data["card"], params.validated_data["amount"])
+        if quote is None:
+            raise NotFound("No rate is published for this gift card.")
+        return Response(self.serializer_class(quote).data)
+
+
+class GiftCardSearchView(APIView):
+    """
+    Fuzzy search over store and card names for search-as-you-type. Answered
+    from the process-local index in cards.search.
+    """
+    permission_classes = [AllowAny]
+    serializer_class = GiftCardSearchSerializer
+
+    @extend_schema(parameters=[GiftCardSearchRequestSerializer], responses=GiftCardSearchSerializer)
+    def get(self, request):
+        params = GiftCardSearchRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        results = search_catalog(params.validated_data["q"], params.validated_data["limit"])
+        return Response(self.serializer_class(results).data)
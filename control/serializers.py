@@ -1,9 +1,15 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from decimal import Decimal
 from cards.models import GiftCardNames, GiftCardStore
 from account.models import Level2Credentials, Level3Credentials, UserProfile
-from order.models import GiftCardOrder
+from order.models import GiftCardOrder, OrderDuplicateMatch
+from order.serializers import OrderImageVariantField
 from withdrawal.models import Withdrawal, WithdrawalAuditLog
 
 class GiftCardInputSerializer(serializers.ModelSerializer):
@@ -100,10 +106,121 @@ class CredentialApprovalSerializer(serializers.Serializer):
 
 class TransactionSerializer(serializers.ModelSerializer):
     user = UserBasicSerializer(read_only=True)
+    image_review = OrderImageVariantField()
+    image_thumbnail = OrderImageVariantField()
 
     class Meta:
         model = GiftCardOrder
-        fields = ['id', 'type', 'card', 'image', 'e_code_pin', 'amount', 'status', 'user']
+        fields = ['id', 'type', 'card', 'image', 'image_review', 'image_thumbnail', 'e_code_pin', 'amount', 'status', 'user']
+
+
+class OrderDuplicateMatchSerializer(serializers.ModelSerializer):
+    order_id = serializers.IntegerField(source='matched_order_id', read_only=True)
+
+    class Meta:
+        model = OrderDuplicateMatch
+        fields = ['order_id', 'kind', 'distance']
+
+
+class OrderReviewQueueSerializer(serializers.ModelSerializer):
+    user = UserBasicSerializer(read_only=True)
+    card_name = serializers.CharField(source='card.name', read_only=True, default=None)
+    store = serializers.IntegerField(source='card.store_id', read_only=True, default=None)
+    store_name = serializers.CharField(source='card.store.name', read_only=True, default=None)
+    image_review = OrderImageVariantField()
+    image_thumbnail = OrderImageVariantField()
+    duplicates = OrderDuplicateMatchSerializer(source='duplicate_matches', many=True, read_only=True)
+
+    class Meta:
+        model = GiftCardOrder
+        fields = [
+            'id', 'type', 'card', 'card_name', 'store', 'store_name', 'image',
+            'image_review', 'image_thumbnail', 'e_code_pin', 'amount', 'status',
+            'created_at', 'user', 'duplicates',
+        ]
+
+
+class OrderReviewQueueFilterSerializer(serializers.Serializer):
+    """Query parameters for the admin order review queue."""
+    status = serializers.ChoiceField(choices=GiftCardOrder.STATUS_CHOICES, required=False)
+    type = serializers.ChoiceField(choices=GiftCardOrder.TYPE_CHOICES, required=False)
+    card = serializers.IntegerField(min_value=1, required=False)
+    store = serializers.IntegerField(min_value=1, required=False)
+    user = serializers.IntegerField(min_value=1, required=False)
+    min_amount = serializers.IntegerField(required=False)
+    max_amount = serializers.IntegerField(required=False)
+    duplicates = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        min_amount, max_amount = attrs.get('min_amount'), attrs.get('max_amount')
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise serializers.ValidationError({"min_amount": "Minimum amount cannot exceed maximum amount."})
+        return attrs
+
+    def filter_queryset(self, queryset):
+        filters = {
+            'status': 'status',
+            'type': 'type',
+            'card': 'card_id',
+            'store': 'card__store_id',
+            'user': 'user_id',
+            'min_amount': 'amount__gte',
+            'max_amount': 'amount__lte',
+        }
+        queryset = queryset.filter(**{
+            lookup: self.validated_data[name]
+            for name, lookup in filters.items()
+            if name in self.validated_data
+        })
+        duplicates = self.validated_data.get('duplicates')
+        if duplicates is not None:
+            flagged = Exists(OrderDuplicateMatch.objects.filter(order=OuterRef('pk')))
+            queryset = queryset.filter(flagged if duplicates else ~flagged)
+        return queryset
+
+
+class OrderVolumeFilterSerializer(serializers.Serializer):
+    """Query parameters for the admin order volume report."""
+    GROUP_BY_CHOICES = ('period', 'card', 'store')
+    PERIOD_CHOICES = ('day', 'week', 'month')
+
+    group_by = serializers.ChoiceField(choices=GROUP_BY_CHOICES, default='period')
+    period = serializers.ChoiceField(choices=PERIOD_CHOICES, default='day')
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=GiftCardOrder.STATUS_CHOICES, required=False)
+    card = serializers.IntegerField(min_value=1, required=False)
+    store = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        start_date, end_date = attrs.get('start_date'), attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError({"start_date": "Start date cannot be after end date."})
+        return attrs
+
+    def filter_queryset(self, queryset):
+        filters = {
+            'start_date': 'day__gte',
+            'end_date': 'day__lte',
+            'status': 'status',
+            'card': 'card_id',
+            'store': 'card__store_id',
+        }
+        return queryset.filter(**{
+            lookup: self.validated_data[name]
+            for name, lookup in filters.items()
+            if name in self.validated_data
+        })
+
+
+class OrderClaimSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, default=10)
+
+    def validate_count(self, value):
+        max_count = settings.ORDER_REVIEW_CLAIM_MAX
+        if value > max_count:
+            raise serializers.ValidationError(f"At most {max_count} orders can be claimed at once.")
+        return value
 
 
 class OrderStatusUpdateSerializer(serializers.Serializer):
@@ -120,6 +237,68 @@ class OrderStatusUpdateSerializer(serializers.Serializer):
     admin_notes = serializers.CharField(required=False, allow_blank=True)
 
 
+class OrderStatusBulkItemSerializer(OrderStatusUpdateSerializer):
+    order_id = serializers.IntegerField(min_value=1)
+
+
+class OrderStatusBulkUpdateSerializer(serializers.Serializer):
+    updates = OrderStatusBulkItemSerializer(many=True, allow_empty=False)
+
+    def validate_updates(self, value):
+        max_items = settings.ORDER_BULK_UPDATE_MAX_ITEMS
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"At most {max_items} orders can be updated at once.")
+        order_ids = [item['order_id'] for item in value]
+        if len(order_ids) != len(set(order_ids)):
+            raise serializers.ValidationError("Each order can only appear once.")
+        return value
+
+
+class CardRateSheetItemSerializer(serializers.Serializer):
+    card = serializers.IntegerField(min_value=1)
+    rate = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0.00"))
+
+
+class CardRateSheetSerializer(serializers.Serializer):
+    """
+    A rate sheet, either as JSON ``rates`` or as an uploaded CSV ``file``
+    with ``card`` and ``rate`` columns. Validates to ``{"rates": {card id: rate}}``.
+    """
+    rates = CardRateSheetItemSerializer(many=True, required=False, allow_empty=False)
+    file = serializers.FileField(required=False, write_only=True)
+
+    def validate_file(self, value):
+        try:
+            text = value.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise serializers.ValidationError("The rate sheet must be UTF-8 encoded CSV.")
+        reader = csv.DictReader(io.StringIO(text))
+        if not {"card", "rate"} <= set(reader.fieldnames or ()):
+            raise serializers.ValidationError("The rate sheet needs 'card' and 'rate' columns.")
+        rows = [{"card": row["card"], "rate": row["rate"]} for row in reader]
+        if not rows:
+            raise serializers.ValidationError("The rate sheet has no rows.")
+        items = CardRateSheetItemSerializer(data=rows, many=True)
+        if not items.is_valid():
+            # Row 1 is the header.
+            raise serializers.ValidationError({
+                f"row {number}": errors for number, errors in enumerate(items.errors, start=2) if errors
+            })
+        return items.validated_data
+
+    def validate(self, attrs):
+        if ("rates" in attrs) == ("file" in attrs):
+            raise serializers.ValidationError("Send either 'rates' or a CSV 'file'.")
+        items = attrs.get("rates") or attrs["file"]
+        max_rows = settings.CARD_RATE_SHEET_MAX_ROWS
+        if len(items) > max_rows:
+            raise serializers.ValidationError(f"A rate sheet can have at most {max_rows} rows.")
+        rates = {item["card"]: item["rate"] for item in items}
+        if len(rates) != len(items):
+            raise serializers.ValidationError("Each card can only appear once.")
+        return {"rates": rates}
+
+
 # Withdrawal Admin Serializers
 
 class WithdrawalListSerializer(serializers.ModelSerializer):
@@ -1,10 +1,28 @@
 from decimal import Decimal
 
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-from cards.models import GiftCardNames, GiftCardStore
+from account.balances import get_user_balances
+from account.models import UserProfile
+from cards.catalog import get_catalog_version
+from cards.models import CardRateVersion, GiftCardNames, GiftCardStore
 from control.serializers import CreateGiftStoreSerializer, GiftCardListSerializer
+from notification import outbox
+from notification.models import Notification, OutboxEvent
+from order.models import GiftCardOrder, OrderReviewLease, OrderVolumeRollup
 
 
 class GiftCardRateTests(TestCase):
@@ -51,3 +69,290 @@ class GiftCardRateTests(TestCase):
 
         with self.assertRaises(ValidationError):
             card.full_clean()
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class TransactionStatusBulkUpdateTests(APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_superuser(email='admin@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('bulk_update_order_status')
+
+    def test_bulk_update_notifies_each_user_once(self):
+        seller = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        other = UserProfile.objects.create_user(email='other@example.com', password='StrongPassword123')
+        first = GiftCardOrder.objects.create(user=seller, type='E-Code', card=None, amount=300)
+        second = GiftCardOrder.objects.create(user=seller, type='E-Code', card=None, amount=200)
+        third = GiftCardOrder.objects.create(user=other, type='E-Code', card=None, amount=100)
+        OutboxEvent.objects.all().delete()
+
+        response = self.client.patch(self.url, {
+            'updates': [
+                {'order_id': first.id, 'status': 'Approved'},
+                {'order_id': second.id, 'status': 'Rejected'},
+                {'order_id': third.id, 'status': 'Approved'},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['users_notified'], 2)
+        self.assertEqual(get_user_balances(seller), (Decimal('0.00'), Decimal('300.00')))
+        self.assertEqual(outbox.dispatch()['delivered'], 2)
+        notifications = Notification.objects.filter(user=seller)
+        self.assertEqual(notifications.count(), 1)
+        self.assertEqual(notifications.get().notification_type, 'orders_updated')
+        self.assertEqual(Notification.objects.filter(user=other).count(), 1)
+
+    def test_unknown_order_rolls_back_the_whole_batch(self):
+        seller = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=seller, type='E-Code', card=None, amount=300)
+
+        response = self.client.patch(self.url, {
+            'updates': [
+                {'order_id': order.id, 'status': 'Approved'},
+                {'order_id': order.id + 100, 'status': 'Approved'},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'Pending')
+        self.assertEqual(get_user_balances(seller), (Decimal('300.00'), Decimal('0.00')))
+
+    def test_repeated_single_update_is_applied_once(self):
+        seller = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=seller, type='E-Code', card=None, amount=300)
+        url = reverse('update_order_status', args=[order.id])
+
+        first = self.client.patch(url, {'status': 'Approved'}, format='json')
+        repeat = self.client.patch(url, {'status': 'Approved'}, format='json')
+
+        self.assertEqual(first.data['detail'], 'Order status updated from Pending to Approved.')
+        self.assertEqual(repeat.data['detail'], 'Order status is already Approved.')
+        self.assertEqual(get_user_balances(seller), (Decimal('0.00'), Decimal('300.00')))
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class GiftCardRateSheetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = UserProfile.objects.create_superuser(email='admin@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.admin)
+        store = GiftCardStore.objects.create(name='Apple', category='Popular')
+        self.cards = [
+            GiftCardNames.objects.create(store=store, name=f'Apple {index}', rate=Decimal('100.00'))
+            for index in range(3)
+        ]
+        self.url = reverse('bulk_update_card_rates')
+
+    def test_sheet_publishes_versions_and_bumps_the_catalog_once(self):
+        first, second, third = self.cards
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {
+                'rates': [
+                    {'card': first.id, 'rate': '120.00'},
+                    {'card': second.id, 'rate': '95.50'},
+                    {'card': third.id, 'rate': '100.00'},
+                ],
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['unchanged'], 1)
+        self.assertEqual(
+            [(card['id'], card['rate'], card['rate_version']) for card in response.data['cards']],
+            [(first.id, '120.00', 2), (second.id, '95.50', 2)],
+        )
+        self.assertEqual(get_catalog_version(), version + 1)
+        first.refresh_from_db()
+        self.assertEqual((first.rate, first.rate_version), (Decimal('120.00'), 2))
+        self.assertEqual(CardRateVersion.objects.get(card=first, version=2).rate, Decimal('120.00'))
+        self.assertFalse(CardRateVersion.objects.filter(card=third, version=2).exists())
+
+    def test_card_loaded_before_a_sheet_saves_on_top_of_it(self):
+        first, second = self.cards[:2]
+        stale_first = GiftCardNames.objects.get(pk=first.pk)
+        stale_second = GiftCardNames.objects.get(pk=second.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.url, {
+                'rates': [{'card': first.id, 'rate': '120.00'}, {'card': second.id, 'rate': '110.00'}],
+            }, format='json')
+            stale_first.rate = Decimal('130.00')
+            stale_first.save()
+            stale_second.name = 'Apple renamed'
+            stale_second.save()
+
+        for card, rate, version in ((first, Decimal('130.00'), 3), (second, Decimal('110.00'), 2)):
+            card.refresh_from_db()
+            self.assertEqual((card.rate, card.rate_version), (rate, version))
+            self.assertEqual(CardRateVersion.objects.filter(card=card).first().rate, rate)
+        self.assertEqual(second.name, 'Apple renamed')
+
+    def test_csv_sheet_with_unknown_card_changes_nothing(self):
+        first = self.cards[0]
+        sheet = f'card,rate\n{first.id},150.00\n{first.id + 100},90.00\n'.encode()
+
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('rates.csv', sheet, content_type='text/csv')})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        first.refresh_from_db()
+        self.assertEqual(first.rate, Decimal('100.00'))
+        self.assertEqual(CardRateVersion.objects.filter(card=first).count(), 1)
+
+        bad_row = f'card,rate\n{first.id},-5\n'.encode()
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('rates.csv', bad_row, content_type='text/csv')})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('row 2', response.data['file'])
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OrderReviewQueueTests(APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_superuser(email='admin@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.admin)
+        self.url = reverse('order_review_queue')
+        self.seller = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        store = GiftCardStore.objects.create(name="Apple", category="Popular")
+        self.card = GiftCardNames.objects.create(store=store, name="Apple US", type="E-code", rate=Decimal("900.00"))
+
+    def test_queue_pages_oldest_first_with_cursor(self):
+        orders = [
+            GiftCardOrder.objects.create(user=self.seller, type='E-Code', card=self.card, amount=100 * i)
+            for i in range(1, 6)
+        ]
+        # Orders sharing a timestamp are paged by id.
+        GiftCardOrder.objects.filter(pk__in=[order.pk for order in orders[1:4]]).update(created_at=orders[1].created_at)
+
+        seen = []
+        url = f'{self.url}?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [order.id for order in orders])
+        self.assertEqual(response.data['results'][0]['store_name'], 'Apple')
+
+    def test_queue_filters_and_joins_without_per_row_queries(self):
+        GiftCardOrder.objects.create(user=self.seller, type='E-Code', card=self.card, amount=500)
+        GiftCardOrder.objects.create(user=self.seller, type='E-Code', card=None, amount=50)
+        GiftCardOrder.objects.create(user=self.admin, type='Physical', card=self.card, amount=800, status='Approved')
+
+        # One query for the page and one for its duplicate matches.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'status': 'Pending', 'store': self.card.store_id, 'min_amount': 100})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['amount'] for row in response.data['results']], [500])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(self.url, {'min_amount': 900, 'max_amount': 100})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OrderClaimTests(APITestCase):
+    def setUp(self):
+        self.first_reviewer = UserProfile.objects.create_superuser(email='first@example.com', password='StrongPassword123')
+        self.second_reviewer = UserProfile.objects.create_superuser(email='second@example.com', password='StrongPassword123')
+        seller = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        self.orders = [
+            GiftCardOrder.objects.create(user=seller, type='E-Code', card=None, amount=100 * i)
+            for i in range(1, 5)
+        ]
+        self.url = reverse('claim_orders')
+
+    def claim(self, reviewer, count):
+        self.client.force_authenticate(user=reviewer)
+        response = self.client.post(self.url, {'count': count}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['orders']]
+
+    def test_reviewers_claim_disjoint_orders(self):
+        first = self.claim(self.first_reviewer, 2)
+        second = self.claim(self.second_reviewer, 5)
+
+        self.assertEqual(first, [order.id for order in self.orders[:2]])
+        self.assertEqual(second, [order.id for order in self.orders[2:]])
+        self.assertEqual(self.claim(self.first_reviewer, 1), [])
+
+    def test_expired_and_reviewed_orders_leave_their_leases(self):
+        self.claim(self.first_reviewer, 2)
+        OrderReviewLease.objects.filter(order=self.orders[0]).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.orders[1].status = 'Approved'
+        self.orders[1].save()
+
+        self.assertFalse(OrderReviewLease.objects.filter(order=self.orders[1]).exists())
+        self.assertEqual(self.claim(self.second_reviewer, 1), [self.orders[0].id])
+
+        response = self.client.post(reverse('release_order', args=[self.orders[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(OrderReviewLease.objects.exists())
+
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OrderVolumeRollupTests(APITestCase):
+    def setUp(self):
+        self.admin = UserProfile.objects.create_superuser(email='admin@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.admin)
+        self.seller = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        apple = GiftCardStore.objects.create(name='Apple', category='Popular')
+        steam = GiftCardStore.objects.create(name='Steam', category='Popular')
+        self.apple_us = GiftCardNames.objects.create(store=apple, name='Apple US', type='E-code')
+        self.apple_uk = GiftCardNames.objects.create(store=apple, name='Apple UK', type='E-code')
+        self.steam = GiftCardNames.objects.create(store=steam, name='Steam', type='E-code')
+
+    def create_order(self, card, amount):
+        return GiftCardOrder.objects.create(user=self.seller, type='E-Code', card=card, amount=amount)
+
+    def rollup_rows(self):
+        return list(OrderVolumeRollup.objects.filter(order_count__gt=0).values_list(
+            'day', 'card_id', 'status', 'order_count', 'amount_total',
+        ))
+
+    def test_rollups_follow_transitions_and_match_backfill(self):
+        approved = self.create_order(self.apple_us, 300)
+        moved = self.create_order(self.apple_us, 200)
+        deleted = self.create_order(self.steam, 50)
+        approved.status = 'Approved'
+        approved.save()
+        moved.card = self.apple_uk
+        moved.amount = 250
+        moved.save()
+        deleted.delete()
+
+        today = timezone.localdate()
+        incremental = self.rollup_rows()
+        self.assertEqual(sorted(incremental), sorted([
+            (today, self.apple_us.id, 'Approved', 1, 300),
+            (today, self.apple_uk.id, 'Pending', 1, 250),
+        ]))
+
+        OrderVolumeRollup.objects.all().delete()
+        call_command('backfill_order_rollups', stdout=StringIO())
+        self.assertEqual(sorted(self.rollup_rows()), sorted(incremental))
+
+    def test_volume_report_groups_without_scanning_orders(self):
+        self.create_order(self.apple_us, 300)
+        self.create_order(self.apple_uk, 200)
+        self.create_order(self.steam, 50)
+
+        with CaptureQueriesContext(connection) as queries:
+            by_store = self.client.get(reverse('order_volume'), {'group_by': 'store'})
+        self.assertEqual(by_store.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['store_name'], row['order_count'], row['amount_total']) for row in by_store.data['results']],
+            [('Apple', 2, 500), ('Steam', 1, 50)],
+        )
+        self.assertFalse(any(GiftCardOrder._meta.db_table in query['sql'] for query in queries))
+
+        by_month = self.client.get(reverse('order_volume'), {'period': 'month', 'store': self.apple_us.store_id})
+        self.assertEqual(len(by_month.data['results']), 1)
+        self.assertEqual(by_month.data['results'][0]['amount_total'], 500)
@@ -6,13 +6,19 @@ from .views import (
   GiftCardListView,
   GiftCardRetrieveUpdateDestroyView,
   GiftStoreRetrieveUpdateDestroyView,
+  GiftCardRateSheetView,
   PendingLevel2CredentialsListView,
   AdminUsersListView,
   PendingLevel3CredentialsListView,
   Level2CredentialApprovalView,
   Level3CredentialApprovalView,
   TransactionListView,
+  OrderReviewQueueView,
+  OrderClaimView,
+  OrderReleaseView,
+  OrderVolumeView,
   TransactionStatusUpdateView,
+  TransactionStatusBulkUpdateView,
   AdminWithdrawalListView,
   AdminWithdrawalDetailView,
   AdminWithdrawalProcessView,
@@ -27,6 +33,7 @@ urlpatterns = [
     path('list-gift-cards/', GiftCardListView.as_view(), name="list_gift_cards_view"),
     path('get-gift-card/<int:pk>/', GiftCardRetrieveUpdateDestroyView.as_view(), name="get_gift_cards_view"),
     path('get-gift-store/<int:pk>/', GiftStoreRetrieveUpdateDestroyView.as_view(), name="get_gift_store_view"),
+    path('gift-card-rates/bulk/', GiftCardRateSheetView.as_view(), name="bulk_update_card_rates"),
 
     # Credential approvals
     path('users/', AdminUsersListView.as_view(), name="admin_users_list"),
@@ -37,7 +44,12 @@ urlpatterns = [
 
     # transactions management
     path('transactions/', TransactionListView.as_view(), name="transaction_list"),
+    path('transactions/review-queue/', OrderReviewQueueView.as_view(), name="order_review_queue"),
+    path('transactions/claim/', OrderClaimView.as_view(), name="claim_orders"),
+    path('transactions/<int:transaction_id>/release/', OrderReleaseView.as_view(), name="release_order"),
+    path('analytics/order-volume/', OrderVolumeView.as_view(), name="order_volume"),
     path('update-transactions-status/<int:transaction_id>/', TransactionStatusUpdateView.as_view(), name="update_order_status"),
+    path('update-transactions-status/bulk/', TransactionStatusBulkUpdateView.as_view(), name="bulk_update_order_status"),
 
     # Withdrawal management
     path('withdrawals/', AdminWithdrawalListView.as_view(), name="admin-withdrawal-list"),
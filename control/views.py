@@ -9,11 +9,15 @@ from drf_spectacular.utils import extend_schema, inline_serializer
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 from decimal import Decimal
-from django.db.models import Q, Sum
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 
 from cards.models import GiftCardStore, GiftCardNames
+from cards.rates import UnknownCardsError, apply_rate_sheet
+from account.balances import BalanceUnitOfWork, get_user_balances
 from account.models import Level2Credentials, Level3Credentials, UserProfile
-from order.models import GiftCardOrder
+from order.models import GiftCardOrder, OrderVolumeRollup
+from order.services import claim_orders_for_review, release_order_lease
 from withdrawal.models import Withdrawal, WithdrawalAuditLog
 from .serializers import (
    CreateGiftStoreSerializer,
@@ -26,13 +30,26 @@ from .serializers import (
    Level3CredentialsPendingSerializer,
    CredentialApprovalSerializer,
    TransactionSerializer,
+   OrderReviewQueueSerializer,
+   OrderReviewQueueFilterSerializer,
+   OrderClaimSerializer,
+   OrderVolumeFilterSerializer,
    OrderStatusUpdateSerializer,
+   OrderStatusBulkUpdateSerializer,
+   CardRateSheetSerializer,
    WithdrawalListSerializer,
    WithdrawalDetailSerializer,
    WithdrawalApprovalSerializer,
    WithdrawalAuditLogSerializer,
    )
-from notification.services import notify_kyc_status_changed, notify_balance_updated, notify_withdrawal_status_changed
+from gtx.pagination import CreatedAtKeysetPagination
+from notification.services import (
+   OrderNotificationBatch,
+   notify_balance_updated,
+   notify_kyc_status_changed,
+   notify_order_status_batch,
+   notify_withdrawal_status_changed,
+   )
 
 
 def parse_querydict(query_dict):
@@ -118,6 +135,44 @@ class GiftStoreRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
   queryset = GiftCardStore.objects.all()
 
 
+class GiftCardRateSheetView(APIView):
+    """
+    Apply a rate sheet: set the rates of many cards in one transaction.
+
+    Every changed rate is recorded as a new CardRateVersion, and the rate
+    table and catalog caches are invalidated once for the whole sheet.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = CardRateSheetSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rates = serializer.validated_data['rates']
+
+        try:
+            changes = apply_rate_sheet(rates)
+        except UnknownCardsError as exc:
+            raise ValidationError({'detail': f'Gift cards not found: {exc.card_ids}'})
+
+        return Response(
+            {
+                'detail': f'Updated {len(changes)} card rate(s).',
+                'cards': [
+                    {
+                        'id': change.card_id,
+                        'old_rate': f'{change.old_rate:.2f}',
+                        'rate': f'{change.rate:.2f}',
+                        'rate_version': change.rate_version,
+                    }
+                    for change in changes
+                ],
+                'unchanged': len(rates) - len(changes),
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 class PendingLevel2CredentialsListView(ListAPIView):
     """List all pending Level 2 credential submissions."""
     permission_classes = [IsAdminUser]
@@ -199,7 +254,7 @@ class Level2CredentialApprovalView(APIView):
             # Upgrade user to Level 2
             user.level = 'Level 2'
             user.transaction_limit = Decimal('5000000.00')
-            user.save()
+            user.save(update_fields=['level', 'transaction_limit'])
             notify_kyc_status_changed(user=user, level='2', new_status='Approved')
 
             return Response(
@@ -263,7 +318,7 @@ class Level3CredentialApprovalView(APIView):
             # Upgrade user to Level 3
             user.level = 'Level 3'
             user.transaction_limit = Decimal('50000000.00')
-            user.save()
+            user.save(update_fields=['level', 'transaction_limit'])
             notify_kyc_status_changed(user=user, level='3', new_status='Approved')
 
             return Response(
@@ -288,7 +343,118 @@ class TransactionListView(ListAPIView):
     serializer_class = TransactionSerializer
 
     def get_queryset(self):
-        return GiftCardOrder.objects.all()
+        return GiftCardOrder.objects.select_related('user__referred_by')
+
+
+class OrderReviewQueueView(ListAPIView):
+    """
+    Filterable review queue of gift card orders, oldest first, paged by a
+    (created_at, id) cursor.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = OrderReviewQueueSerializer
+    pagination_class = CreatedAtKeysetPagination
+
+    @extend_schema(parameters=[OrderReviewQueueFilterSerializer])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        filters = OrderReviewQueueFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        queryset = (
+            GiftCardOrder.objects.select_related('user__referred_by', 'card__store')
+            .prefetch_related('duplicate_matches')
+        )
+        return filters.filter_queryset(queryset)
+
+
+class OrderClaimView(APIView):
+    """
+    Lease the next unclaimed pending orders to the requesting reviewer.
+    Leases expire back into the pool if the orders are not reviewed in time.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = OrderClaimSerializer
+
+    @extend_schema(
+        request=OrderClaimSerializer,
+        responses={
+            200: inline_serializer(
+                name="OrderClaimResponse",
+                fields={
+                    "expires_at": serializers.DateTimeField(),
+                    "orders": OrderReviewQueueSerializer(many=True),
+                },
+            )
+        },
+    )
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        orders, expires_at = claim_orders_for_review(request.user, serializer.validated_data['count'])
+        return Response(
+            {
+                'expires_at': expires_at,
+                'orders': OrderReviewQueueSerializer(orders, many=True).data,
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class OrderReleaseView(APIView):
+    """Give a claimed order back to the pool."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, transaction_id):
+        if not release_order_lease(transaction_id, reviewer=request.user):
+            return Response(
+                {'detail': 'You do not hold a lease on this order.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({'detail': 'Order released.'}, status=status.HTTP_200_OK)
+
+
+class OrderVolumeView(APIView):
+    """
+    Order count and amount by period, card or store, read from the
+    pre-aggregated volume rollups.
+    """
+    permission_classes = [IsAdminUser]
+
+    period_functions = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+
+    @extend_schema(parameters=[OrderVolumeFilterSerializer])
+    def get(self, request):
+        filters = OrderVolumeFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        rollups = filters.filter_queryset(OrderVolumeRollup.objects.all())
+        totals = {'order_count': Sum('order_count'), 'amount_total': Sum('amount_total')}
+
+        group_by = filters.validated_data['group_by']
+        if group_by == 'card':
+            rows = (
+                rollups.values('card_id', card_name=F('card__name'), store_name=F('card__store__name'))
+                .annotate(**totals)
+                .order_by('-amount_total', 'card_id')
+            )
+        elif group_by == 'store':
+            rows = (
+                rollups.values(store_id=F('card__store'), store_name=F('card__store__name'))
+                .annotate(**totals)
+                .order_by('-amount_total', 'store_id')
+            )
+        else:
+            trunc = self.period_functions[filters.validated_data['period']]
+            period = trunc('day') if trunc else F('day')
+            rows = rollups.values(period_start=period).annotate(**totals).order_by('period_start')
+
+        return Response({
+            'group_by': group_by,
+            'period': filters.validated_data['period'] if group_by == 'period' else None,
+            'results': list(rows),
+        }, status=status.HTTP_200_OK)
 
 
 class TransactionStatusUpdateView(APIView):
@@ -297,9 +463,6 @@ class TransactionStatusUpdateView(APIView):
     serializer_class = OrderStatusUpdateSerializer
 
     def patch(self, request, transaction_id):
-        order = get_object_or_404(GiftCardOrder, id=transaction_id)
-        old_status = order.status
-
         serializer = self.serializer_class(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -307,21 +470,35 @@ class TransactionStatusUpdateView(APIView):
         new_status = serializer.validated_data['status']
         admin_notes = serializer.validated_data.get('admin_notes', '')
 
-        order.status = new_status
-        if admin_notes:
-            # Store admin notes if you add the field to the model
-            pass
-        order.save()
-        order.user.refresh_from_db(fields=['pending_balance', 'withdrawable_balance'])
+        # The balance signals apply the change from the old status as a delta,
+        # so the old status must be read under the row lock: two overlapping
+        # requests would otherwise both see it and apply the delta twice.
+        with transaction.atomic():
+            order = get_object_or_404(
+                GiftCardOrder.objects.select_for_update().select_related('user'), id=transaction_id,
+            )
+            old_status = order.status
+            if old_status == new_status:
+                return Response(
+                    {'detail': f'Order status is already {old_status}.'},
+                    status=status.HTTP_200_OK
+                )
+
+            order.status = new_status
+            if admin_notes:
+                # Store admin notes if you add the field to the model
+                pass
+            order.save()
+        pending_balance, withdrawable_balance = get_user_balances(order.user)
 
         # Notify balance update
         if new_status in ['Approved', 'Completed']:
             balance_type = 'withdrawable'
-            new_balance = float(order.user.withdrawable_balance)
+            new_balance = float(withdrawable_balance)
             change_amount = float(order.amount)
         else:
             balance_type = 'pending'
-            new_balance = float(order.user.pending_balance)
+            new_balance = float(pending_balance)
             change_amount = None
 
         notify_balance_updated(
@@ -337,6 +514,64 @@ class TransactionStatusUpdateView(APIView):
         )
 
 
+class TransactionStatusBulkUpdateView(APIView):
+    """
+    Update the status of many orders in one transaction.
+
+    Each affected user's stored balances are refreshed once on commit and
+    each user receives one summary notification instead of one per order.
+    """
+    permission_classes = [IsAdminUser]
+    serializer_class = OrderStatusBulkUpdateSerializer
+
+    def patch(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        new_statuses = {
+            item['order_id']: item['status']
+            for item in serializer.validated_data['updates']
+        }
+
+        updated = []
+        with transaction.atomic(), BalanceUnitOfWork(), OrderNotificationBatch() as batch:
+            orders = (
+                GiftCardOrder.objects.select_for_update()
+                .select_related('user')
+                .filter(id__in=new_statuses)
+                .order_by('id')
+            )
+            orders = list(orders)
+            missing = sorted(set(new_statuses) - {order.id for order in orders})
+            if missing:
+                raise ValidationError({'detail': f'Orders not found: {missing}'})
+
+            for order in orders:
+                old_status = order.status
+                order.status = new_statuses[order.id]
+                order.save()
+                updated.append({'id': order.id, 'old_status': old_status, 'status': order.status})
+
+            balances = {user_id: get_user_balances(user_id) for user_id in batch.updates}
+
+        for user_id, updates in batch.updates.items():
+            pending_balance, withdrawable_balance = balances[user_id]
+            notify_order_status_batch(
+                user=batch.users[user_id],
+                updates=updates,
+                pending_balance=float(pending_balance),
+                withdrawable_balance=float(withdrawable_balance),
+            )
+
+        return Response(
+            {
+                'detail': f'Updated {len(updated)} order(s).',
+                'orders': updated,
+                'users_notified': len(batch.updates),
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 # Withdrawal Admin Views
 
 class AdminWithdrawalListView(ListAPIView):
@@ -377,7 +612,9 @@ class AdminWithdrawalProcessView(APIView):
         admin_user = request.user
 
         try:
-            withdrawal = Withdrawal.objects.get(pk=pk)
+            # Locked so two overlapping approve/reject requests cannot both
+            # see it pending and apply the balance change twice.
+            withdrawal = Withdrawal.objects.select_for_update().get(pk=pk)
         except Withdrawal.DoesNotExist:
             raise ValidationError({"detail": "Withdrawal not found."})
 
@@ -423,13 +660,13 @@ class AdminWithdrawalProcessView(APIView):
                 amount=float(withdrawal.amount),
                 transaction_reference=transaction_reference,
             )
-            withdrawal.user.refresh_from_db(fields=['withdrawable_balance'])
+            _, withdrawable_balance = get_user_balances(withdrawal.user)
 
             return Response({
                 'detail': f'Withdrawal approved successfully. The requested amount ₦{withdrawal.amount} remains deducted from user\'s withdrawable balance.',
                 'status': withdrawal.status,
                 'transaction_reference': withdrawal.transaction_reference,
-                'withdrawable_balance': str(withdrawal.user.withdrawable_balance),
+                'withdrawable_balance': str(withdrawable_balance),
             })
 
         else:  # reject
@@ -456,12 +693,12 @@ class AdminWithdrawalProcessView(APIView):
                 amount=float(withdrawal.amount),
                 reason=reason,
             )
-            withdrawal.user.refresh_from_db(fields=['withdrawable_balance'])
+            _, withdrawable_balance = get_user_balances(withdrawal.user)
 
             return Response({
                 'detail': f'Withdrawal rejected. Amount ₦{withdrawal.amount} has been returned to user withdrawable balance. Reason: {reason}',
                 'status': withdrawal.status,
-                'withdrawable_balance': str(withdrawal.user.withdrawable_balance),
+                'withdrawable_balance': str(withdrawable_balance),
             })
 
 
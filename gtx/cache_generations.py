@@ -0,0 +1,51 @@
+"""
+Generation numbers for data sets cached as a whole.
+
+A data set is cached under a key that includes its current generation.
+Bumping the generation invalidates it everywhere at once: every reader
+builds the new key, misses and rebuilds, and entries of old generations
+simply expire. Cache errors are logged and reported as "no generation", so
+callers fall back to the database.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def get_generation(key: str) -> int | None:
+    """Current generation for ``key``, starting one if there is none."""
+    try:
+        return cache.get_or_set(key, time.time_ns, timeout=None)
+    except Exception as exc:
+        logger.warning("Could not read cache generation %s: %s", key, exc)
+        return None
+
+
+def bump_generation(key: str) -> None:
+    try:
+        cache.incr(key)
+        return
+    except ValueError:
+        # Nothing cached yet or the key was evicted; any fresh value works.
+        pass
+    except Exception as exc:
+        logger.warning("Could not bump cache generation %s: %s", key, exc)
+        return
+    try:
+        cache.set(key, time.time_ns(), timeout=None)
+    except Exception as exc:
+        logger.warning("Could not bump cache generation %s: %s", key, exc)
+
+
+def bump_generation_on_commit(key: str, callback=None) -> None:
+    """Bump the generation once the current transaction commits, after running ``callback``."""
+    def bump():
+        if callback is not None:
+            callback()
+        bump_generation(key)
+
+    transaction.on_commit(bump)
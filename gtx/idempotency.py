@@ -0,0 +1,156 @@
+"""
+Idempotency-Key support for endpoints that create records.
+
+A client sends the same ``Idempotency-Key`` header on every retry of one
+logical request. The first successful response is kept in the cache for
+``IDEMPOTENCY_KEY_TTL`` seconds and replayed to retries before anything is
+written, so a retried upload creates one record and fires one set of
+signals.
+
+The key is bound to a fingerprint of the request (its parsed fields and
+the content of uploaded files): reusing a key for a different request gets
+422 instead of someone else's response. The body is parsed before the key
+is claimed, so a slow upload does not eat into the claim.
+
+Only 2xx responses are kept: a failed attempt can be retried with the same
+key. While the first attempt is still running, retries get 409. If the
+cache is unavailable the endpoint simply runs without idempotency.
+"""
+import functools
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+_PENDING = 'pending'
+_DONE = 'done'
+
+
+def _cache_key(scope: str, user_id, key: str) -> str:
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'idempotency:{scope}:{user_id}:{digest}'
+
+
+def request_fingerprint(request) -> str:
+    """Hash of the request's method, path, parsed fields and uploaded file contents."""
+    digest = hashlib.sha256(f'{request.method} {request.path}'.encode())
+    data = request.data
+    if not hasattr(data, 'lists'):
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    for name, values in sorted(data.lists(), key=lambda item: item[0]):
+        digest.update(f'\0{name}'.encode())
+        for value in values:
+            if hasattr(value, 'chunks'):
+                digest.update(f'\0file:{value.name}:{value.size}'.encode())
+                for chunk in value.chunks():
+                    digest.update(chunk)
+                value.seek(0)
+            else:
+                digest.update(f'\0{value}'.encode())
+    return digest.hexdigest()
+
+
+def _replay(entry: dict) -> Response:
+    return Response(entry['data'], status=entry['status'], headers={REPLAYED_HEADER: 'true'})
+
+
+def _forget(cache_key: str) -> None:
+    try:
+        cache.delete(cache_key)
+    except Exception as exc:
+        logger.warning("Could not release idempotency key %s: %s", cache_key, exc)
+
+
+def _key_reused() -> Response:
+    return Response(
+        {'detail': f'This {IDEMPOTENCY_HEADER} was already used for a different request.'},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+def _in_progress() -> Response:
+    return Response(
+        {'detail': f'A request with this {IDEMPOTENCY_HEADER} is still being processed.'},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def idempotent(scope: str):
+    """
+    Make an authenticated APIView handler replay its first successful
+    response to requests that repeat the same Idempotency-Key.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return handler(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'detail': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            cache_key = _cache_key(scope, request.user.pk, key)
+            fingerprint = request_fingerprint(request)
+            try:
+                claimed = cache.add(
+                    cache_key,
+                    {'state': _PENDING, 'fingerprint': fingerprint},
+                    timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT,
+                )
+                entry = None if claimed else cache.get(cache_key)
+            except Exception as exc:
+                logger.warning("Idempotency cache unavailable for %s: %s", scope, exc)
+                return handler(view, request, *args, **kwargs)
+
+            if not claimed:
+                if entry and entry.get('fingerprint') != fingerprint:
+                    return _key_reused()
+                if entry and entry.get('state') == _DONE:
+                    return _replay(entry)
+                if entry:
+                    return _in_progress()
+                # The entry expired between add() and get(); run normally.
+                return handler(view, request, *args, **kwargs)
+
+            try:
+                response = handler(view, request, *args, **kwargs)
+            except BaseException:
+                _forget(cache_key)
+                raise
+
+            if status.is_success(response.status_code):
+                try:
+                    cache.set(
+                        cache_key,
+                        {
+                            'state': _DONE,
+                            'fingerprint': fingerprint,
+                            'status': response.status_code,
+                            'data': response.data,
+                        },
+                        timeout=settings.IDEMPOTENCY_KEY_TTL,
+                    )
+                except Exception as exc:
+                    logger.warning("Could not store idempotent response for %s: %s", scope, exc)
+            else:
+                _forget(cache_key)
+            return response
+
+        return wrapper
+
+    return decorator
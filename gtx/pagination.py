@@ -0,0 +1,98 @@
+"""
+Keyset pagination for lists that page through rows in (created_at, id)
+order.
+"""
+import base64
+import binascii
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CreatedAtKeysetPagination(BasePagination):
+    """
+    Page oldest first on (created_at, id) without OFFSET.
+
+    The cursor is the (created_at, id) of the last row of the previous page,
+    so each page is an index range read no matter how deep the client is.
+    Subclasses set ``newest_first`` to walk the same order backwards.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 50
+    max_page_size = 200
+    newest_first = False
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, instance) -> str:
+        raw = f'{instance.created_at.isoformat()}|{instance.pk}'.encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, encoded: str):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(encoded.encode()).decode().rsplit('|', 1)
+            pk = int(pk)
+            parsed = parse_datetime(created_at)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound('Invalid cursor.')
+        if parsed is None:
+            raise NotFound('Invalid cursor.')
+        return parsed, pk
+
+    def filter_after(self, queryset, created_at, pk):
+        # A range on the leading created_at column plus a filter for the
+        # rows tied on it, so the (created_at, id) index serves the page.
+        if self.newest_first:
+            return queryset.filter(created_at__lte=created_at).exclude(created_at=created_at, pk__gte=pk)
+        return queryset.filter(created_at__gte=created_at).exclude(created_at=created_at, pk__lte=pk)
+
+    def order_queryset(self, queryset):
+        if self.newest_first:
+            return queryset.order_by('-created_at', '-pk')
+        return queryset.order_by('created_at', 'pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = self.filter_after(queryset, *self.decode_cursor(encoded))
+
+        queryset = self.order_queryset(queryset)
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -105,6 +105,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Refresh each touched user's balances once per request
+    'account.middleware.BalanceUnitOfWorkMiddleware',
     # Logging middleware (must be after CommonMiddleware)
     'logs.middleware.RequestLoggingMiddleware',
     'logs.middleware.ExceptionLoggingMiddleware',
@@ -331,11 +333,74 @@ CELERY_BEAT_SCHEDULE = {
         "task": "withdrawal.tasks.refresh_daily_withdrawal_limits",
         "schedule": crontab(hour=0, minute=5),
     },
+    "snapshot-daily-balances": {
+        "task": "account.tasks.snapshot_daily_balances",
+        "schedule": crontab(hour=0, minute=15),
+    },
+    "detect-balance-drift": {
+        "task": "account.tasks.detect_balance_drift",
+        "schedule": crontab(minute="*/5"),
+    },
+    "dispatch-outbox": {
+        "task": "notification.tasks.dispatch_outbox",
+        "schedule": crontab(minute="*"),
+    },
 }
 
 REFERRAL_QUALIFYING_AMOUNT = Decimal(os.environ.get("REFERRAL_QUALIFYING_AMOUNT", "100.00"))
 REFERRAL_COMMISSION_PERCENT = Decimal(os.environ.get("REFERRAL_COMMISSION_PERCENT", "10.00"))
 
+# "incremental" applies a signed delta per order/withdrawal/commission transition;
+# "full" recalculates balances from source records on every change.
+BALANCE_ENGINE_MODE = os.environ.get("BALANCE_ENGINE_MODE", "incremental").strip().lower()
+# Balance reads are served from the cache; entries are dropped on every
+# balance write, so the timeout only bounds how long a missed drop can live.
+BALANCE_CACHE_TIMEOUT = int(os.environ.get("BALANCE_CACHE_TIMEOUT", "300"))
+# Attempts at the compare-and-swap on Wallet.version before a
+# balance write gives up.
+BALANCE_CAS_MAX_RETRIES = int(os.environ.get("BALANCE_CAS_MAX_RETRIES", "5"))
+# Background drift detector: fraction of users checked per pass, seconds per
+# run and users per keyset chunk.
+BALANCE_DRIFT_SAMPLE_RATE = float(os.environ.get("BALANCE_DRIFT_SAMPLE_RATE", "1.0"))
+BALANCE_DRIFT_TIME_BUDGET_SECONDS = float(os.environ.get("BALANCE_DRIFT_TIME_BUDGET_SECONDS", "20"))
+BALANCE_DRIFT_CHUNK_SIZE = int(os.environ.get("BALANCE_DRIFT_CHUNK_SIZE", "500"))
+# Most orders one bulk status update request may change.
+ORDER_BULK_UPDATE_MAX_ITEMS = int(os.environ.get("ORDER_BULK_UPDATE_MAX_ITEMS", "500"))
+# Reviewer order claims: seconds a lease lasts and most orders per claim.
+ORDER_REVIEW_LEASE_SECONDS = int(os.environ.get("ORDER_REVIEW_LEASE_SECONDS", "900"))
+ORDER_REVIEW_CLAIM_MAX = int(os.environ.get("ORDER_REVIEW_CLAIM_MAX", "50"))
+# Encoding for processed order photos: "WEBP" (falls back to JPEG when Pillow
+# lacks WebP support) or "JPEG".
+ORDER_IMAGE_FORMAT = os.environ.get("ORDER_IMAGE_FORMAT", "WEBP").strip().upper()
+# Duplicate card detection: key for e-code pin hashes (defaults to
+# SECRET_KEY) and the most differing bits (0-3) for two photos to match.
+ORDER_FINGERPRINT_KEY = os.environ.get("ORDER_FINGERPRINT_KEY", "")
+ORDER_IMAGE_MATCH_DISTANCE = int(os.environ.get("ORDER_IMAGE_MATCH_DISTANCE", "3"))
+# Seconds a card rate table stays in the shared cache. Rate edits replace
+# it immediately; this only bounds how long unused tables linger.
+CARD_RATE_TABLE_TIMEOUT = int(os.environ.get("CARD_RATE_TABLE_TIMEOUT", "86400"))
+# Seconds a rendered catalog snapshot stays in the cache. Store and card
+# writes replace it immediately.
+CARD_CATALOG_CACHE_TIMEOUT = int(os.environ.get("CARD_CATALOG_CACHE_TIMEOUT", "86400"))
+# Most rows one bulk card rate sheet may contain.
+CARD_RATE_SHEET_MAX_ROWS = int(os.environ.get("CARD_RATE_SHEET_MAX_ROWS", "1000"))
+# Idempotency-Key handling on create endpoints: how long a successful
+# response is replayed, and how long an in-flight attempt blocks retries.
+# The lock must outlast the slowest request; it is released as soon as the
+# attempt finishes.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", "600"))
+# Transactional outbox dispatcher: events per batch, batches per run, and
+# delivery attempts before an event is marked dead.
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_BATCHES = int(os.environ.get("OUTBOX_MAX_BATCHES", "10"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+# Retry backoff doubles from the base up to the max; a claimed event is
+# handed to another dispatcher if not finished within the lease.
+OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get("OUTBOX_RETRY_BASE_SECONDS", "30"))
+OUTBOX_RETRY_MAX_SECONDS = int(os.environ.get("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", "300"))
+
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
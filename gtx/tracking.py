@@ -0,0 +1,85 @@
+"""
+Load-time field tracking for models whose saves react to field transitions.
+
+Models list the fields they care about in ``tracked_fields``. The values
+those fields had when the instance was loaded (or last saved) are kept on
+the instance, so signal handlers, admin and audit code can ask what changed
+without re-reading the row.
+"""
+from typing import Any
+
+
+class TrackedFieldsMixin:
+    """
+    Remember the loaded values of ``tracked_fields`` and expose what changed.
+
+    Must come before ``models.Model`` in the bases. The remembered values are
+    still the old ones while post_save handlers run and are replaced by the
+    saved values once save() returns. Tracked fields that were deferred or
+    never loaded are read from the database before the write.
+    """
+
+    tracked_fields: tuple[str, ...] = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_values = {
+            name: loaded[cls._meta.get_field(name).attname]
+            for name in cls.tracked_fields
+            if cls._meta.get_field(name).attname in loaded
+        }
+        return instance
+
+    def _remember_tracked_values(self, names=None) -> None:
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, '_loaded_values', {})
+        for name in names if names is not None else self.tracked_fields:
+            if name not in self.tracked_fields:
+                continue
+            field = self._meta.get_field(name)
+            if field.attname not in deferred:
+                loaded[name] = field.to_python(getattr(self, field.attname))
+        self._loaded_values = loaded
+
+    def _load_missing_tracked_values(self) -> dict[str, Any]:
+        loaded = getattr(self, '_loaded_values', {})
+        missing = [name for name in self.tracked_fields if name not in loaded]
+        if missing and self.pk is not None:
+            # Deferred fields or instances built by hand; read them once.
+            row = type(self)._base_manager.filter(pk=self.pk).values(*missing).first()
+            if row is not None:
+                loaded.update(row)
+                self._loaded_values = loaded
+        return loaded
+
+    def initial_value(self, name: str) -> Any:
+        """Value ``name`` had when loaded or last saved; None for new rows."""
+        return self._load_missing_tracked_values().get(name)
+
+    def changed_fields(self) -> dict[str, tuple[Any, Any]]:
+        """Map each tracked field that differs from its loaded value to (old, new)."""
+        loaded = self._load_missing_tracked_values()
+        changes = {}
+        for name, old in loaded.items():
+            field = self._meta.get_field(name)
+            new = field.to_python(getattr(self, field.attname))
+            if new != old:
+                changes[name] = (old, new)
+        return changes
+
+    def has_changed(self, name: str) -> bool:
+        return name in self.changed_fields()
+
+    def save(self, *args, **kwargs):
+        # Values the instance was not loaded with must be read before the
+        # write; read lazily from post_save they would be the new values.
+        self._load_missing_tracked_values()
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._remember_tracked_values(update_fields)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember_tracked_values(fields)
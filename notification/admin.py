@@ -6,6 +6,7 @@ from django.utils.html import format_html
 from .models import (
     Notification,
     NotificationEvent,
+    OutboxEvent,
     PushNotificationSubscriber,
     PushNotificationLog,
 )
@@ -14,6 +15,14 @@ admin.site.register(Notification)
 admin.site.register(NotificationEvent)
 
 
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "event_type", "user", "status", "attempts", "available_at", "created_at", "processed_at")
+    list_filter = ("status", "event_type")
+    search_fields = ("user__email",)
+    readonly_fields = ("created_at", "processed_at", "last_error")
+
+
 @admin.register(PushNotificationSubscriber)
 class PushNotificationSubscriberAdmin(admin.ModelAdmin):
     list_display = ("user", "platform", "is_active", "short_token", "device_id", "updated_at")
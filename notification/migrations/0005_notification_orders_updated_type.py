@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0004_pushnotificationlog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('order_created', 'Order Created'), ('order_approved', 'Order Approved'), ('order_rejected', 'Order Rejected'), ('order_assigned', 'Order Assigned'), ('order_completed', 'Order Completed'), ('orders_updated', 'Orders Updated'), ('withdrawal_created', 'Withdrawal Requested'), ('withdrawal_approved', 'Withdrawal Approved'), ('withdrawal_rejected', 'Withdrawal Rejected'), ('kyc_approved', 'KYC Approved'), ('kyc_rejected', 'KYC Rejected'), ('balance_updated', 'Balance Updated'), ('general', 'General')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0006_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='outbox_event',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notification', to='notification.outboxevent'),
+        ),
+        migrations.AddField(
+            model_name='notificationevent',
+            name='outbox_event',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notification_event', to='notification.outboxevent'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
 
@@ -14,6 +15,7 @@ class Notification(models.Model):
         ("order_rejected", "Order Rejected"),
         ("order_assigned", "Order Assigned"),
         ("order_completed", "Order Completed"),
+        ("orders_updated", "Orders Updated"),
         ("withdrawal_created", "Withdrawal Requested"),
         ("withdrawal_approved", "Withdrawal Approved"),
         ("withdrawal_rejected", "Withdrawal Rejected"),
@@ -42,6 +44,11 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True)
+    # Set when delivered through the outbox, so a retry reuses this row.
+    outbox_event = models.OneToOneField(
+        "OutboxEvent", on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name="notification",
+    )
 
     # Optional reference to related objects
     object_id = models.PositiveIntegerField(null=True, blank=True)
@@ -96,6 +103,10 @@ class NotificationEvent(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     sent_at = models.DateTimeField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    outbox_event = models.OneToOneField(
+        "OutboxEvent", on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name="notification_event",
+    )
 
     class Meta:
         ordering = ["-created_at"]
@@ -191,3 +202,49 @@ class PushNotificationLog(models.Model):
     def __str__(self):
         who = self.user.email if self.user else "unknown"
         return f"push[{self.status}] -> {who} ({self.sent}/{self.attempted})"
+
+
+class OutboxEvent(models.Model):
+    """
+    A side effect recorded in the same transaction as the state change that
+    caused it, delivered later by the outbox dispatcher.
+
+    Events for one user are delivered in id order. While an event is being
+    delivered ``available_at`` is its lease expiry; while it waits for a
+    retry it is the time of the next attempt.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_DONE = "done"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_DONE, "Done"),
+        (STATUS_DEAD, "Dead"),       # gave up after the maximum attempts
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="outbox_events",
+    )
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "available_at", "id"], name="outbox_due_idx"),
+            models.Index(fields=["user", "status", "id"], name="outbox_user_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"outbox[{self.status}] {self.event_type} #{self.pk} -> {self.user_id}"
@@ -0,0 +1,156 @@
+"""
+Transactional outbox for side effects that talk to the outside world.
+
+Callers record an OutboxEvent inside the transaction that changes state, so
+the event exists exactly when the change commits. The dispatcher Celery task
+(notification.tasks.dispatch_outbox) claims due events in batches, runs the
+handler registered for each event type outside any transaction, and retries
+failures with exponential backoff. Events for one user are delivered in
+order: an event is only claimed once every earlier event for its user is
+done or dead.
+"""
+import logging
+from datetime import timedelta
+from typing import Callable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = (OutboxEvent.STATUS_PENDING, OutboxEvent.STATUS_PROCESSING)
+
+_handlers: dict[str, Callable[[OutboxEvent], None]] = {}
+
+
+def outbox_handler(event_type: str):
+    """Register the function that delivers events of ``event_type``."""
+    def decorator(handler):
+        _handlers[event_type] = handler
+        return handler
+    return decorator
+
+
+def _kick_dispatcher() -> None:
+    from .tasks import dispatch_outbox
+
+    try:
+        # This runs in the request thread, so it makes a single connection
+        # attempt and skips the result backend instead of waiting out
+        # Celery's reconnect loops while the broker is down.
+        with dispatch_outbox.app.pool.acquire(block=True) as connection:
+            connection.ensure_connection(max_retries=0)
+            dispatch_outbox.apply_async(connection=connection, retry=False, ignore_result=True)
+    except Exception as exc:
+        # The periodic dispatcher run picks the event up instead.
+        logger.warning("Could not queue the outbox dispatcher: %s", exc)
+
+
+def enqueue(event_type: str, user, payload: dict) -> OutboxEvent:
+    """
+    Record an event in the current transaction and wake the dispatcher once
+    it commits.
+    """
+    event = OutboxEvent.objects.create(
+        user_id=getattr(user, 'pk', user),
+        event_type=event_type,
+        payload=payload,
+    )
+    transaction.on_commit(_kick_dispatcher)
+    return event
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = settings.OUTBOX_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def claim_events(batch_size: int) -> list[OutboxEvent]:
+    """
+    Lease up to ``batch_size`` due events, at most one per user: the oldest
+    unfinished event of each user whose turn it is.
+    """
+    now = timezone.now()
+    earlier_unfinished = OutboxEvent.objects.filter(
+        user_id=OuterRef('user_id'),
+        id__lt=OuterRef('id'),
+        status__in=UNFINISHED_STATUSES,
+    )
+    with transaction.atomic():
+        due = (
+            OutboxEvent.objects.filter(status__in=UNFINISHED_STATUSES, available_at__lte=now)
+            .filter(~Exists(earlier_unfinished))
+            .order_by('id')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        candidate_ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not candidate_ids:
+            return []
+        # The conditional update is the claim: without SKIP LOCKED another
+        # dispatcher may have read the same rows, and only one of them wins
+        # each row. Processing events whose lease ran out are claimed again.
+        lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        OutboxEvent.objects.filter(pk__in=candidate_ids).filter(
+            Q(status=OutboxEvent.STATUS_PENDING) | Q(status=OutboxEvent.STATUS_PROCESSING, available_at__lte=now)
+        ).update(status=OutboxEvent.STATUS_PROCESSING, available_at=lease_until)
+        return list(
+            OutboxEvent.objects.select_related('user')
+            .filter(pk__in=candidate_ids, status=OutboxEvent.STATUS_PROCESSING, available_at=lease_until)
+            .order_by('id')
+        )
+
+
+def deliver(event: OutboxEvent) -> bool:
+    """Run the event's handler and record the outcome. Returns True on success."""
+    handler = _handlers.get(event.event_type)
+    try:
+        if handler is None:
+            raise LookupError(f"No outbox handler registered for {event.event_type!r}")
+        handler(event)
+    except Exception as exc:
+        event.attempts += 1
+        event.last_error = f"{type(exc).__name__}: {exc}"
+        if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            event.status = OutboxEvent.STATUS_DEAD
+            logger.error("Outbox event %s (%s) gave up after %s attempts: %s",
+                         event.pk, event.event_type, event.attempts, exc)
+        else:
+            event.status = OutboxEvent.STATUS_PENDING
+            event.available_at = timezone.now() + _retry_delay(event.attempts)
+            logger.warning("Outbox event %s (%s) failed, attempt %s: %s",
+                           event.pk, event.event_type, event.attempts, exc)
+        event.save(update_fields=['status', 'attempts', 'available_at', 'last_error'])
+        return False
+
+    event.attempts += 1
+    event.status = OutboxEvent.STATUS_DONE
+    event.processed_at = timezone.now()
+    event.save(update_fields=['status', 'attempts', 'processed_at'])
+    return True
+
+
+def dispatch(batch_size: int | None = None, max_batches: int | None = None) -> dict:
+    """Deliver due events batch by batch until none are left or the batch budget is spent."""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    max_batches = max_batches or settings.OUTBOX_MAX_BATCHES
+    delivered = failed = batches = 0
+
+    while batches < max_batches:
+        events = claim_events(batch_size)
+        if not events:
+            break
+        batches += 1
+        for event in events:
+            if deliver(event):
+                delivered += 1
+            else:
+                failed += 1
+
+    if delivered or failed:
+        logger.info("Outbox dispatcher delivered %s event(s), %s failed, in %s batch(es)", delivered, failed, batches)
+    return {'delivered': delivered, 'failed': failed, 'batches': batches}
@@ -5,6 +5,7 @@ Handles both email and in-app notifications.
 from __future__ import annotations
 
 import logging
+from contextvars import ContextVar
 from typing import TYPE_CHECKING, Optional, Dict, Any
 from django.core.mail import EmailMultiAlternatives
 from django.template import TemplateDoesNotExist
@@ -16,7 +17,8 @@ from django.db import transaction
 if TYPE_CHECKING:
     from account.models import UserProfile
 
-from .models import Notification, NotificationEvent, PushNotificationSubscriber
+from .models import Notification, NotificationEvent, OutboxEvent, PushNotificationSubscriber
+from .outbox import enqueue, outbox_handler
 
 logger = logging.getLogger(__name__)
 
@@ -69,85 +71,21 @@ class NotificationService:
         Returns:
             Tuple of (Notification, NotificationEvent) or (None, None) on failure
         """
-        notification = None
-        event = None
-
         try:
-            with transaction.atomic():
-                # Create in-app notification
-                notification = Notification.objects.create(
-                    user=user,
-                    notification_type=notification_type,
-                    title=title,
-                    message=message,
-                    priority=priority,
-                    object_id=object_id,
-                    content_type=content_type,
-                )
-
-                # Create event log entry
-                channel = 'both' if send_email else 'in_app'
-                event = NotificationEvent.objects.create(
-                    user=user,
-                    event_type=notification_type,
-                    title=title,
-                    message=message,
-                    channel=channel,
-                    status='pending',
-                    metadata=metadata or {},
-                )
-
-            push_allowed = (
-                send_push
-                and notification_type not in PUSH_NOTIFICATION_EXCLUDED_TYPES
+            notification, event = NotificationService.create_records(
+                user=user,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                priority=priority,
+                send_email=send_email,
+                object_id=object_id,
+                content_type=content_type,
+                metadata=metadata,
             )
-            push_result = None
-
-            if push_allowed:
-                push_result = PushNotificationSender.send(
-                    user=user,
-                    title=title,
-                    body=message,
-                    data={
-                        'notification_id': notification.id,
-                        'notification_type': notification_type,
-                        'object_id': object_id,
-                        'content_type': content_type,
-                        **(metadata or {}),
-                    },
-                )
-                event.metadata = {
-                    **(event.metadata or {}),
-                    'push': push_result,
-                }
-                event.save(update_fields=['metadata'])
-
-            # Send email asynchronously (outside atomic block)
-            if send_email:
-                sent, error_message = EmailNotificationSender.send(
-                    user=user,
-                    subject=title,
-                    template_name=f'notification/{notification_type}_email.html',
-                    context={
-                        'user': user,
-                        'message': message,
-                        'notification': notification,
-                        **(metadata or {}),
-                    }
-                )
-                if sent:
-                    event.status = 'sent'
-                    event.sent_at = timezone.now()
-                    event.save(update_fields=['status', 'sent_at'])
-                else:
-                    event.status = 'failed'
-                    event.error_message = error_message or 'Unknown email delivery error'
-                    event.save(update_fields=['status', 'error_message'])
-            else:
-                event.status = 'sent'
-                event.sent_at = timezone.now()
-                event.save(update_fields=['status', 'sent_at'])
-
+            if NotificationService.push_allowed(notification_type, send_push):
+                NotificationService.deliver_push(user, notification, event, metadata)
+            NotificationService.deliver_email(user, notification, event, send_email, metadata)
             return notification, event
 
         except Exception as e:
@@ -155,6 +93,124 @@ class NotificationService:
             logger.exception("Notification service error: %s", e)
             return None, None
 
+    @staticmethod
+    def create_records(
+        user: 'UserProfile',
+        notification_type: str,
+        title: str,
+        message: str,
+        priority: str = 'medium',
+        send_email: bool = True,
+        object_id: Optional[int] = None,
+        content_type: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        outbox_event: Optional[OutboxEvent] = None,
+    ) -> tuple[Notification, NotificationEvent]:
+        """
+        Create the in-app notification and its event log entry. With
+        ``outbox_event`` both are keyed on it, so a retried delivery reuses
+        the records of the first attempt.
+        """
+        notification_fields = {
+            'user': user,
+            'notification_type': notification_type,
+            'title': title,
+            'message': message,
+            'priority': priority,
+            'object_id': object_id,
+            'content_type': content_type,
+        }
+        event_fields = {
+            'user': user,
+            'event_type': notification_type,
+            'title': title,
+            'message': message,
+            'channel': 'both' if send_email else 'in_app',
+            'status': 'pending',
+            'metadata': metadata or {},
+        }
+        with transaction.atomic():
+            if outbox_event is None:
+                return (
+                    Notification.objects.create(**notification_fields),
+                    NotificationEvent.objects.create(**event_fields),
+                )
+            notification, _ = Notification.objects.get_or_create(
+                outbox_event=outbox_event, defaults=notification_fields,
+            )
+            event, _ = NotificationEvent.objects.get_or_create(
+                outbox_event=outbox_event, defaults=event_fields,
+            )
+            return notification, event
+
+    @staticmethod
+    def push_allowed(notification_type: str, send_push: bool) -> bool:
+        return send_push and notification_type not in PUSH_NOTIFICATION_EXCLUDED_TYPES
+
+    @staticmethod
+    def deliver_push(
+        user: 'UserProfile',
+        notification: Notification,
+        event: NotificationEvent,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Send the push notification and keep its result on the event log entry."""
+        push_result = PushNotificationSender.send(
+            user=user,
+            title=notification.title,
+            body=notification.message,
+            data={
+                'notification_id': notification.id,
+                'notification_type': notification.notification_type,
+                'object_id': notification.object_id,
+                'content_type': notification.content_type,
+                **(metadata or {}),
+            },
+        )
+        event.metadata = {
+            **(event.metadata or {}),
+            'push': push_result,
+        }
+        event.save(update_fields=['metadata'])
+        return push_result
+
+    @staticmethod
+    def deliver_email(
+        user: 'UserProfile',
+        notification: Notification,
+        event: NotificationEvent,
+        send_email: bool,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Send the email (if requested) and record the outcome on the event log entry."""
+        if not send_email:
+            event.status = 'sent'
+            event.sent_at = timezone.now()
+            event.save(update_fields=['status', 'sent_at'])
+            return True
+
+        sent, error_message = EmailNotificationSender.send(
+            user=user,
+            subject=notification.title,
+            template_name=f'notification/{notification.notification_type}_email.html',
+            context={
+                'user': user,
+                'message': notification.message,
+                'notification': notification,
+                **(metadata or {}),
+            }
+        )
+        if sent:
+            event.status = 'sent'
+            event.sent_at = timezone.now()
+            event.error_message = None
+            event.save(update_fields=['status', 'sent_at', 'error_message'])
+        else:
+            event.status = 'failed'
+            event.error_message = error_message or 'Unknown email delivery error'
+            event.save(update_fields=['status', 'error_message'])
+        return sent
+
     @staticmethod
     def get_unread_count(user: 'UserProfile') -> int:
         """Get count of unread notifications for a user."""
@@ -500,10 +556,96 @@ class PushNotificationSender:
         return clean
 
 
+class OrderNotificationBatch:
+    """
+    Collects order status notifications while open instead of sending them,
+    so a bulk update can send one summary notification per user.
+
+    Nested batches join the outermost one.
+    """
+
+    def __init__(self):
+        self.users: Dict[int, 'UserProfile'] = {}
+        self.updates: Dict[int, list[Dict[str, Any]]] = {}
+        self._token = None
+
+    @classmethod
+    def current(cls) -> Optional['OrderNotificationBatch']:
+        return _current_order_batch.get()
+
+    def record(self, user: 'UserProfile', order: Any, new_status: str, amount: float) -> None:
+        self.users.setdefault(user.pk, user)
+        self.updates.setdefault(user.pk, []).append({
+            'order_id': order.id,
+            'status': new_status,
+            'amount': amount,
+        })
+
+    def __enter__(self) -> 'OrderNotificationBatch':
+        outer = _current_order_batch.get()
+        if outer is not None:
+            return outer
+        self._token = _current_order_batch.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is None:
+            return
+        _current_order_batch.reset(self._token)
+        self._token = None
+
+
+_current_order_batch: ContextVar[Optional[OrderNotificationBatch]] = ContextVar('order_notification_batch', default=None)
+
+
+NOTIFICATION_OUTBOX_EVENT = 'notification'
+
+
+def queue_notification(user: 'UserProfile', **kwargs) -> OutboxEvent:
+    """
+    Record a notification in the outbox in the current transaction. The
+    outbox dispatcher sends it (in-app, push and email) after commit, so the
+    caller never waits on Expo or SMTP. Takes the arguments of
+    NotificationService.send_notification.
+    """
+    return enqueue(NOTIFICATION_OUTBOX_EVENT, user, kwargs)
+
+
+@outbox_handler(NOTIFICATION_OUTBOX_EVENT)
+def send_queued_notification(event: OutboxEvent) -> None:
+    """
+    Deliver a queued notification. Safe to repeat: the in-app notification
+    and its event log entry are keyed on the outbox event, and each retry
+    only re-sends the push or email that failed. Raises while either failed
+    so the outbox retries.
+    """
+    payload = dict(event.payload)
+    send_push = payload.pop('send_push', True)
+    notification, record = NotificationService.create_records(user=event.user, outbox_event=event, **payload)
+    metadata = payload.get('metadata')
+    errors = []
+
+    push_result = (record.metadata or {}).get('push')
+    push_pending = push_result is None or push_result.get('status') == 'failed'
+    if push_pending and NotificationService.push_allowed(notification.notification_type, send_push):
+        push_result = NotificationService.deliver_push(event.user, notification, record, metadata)
+        if push_result.get('status') == 'failed':
+            errors.append(f"push: {'; '.join(push_result.get('errors') or ['failed'])}")
+
+    if record.status != 'sent':
+        if not NotificationService.deliver_email(
+            event.user, notification, record, payload.get('send_email', True), metadata,
+        ):
+            errors.append(f"email: {record.error_message}")
+
+    if errors:
+        raise RuntimeError(f"Notification {notification.pk} delivery failed: {', '.join(errors)}")
+
+
 # Convenience functions for common notification types
 def notify_order_created(user: 'UserProfile', order: Any, amount: float) -> None:
     """Send notification when an order is created."""
-    NotificationService.send_notification(
+    queue_notification(
         user=user,
         notification_type='order_created',
         title='Order Received',
@@ -522,6 +664,11 @@ def notify_order_status_changed(
     amount: float,
 ) -> None:
     """Send notification when order status changes."""
+    batch = OrderNotificationBatch.current()
+    if batch is not None:
+        batch.record(user, order, new_status, amount)
+        return
+
     status_messages = {
         'Pending': ('Order Received', f'Your gift card order for ₦{amount} is pending review.'),
         'Approved': ('Order Approved', f'Your gift card order for ₦{amount} has been approved. The amount is now available in your withdrawable balance.'),
@@ -544,7 +691,7 @@ def notify_order_status_changed(
         'Cancelled': 'general',
     }
 
-    NotificationService.send_notification(
+    queue_notification(
         user=user,
         notification_type=notification_type_map.get(new_status, 'general'),
         title=title,
@@ -556,6 +703,36 @@ def notify_order_status_changed(
     )
 
 
+def notify_order_status_batch(
+    user: 'UserProfile',
+    updates: list[Dict[str, Any]],
+    pending_balance: float,
+    withdrawable_balance: float,
+) -> None:
+    """Send one notification summarising several order status changes."""
+    counts: Dict[str, int] = {}
+    for update in updates:
+        counts[update['status']] = counts.get(update['status'], 0) + 1
+    summary = ', '.join(f'{count} {status.lower()}' for status, count in counts.items())
+
+    queue_notification(
+        user=user,
+        notification_type='orders_updated',
+        title='Orders Updated',
+        message=(
+            f'{len(updates)} of your gift card orders have been updated ({summary}). '
+            f'Pending balance: ₦{pending_balance:,.2f}. Withdrawable balance: ₦{withdrawable_balance:,.2f}.'
+        ),
+        priority='high' if any(status in ['Approved', 'Rejected', 'Completed'] for status in counts) else 'medium',
+        content_type='order',
+        metadata={
+            'orders': updates,
+            'pending_balance': pending_balance,
+            'withdrawable_balance': withdrawable_balance,
+        },
+    )
+
+
 def notify_withdrawal_status_changed(
     user: 'UserProfile',
     withdrawal: Any,
@@ -581,7 +758,7 @@ def notify_withdrawal_status_changed(
     else:
         return
 
-    NotificationService.send_notification(
+    queue_notification(
         user=user,
         notification_type=f'withdrawal_{new_status.lower()}',
         title=title,
@@ -605,7 +782,7 @@ def notify_withdrawal_created(
     amount: float,
 ) -> None:
     """Send notification when a withdrawal request is created."""
-    NotificationService.send_notification(
+    queue_notification(
         user=user,
         notification_type='withdrawal_created',
         title='Withdrawal Requested',
@@ -630,7 +807,7 @@ def notify_kyc_status_changed(
         title = f'Level {level} Verification Rejected'
         message = f'Your Level {level} verification documents have been rejected. Please resubmit with correct information.'
 
-    NotificationService.send_notification(
+    queue_notification(
         user=user,
         notification_type=f'kyc_{new_status.lower()}',
         title=title,
@@ -658,7 +835,7 @@ def notify_balance_updated(
     else:
         message = f'Your {balance_names.get(balance_type, balance_type)} has been updated. New balance: ₦{new_balance:,.2f}'
 
-    NotificationService.send_notification(
+    queue_notification(
         user=user,
         notification_type='balance_updated',
         title='Balance Updated',
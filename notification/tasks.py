@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from notification import outbox
+
+
+@shared_task(name="notification.tasks.dispatch_outbox")
+def dispatch_outbox(batch_size: int | None = None):
+    """Deliver due outbox events (notifications, push and email)."""
+    # Importing the services module registers its outbox handlers.
+    import notification.services  # noqa: F401
+
+    return outbox.dispatch(batch_size)
@@ -1,16 +1,26 @@
+from datetime import timedelta
 from unittest.mock import Mock, patch
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 
 from account.models import UserProfile
+from notification import outbox
 from notification.models import (
+    Notification,
     NotificationEvent,
+    OutboxEvent,
     PushNotificationSubscriber,
     PushNotificationLog,
 )
-from notification.services import NotificationService
+from notification.services import (
+    EmailNotificationSender,
+    NotificationService,
+    PushNotificationSender,
+    notify_withdrawal_created,
+)
 
 
 class NotificationServicePushTests(TestCase):
@@ -224,3 +234,90 @@ class AdminPushTestEndpointTests(TestCase):
         client.force_authenticate(user=user)
         response = client.post(reverse("notification:admin-push-test"), {}, format="json")
         self.assertEqual(response.status_code, 403)
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    OUTBOX_MAX_ATTEMPTS=2,
+    OUTBOX_RETRY_BASE_SECONDS=30,
+)
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create_user(
+            email="user@example.com",
+            password="password123",
+        )
+        OutboxEvent.objects.all().delete()
+
+    def queue_withdrawal_notice(self, withdrawal_id):
+        notify_withdrawal_created(user=self.user, withdrawal=Mock(id=withdrawal_id), amount=500)
+
+    def test_notify_records_an_outbox_event_instead_of_sending(self):
+        self.queue_withdrawal_notice(7)
+
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+        event = OutboxEvent.objects.get(user=self.user)
+        self.assertEqual(event.status, OutboxEvent.STATUS_PENDING)
+        self.assertEqual(event.payload["metadata"]["withdrawal_id"], 7)
+
+        self.assertEqual(outbox.dispatch(), {"delivered": 1, "failed": 0, "batches": 1})
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_DONE)
+        self.assertEqual(Notification.objects.get(user=self.user).notification_type, "withdrawal_created")
+
+    def test_failed_event_backs_off_and_holds_back_later_events_for_the_user(self):
+        self.queue_withdrawal_notice(1)
+        self.queue_withdrawal_notice(2)
+        first, second = OutboxEvent.objects.filter(user=self.user)
+
+        with patch.object(EmailNotificationSender, "send", return_value=(False, "SMTP down")):
+            self.assertEqual(outbox.dispatch()["failed"], 1)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, OutboxEvent.STATUS_PENDING)
+        self.assertEqual(first.attempts, 1)
+        self.assertGreater(first.available_at, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(second.attempts, 0)
+        # The second event waits for the first even though it is due.
+        self.assertEqual(outbox.dispatch()["delivered"], 0)
+
+        OutboxEvent.objects.filter(pk=first.pk).update(available_at=timezone.now())
+        self.assertEqual(outbox.dispatch()["delivered"], 2)
+        self.assertEqual(
+            list(Notification.objects.filter(user=self.user).order_by("id").values_list("object_id", flat=True)),
+            [1, 2],
+        )
+
+    def test_event_is_marked_dead_after_max_attempts(self):
+        self.queue_withdrawal_notice(1)
+        event = OutboxEvent.objects.get(user=self.user)
+
+        with patch.object(EmailNotificationSender, "send", return_value=(False, "SMTP down")):
+            outbox.dispatch()
+            OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+            outbox.dispatch()
+
+        event.refresh_from_db()
+        self.assertEqual(event.status, OutboxEvent.STATUS_DEAD)
+        self.assertEqual(event.attempts, 2)
+        self.assertIn("SMTP down", event.last_error)
+        self.assertEqual(outbox.dispatch()["batches"], 0)
+
+    def test_retry_resends_only_the_failed_channel(self):
+        self.queue_withdrawal_notice(1)
+        event = OutboxEvent.objects.get(user=self.user)
+        pushed = {"attempted": 1, "sent": 1, "failed": 0, "deactivated": 0, "errors": [], "status": "success"}
+
+        with patch.object(PushNotificationSender, "send", return_value=pushed) as push, \
+                patch.object(EmailNotificationSender, "send", side_effect=[(False, "SMTP down"), (True, None)]) as email:
+            self.assertEqual(outbox.dispatch()["failed"], 1)
+            OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+            self.assertEqual(outbox.dispatch()["delivered"], 1)
+
+        self.assertEqual(push.call_count, 1)
+        self.assertEqual(email.call_count, 2)
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual(notification.outbox_event_id, event.pk)
+        record = NotificationEvent.objects.get(outbox_event=event)
+        self.assertEqual(record.status, "sent")
@@ -1,5 +1,20 @@
 from django.contrib import admin
-from .models import GiftCardOrder
+from .models import GiftCardOrder, OrderDuplicateMatch, OrderReviewLease
 
 
 admin.site.register(GiftCardOrder)
+
+
+@admin.register(OrderReviewLease)
+class OrderReviewLeaseAdmin(admin.ModelAdmin):
+    list_display = ('order', 'reviewer', 'claimed_at', 'expires_at')
+    list_select_related = ('order', 'reviewer')
+    search_fields = ('reviewer__email',)
+
+
+@admin.register(OrderDuplicateMatch)
+class OrderDuplicateMatchAdmin(admin.ModelAdmin):
+    list_display = ('order', 'matched_order', 'kind', 'distance', 'created_at')
+    list_filter = ('kind',)
+    list_select_related = ('order__user', 'matched_order__user')
+    search_fields = ('order__id', 'matched_order__id')
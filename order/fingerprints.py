@@ -0,0 +1,122 @@
+"""
+Duplicate detection for submitted gift cards.
+
+E-code pins are normalized and hashed with a server-side key, so identical
+codes match exactly through an index while the pins themselves are never
+stored in the index. Photos get a 64-bit difference hash (a perceptual
+hash that survives re-encoding and resizing). Image lookups use
+multi-index hashing: the hash is split into four 16-bit bands, and any two
+hashes within three bits of each other share at least one band exactly, so
+candidates come from indexed band equality and only they are compared.
+
+Matches are written to OrderDuplicateMatch in both directions when an
+order is fingerprinted, so reading them never scans GiftCardOrder.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.crypto import salted_hmac
+from PIL import Image
+
+from order.models import GiftCardOrder, OrderDuplicateMatch, OrderFingerprint
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+BAND_COUNT = 4
+BAND_BITS = HASH_BITS // BAND_COUNT
+# Band lookups only guarantee matches up to BAND_COUNT - 1 differing bits.
+MAX_IMAGE_DISTANCE = BAND_COUNT - 1
+
+
+def normalize_code(pin: str) -> str:
+    """Uppercase the pin and drop whitespace and separators."""
+    return ''.join(char for char in pin.upper() if char.isalnum())
+
+
+def code_digest(pin: str) -> str:
+    key = getattr(settings, 'ORDER_FINGERPRINT_KEY', '') or settings.SECRET_KEY
+    return salted_hmac('order.fingerprints.code', normalize_code(pin), secret=key, algorithm='sha256').hexdigest()
+
+
+def image_hash(image: Image.Image) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale thumbnail."""
+    pixels = list(image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_bands(value: int) -> list[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (BAND_BITS * index)) & mask for index in range(BAND_COUNT)]
+
+
+def get_image_match_distance() -> int:
+    return min(int(getattr(settings, 'ORDER_IMAGE_MATCH_DISTANCE', MAX_IMAGE_DISTANCE)), MAX_IMAGE_DISTANCE)
+
+
+def _record_matches(order: GiftCardOrder, kind: str, matches: dict[int, int]) -> list[OrderDuplicateMatch]:
+    if not matches:
+        return []
+    rows = []
+    for matched_id, distance in matches.items():
+        rows.append(OrderDuplicateMatch(order_id=order.pk, matched_order_id=matched_id, kind=kind, distance=distance))
+        rows.append(OrderDuplicateMatch(order_id=matched_id, matched_order_id=order.pk, kind=kind, distance=distance))
+    OrderDuplicateMatch.objects.bulk_create(rows, ignore_conflicts=True)
+    logger.warning(
+        "Order %s %s matches order(s) %s", order.pk, kind, ', '.join(str(order_id) for order_id in sorted(matches)),
+    )
+    return rows
+
+
+def record_code_fingerprint(order: GiftCardOrder) -> dict[int, int]:
+    """Fingerprint the order's e-code pin and record exact matches."""
+    if not order.e_code_pin or not normalize_code(order.e_code_pin):
+        return {}
+    digest = code_digest(order.e_code_pin)
+    matches = {
+        order_id: 0
+        for order_id in OrderFingerprint.objects.filter(kind=OrderFingerprint.KIND_CODE, digest=digest)
+        .exclude(order_id=order.pk)
+        .values_list('order_id', flat=True)
+    }
+    OrderFingerprint.objects.update_or_create(
+        order=order, kind=OrderFingerprint.KIND_CODE, defaults={'digest': digest},
+    )
+    _record_matches(order, OrderFingerprint.KIND_CODE, matches)
+    return matches
+
+
+def record_image_fingerprint(order: GiftCardOrder, image: Image.Image) -> dict[int, int]:
+    """Fingerprint the order's photo and record near-duplicate matches."""
+    value = image_hash(image)
+    bands = hash_bands(value)
+    max_distance = get_image_match_distance()
+
+    band_filter = Q()
+    for index, band in enumerate(bands):
+        band_filter |= Q(**{f'band_{index}': band})
+    candidates = (
+        OrderFingerprint.objects.filter(kind=OrderFingerprint.KIND_IMAGE)
+        .filter(band_filter)
+        .exclude(order_id=order.pk)
+        .values_list('order_id', 'digest')
+    )
+    matches = {}
+    for order_id, digest in candidates:
+        distance = (value ^ int(digest, 16)).bit_count()
+        if distance <= max_distance:
+            matches[order_id] = distance
+
+    OrderFingerprint.objects.update_or_create(
+        order=order,
+        kind=OrderFingerprint.KIND_IMAGE,
+        defaults={'digest': f'{value:016x}', **{f'band_{index}': band for index, band in enumerate(bands)}},
+    )
+    _record_matches(order, OrderFingerprint.KIND_IMAGE, matches)
+    return matches
@@ -0,0 +1,93 @@
+"""
+Image processing for uploaded gift card photos.
+
+Raw phone photos are large and carry EXIF metadata (including location).
+After an order is created the upload is re-encoded without metadata, and
+review-sized and thumbnail variants are written next to it so the admin
+review queue and order history never have to download the original.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from order.fingerprints import record_image_fingerprint
+from order.models import GiftCardOrder
+
+logger = logging.getLogger(__name__)
+
+# (longest side in pixels, encoder quality); None keeps the original size.
+IMAGE_VARIANTS = {
+    'image': (None, 90),
+    'image_review': (1600, 80),
+    'image_thumbnail': (320, 70),
+}
+
+
+def get_image_format() -> str:
+    image_format = getattr(settings, 'ORDER_IMAGE_FORMAT', 'WEBP').upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def encode_image(image: Image.Image, max_side: int | None, quality: int, image_format: str) -> bytes:
+    """Resize ``image`` to fit ``max_side`` and encode it without metadata."""
+    variant = image.copy()
+    if max_side is not None:
+        variant.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    # Pillow only writes EXIF when it is passed explicitly, so nothing from
+    # the upload survives the re-encode.
+    if image_format == 'JPEG':
+        variant.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        variant.save(buffer, format=image_format, quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def process_order_image(order: GiftCardOrder) -> dict[str, str] | None:
+    """
+    Replace the order's upload with a metadata-free re-encode and store the
+    review and thumbnail variants on the order. Returns the stored paths, or
+    None if the order has no image.
+    """
+    if not order.image or order.image_processed_at:
+        return None
+
+    image_format = get_image_format()
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    original_name = order.image.name
+
+    try:
+        with order.image.open('rb') as upload:
+            with Image.open(upload) as source:
+                # Apply the EXIF orientation before the metadata is dropped.
+                image = ImageOps.exif_transpose(source).convert('RGB')
+    except UnidentifiedImageError:
+        logger.warning("Order %s image %s is not a readable image; leaving it as uploaded", order.pk, original_name)
+        return None
+
+    record_image_fingerprint(order, image)
+
+    stem = os.path.splitext(os.path.basename(original_name))[0]
+    paths = {}
+    for field_name, (max_side, quality) in IMAGE_VARIANTS.items():
+        suffix = '' if field_name == 'image' else f"_{field_name.removeprefix('image_')}"
+        content = ContentFile(encode_image(image, max_side, quality, image_format))
+        getattr(order, field_name).save(f'{stem}{suffix}.{extension}', content, save=False)
+        paths[field_name] = getattr(order, field_name).name
+
+    order.image_processed_at = timezone.now()
+    # A queryset update keeps the order signals out of image bookkeeping.
+    GiftCardOrder.objects.filter(pk=order.pk).update(image_processed_at=order.image_processed_at, **paths)
+
+    if original_name != paths['image']:
+        order.image.storage.delete(original_name)
+    logger.info("Processed image for order %s into %s", order.pk, ', '.join(paths.values()))
+    return paths
@@ -0,0 +1,46 @@
+"""
+Management command to rebuild the order volume rollups from GiftCardOrder.
+
+The rollups for the chosen days are replaced in one transaction with totals
+from a single grouped query. Orders changed while the command runs for the
+same days may be missed, so run it outside busy periods.
+
+Usage:
+    python manage.py backfill_order_rollups
+    python manage.py backfill_order_rollups --start 2026-01-01 --end 2026-01-31
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from order.rollups import rebuild_order_rollups
+
+
+def parse_day(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date {value!r}; use YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild order volume rollups per day, card and status from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First day to rebuild (YYYY-MM-DD, default: the earliest order)',
+        )
+        parser.add_argument(
+            '--end',
+            help='Last day to rebuild (YYYY-MM-DD, default: the latest order)',
+        )
+
+    def handle(self, *args, **options):
+        start = parse_day(options['start']) if options['start'] else None
+        end = parse_day(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        written = rebuild_order_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} order volume rollup row(s).'))
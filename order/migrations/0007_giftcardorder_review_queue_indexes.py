@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 07:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0013_alter_giftcardnames_rate'),
+        ('order', '0006_alter_giftcardorder_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='giftcardorder',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='giftcardorder',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='giftcardorder',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='giftcardorder',
+            index=models.Index(fields=['card', 'created_at', 'id'], name='order_card_created_idx'),
+        ),
+    ]
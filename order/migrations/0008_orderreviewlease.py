@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 08:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0007_giftcardorder_review_queue_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderReviewLease',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_lease', serialize=False, to='order.giftcardorder')),
+                ('claimed_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_review_leases', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='order_lease_expires_idx'), models.Index(fields=['reviewer', 'expires_at'], name='order_lease_reviewer_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0008_orderreviewlease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='giftcardorder',
+            name='image_processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='giftcardorder',
+            name='image_review',
+            field=models.ImageField(blank=True, null=True, upload_to='orders/review/'),
+        ),
+        migrations.AddField(
+            model_name='giftcardorder',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='orders/thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0009_giftcardorder_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDuplicateMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('code', 'E-code'), ('image', 'Image')], max_length=10)),
+                ('distance', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('matched_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='order.giftcardorder')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_matches', to='order.giftcardorder')),
+            ],
+            options={
+                'ordering': ['matched_order_id'],
+                'constraints': [models.UniqueConstraint(fields=('order', 'matched_order', 'kind'), name='order_duplicate_match_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('code', 'E-code'), ('image', 'Image')], max_length=10)),
+                ('digest', models.CharField(max_length=64)),
+                ('band_0', models.PositiveIntegerField(blank=True, null=True)),
+                ('band_1', models.PositiveIntegerField(blank=True, null=True)),
+                ('band_2', models.PositiveIntegerField(blank=True, null=True)),
+                ('band_3', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='order.giftcardorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'digest'], name='order_fp_digest_idx'), models.Index(fields=['kind', 'band_0'], name='order_fp_band0_idx'), models.Index(fields=['kind', 'band_1'], name='order_fp_band1_idx'), models.Index(fields=['kind', 'band_2'], name='order_fp_band2_idx'), models.Index(fields=['kind', 'band_3'], name='order_fp_band3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'kind'), name='order_fingerprint_unique_kind')],
+            },
+        ),
+    ]
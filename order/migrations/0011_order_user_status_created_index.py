@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-17 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0013_alter_giftcardnames_rate'),
+        ('order', '0010_order_fingerprints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='giftcardorder',
+            index=models.Index(fields=['user', 'status', 'created_at', 'id'], name='order_user_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0014_card_rate_versions'),
+        ('order', '0011_order_user_status_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='giftcardorder',
+            name='payout_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='giftcardorder',
+            name='rate_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='orders', to='cards.cardrateversion'),
+        ),
+    ]
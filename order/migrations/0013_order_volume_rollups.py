@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0014_card_rate_versions'),
+        ('order', '0012_order_payout_quote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderVolumeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Approved', 'Approved'), ('Rejected', 'Rejected')], max_length=50)),
+                ('order_count', models.IntegerField(default=0)),
+                ('amount_total', models.BigIntegerField(default=0)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_volume_rollups', to='cards.giftcardnames')),
+            ],
+            options={
+                'ordering': ['day', 'card_id', 'status'],
+                'indexes': [models.Index(fields=['card', 'day'], name='order_rollup_card_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'card', 'status'), name='order_rollup_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 19:20
+
+from django.db import migrations, models
+from django.db.models import Min
+from django.utils import timezone
+
+
+def backfill_created_at(apps, schema_editor):
+    """
+    Orders placed before created_at existed have none. They predate every
+    timestamped order, so they take the earliest known timestamp and keep
+    sorting first, by id among themselves.
+    """
+    GiftCardOrder = apps.get_model('order', 'GiftCardOrder')
+    earliest = GiftCardOrder.objects.aggregate(earliest=Min('created_at'))['earliest']
+    GiftCardOrder.objects.filter(created_at__isnull=True).update(created_at=earliest or timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0013_order_volume_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='giftcardorder',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
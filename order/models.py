@@ -1,10 +1,13 @@
 from django.db import models
-from cards.models import GiftCardNames
+from cards.models import CardRateVersion, GiftCardNames
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from gtx.tracking import TrackedFieldsMixin
 
 user = get_user_model()
 
-class GiftCardOrder(models.Model):
+class GiftCardOrder(TrackedFieldsMixin, models.Model):
   TYPE_CHOICES = [
     ("Physical", "Physical"),
     ("E-Code", "E-Code"),
@@ -15,15 +18,143 @@ class GiftCardOrder(models.Model):
     ("Approved", "Approved"),
     ("Rejected", "Rejected"),
   ]
+  tracked_fields = ("status", "amount", "card")
 
   user = models.ForeignKey(user, on_delete=models.CASCADE)
   type = models.CharField(choices=TYPE_CHOICES, max_length=50)
   card = models.ForeignKey(GiftCardNames, on_delete=models.SET_NULL, null=True)
   image = models.ImageField(upload_to="orders/", null=True, blank=True)
+  image_review = models.ImageField(upload_to="orders/review/", null=True, blank=True)
+  image_thumbnail = models.ImageField(upload_to="orders/thumbnails/", null=True, blank=True)
+  image_processed_at = models.DateTimeField(null=True, blank=True)
   e_code_pin = models.CharField(max_length=25, null=True, blank=True)
   amount = models.IntegerField()
+  # Payout quoted when the order was placed; later rate edits do not change it.
+  rate_version = models.ForeignKey(CardRateVersion, on_delete=models.PROTECT, null=True, blank=True, related_name="orders")
+  payout_amount = models.DecimalField(decimal_places=2, max_digits=14, null=True, blank=True)
   status = models.CharField(choices=STATUS_CHOICES, max_length=50, default="Pending")
-  created_at = models.DateTimeField(auto_now_add=True, null=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=["created_at", "id"], name="order_created_idx"),
+      models.Index(fields=["status", "created_at", "id"], name="order_status_created_idx"),
+      models.Index(fields=["user", "created_at", "id"], name="order_user_created_idx"),
+      models.Index(fields=["user", "status", "created_at", "id"], name="order_user_status_created_idx"),
+      models.Index(fields=["card", "created_at", "id"], name="order_card_created_idx"),
+    ]
 
   def __str__(self):
     return f"Order #{self.id} - {self.user.email} - ₦{self.amount}"
+
+
+class OrderReviewLease(models.Model):
+  """
+  Time-limited claim on a pending order by one reviewer. Expired leases
+  are free to be claimed again.
+  """
+  order = models.OneToOneField(GiftCardOrder, on_delete=models.CASCADE, primary_key=True, related_name="review_lease")
+  reviewer = models.ForeignKey(user, on_delete=models.CASCADE, related_name="order_review_leases")
+  claimed_at = models.DateTimeField()
+  expires_at = models.DateTimeField()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=["expires_at"], name="order_lease_expires_idx"),
+      models.Index(fields=["reviewer", "expires_at"], name="order_lease_reviewer_idx"),
+    ]
+
+  def __str__(self):
+    return f"Order #{self.order_id} - {self.reviewer_id} until {self.expires_at}"
+
+  @property
+  def is_active(self):
+    return self.expires_at > timezone.now()
+
+
+class OrderFingerprint(models.Model):
+  """
+  Fingerprint of what an order submitted, indexed for duplicate lookups.
+
+  Codes store a keyed hash of the normalized e-code pin in ``digest``.
+  Images store a 64-bit perceptual hash as hex in ``digest`` and split into
+  four 16-bit bands, so near-duplicates can be found with indexed band
+  equality instead of comparing against every stored hash.
+  """
+  KIND_CODE = "code"
+  KIND_IMAGE = "image"
+  KIND_CHOICES = [
+    (KIND_CODE, "E-code"),
+    (KIND_IMAGE, "Image"),
+  ]
+
+  order = models.ForeignKey(GiftCardOrder, on_delete=models.CASCADE, related_name="fingerprints")
+  kind = models.CharField(choices=KIND_CHOICES, max_length=10)
+  digest = models.CharField(max_length=64)
+  band_0 = models.PositiveIntegerField(null=True, blank=True)
+  band_1 = models.PositiveIntegerField(null=True, blank=True)
+  band_2 = models.PositiveIntegerField(null=True, blank=True)
+  band_3 = models.PositiveIntegerField(null=True, blank=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=["order", "kind"], name="order_fingerprint_unique_kind"),
+    ]
+    indexes = [
+      models.Index(fields=["kind", "digest"], name="order_fp_digest_idx"),
+      models.Index(fields=["kind", "band_0"], name="order_fp_band0_idx"),
+      models.Index(fields=["kind", "band_1"], name="order_fp_band1_idx"),
+      models.Index(fields=["kind", "band_2"], name="order_fp_band2_idx"),
+      models.Index(fields=["kind", "band_3"], name="order_fp_band3_idx"),
+    ]
+
+  def __str__(self):
+    return f"Order #{self.order_id} {self.kind} {self.digest[:12]}"
+
+
+class OrderDuplicateMatch(models.Model):
+  """
+  An order whose code or image matches another order's. Stored in both
+  directions so each order lists its matches without a lookup.
+  """
+  order = models.ForeignKey(GiftCardOrder, on_delete=models.CASCADE, related_name="duplicate_matches")
+  matched_order = models.ForeignKey(GiftCardOrder, on_delete=models.CASCADE, related_name="+")
+  kind = models.CharField(choices=OrderFingerprint.KIND_CHOICES, max_length=10)
+  distance = models.PositiveSmallIntegerField(default=0)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    ordering = ["matched_order_id"]
+    constraints = [
+      models.UniqueConstraint(fields=["order", "matched_order", "kind"], name="order_duplicate_match_unique"),
+    ]
+
+  def __str__(self):
+    return f"Order #{self.order_id} matches #{self.matched_order_id} ({self.kind})"
+
+
+class OrderVolumeRollup(models.Model):
+  """
+  Number and total amount of orders per day, card and status, so volume
+  reports never scan GiftCardOrder. The order signals keep rows current;
+  ``manage.py backfill_order_rollups`` rebuilds them. Orders without a card
+  are not counted.
+  """
+  day = models.DateField()
+  card = models.ForeignKey(GiftCardNames, on_delete=models.CASCADE, related_name="order_volume_rollups")
+  status = models.CharField(choices=GiftCardOrder.STATUS_CHOICES, max_length=50)
+  order_count = models.IntegerField(default=0)
+  amount_total = models.BigIntegerField(default=0)
+
+  class Meta:
+    ordering = ["day", "card_id", "status"]
+    constraints = [
+      models.UniqueConstraint(fields=["day", "card", "status"], name="order_rollup_unique"),
+    ]
+    indexes = [
+      models.Index(fields=["card", "day"], name="order_rollup_card_day_idx"),
+    ]
+
+  def __str__(self):
+    return f"{self.day} card #{self.card_id} {self.status}: {self.order_count} / {self.amount_total}"
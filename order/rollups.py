@@ -0,0 +1,109 @@
+"""
+Order volume rollups: orders and order amount per (day, card, status).
+
+Rows are adjusted by signed deltas as orders are created, change status,
+amount or card, and are deleted. The delta is applied with an UPDATE of the
+one affected row, so concurrent orders on the same card and day never read
+and rewrite each other's totals. ``rebuild_order_rollups`` recomputes the
+rows for a date range with a single grouped query.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from order.models import GiftCardOrder, OrderVolumeRollup
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def rollup_day(order: GiftCardOrder) -> date | None:
+    if order.created_at is None:
+        return None
+    return timezone.localdate(order.created_at)
+
+
+def apply_rollup_delta(day: date, card_id: int, status: str, count: int, amount: int) -> None:
+    if not count and not amount:
+        return
+    rows = OrderVolumeRollup.objects.filter(day=day, card_id=card_id, status=status)
+    changes = {'order_count': F('order_count') + count, 'amount_total': F('amount_total') + amount}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            OrderVolumeRollup.objects.create(
+                day=day, card_id=card_id, status=status, order_count=count, amount_total=amount,
+            )
+    except IntegrityError:
+        # Another transaction created the row first.
+        rows.update(**changes)
+
+
+def record_order_created(order: GiftCardOrder) -> None:
+    day = rollup_day(order)
+    if day is not None and order.card_id is not None:
+        apply_rollup_delta(day, order.card_id, order.status, 1, order.amount)
+
+
+def record_order_changed(order: GiftCardOrder) -> None:
+    """Move the order from its loaded (card, status, amount) to its saved ones."""
+    if not order.changed_fields():
+        return
+    day = rollup_day(order)
+    if day is None:
+        return
+    old_card_id = order.initial_value('card')
+    old_status = order.initial_value('status')
+    old_amount = order.initial_value('amount')
+    if (old_card_id, old_status) == (order.card_id, order.status):
+        if order.card_id is not None:
+            apply_rollup_delta(day, order.card_id, order.status, 0, order.amount - old_amount)
+        return
+    if old_card_id is not None:
+        apply_rollup_delta(day, old_card_id, old_status, -1, -old_amount)
+    if order.card_id is not None:
+        apply_rollup_delta(day, order.card_id, order.status, 1, order.amount)
+
+
+def record_order_deleted(order: GiftCardOrder) -> None:
+    day = rollup_day(order)
+    card_id = order.initial_value('card')
+    if day is not None and card_id is not None:
+        apply_rollup_delta(day, card_id, order.initial_value('status'), -1, -order.initial_value('amount'))
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_order_rollups(start: date | None = None, end: date | None = None) -> int:
+    """
+    Replace the rollups for days from ``start`` to ``end`` (inclusive, both
+    optional) with totals grouped from GiftCardOrder. Returns the number of
+    rows written.
+    """
+    rollups = OrderVolumeRollup.objects.all()
+    orders = GiftCardOrder.objects.filter(card__isnull=False, created_at__isnull=False)
+    if start is not None:
+        rollups = rollups.filter(day__gte=start)
+        orders = orders.filter(created_at__gte=_day_start(start))
+    if end is not None:
+        rollups = rollups.filter(day__lte=end)
+        orders = orders.filter(created_at__lt=_day_start(end + timedelta(days=1)))
+
+    grouped = (
+        orders.annotate(day=TruncDate('created_at'))
+        .values('day', 'card_id', 'status')
+        .annotate(order_count=Count('id'), amount_total=Sum('amount'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        rows = OrderVolumeRollup.objects.bulk_create(
+            (OrderVolumeRollup(**values) for values in grouped.iterator()),
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return len(rows)
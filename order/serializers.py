@@ -3,6 +3,20 @@ from .models import GiftCardOrder
 from cards.models import GiftCardNames, GiftCardStore
 
 
+class OrderImageVariantField(serializers.ImageField):
+  """
+  URL of a processed order image variant, or of the original upload until
+  the image pipeline has produced it.
+  """
+
+  def __init__(self, **kwargs):
+    kwargs['read_only'] = True
+    super().__init__(**kwargs)
+
+  def get_attribute(self, instance):
+    return super().get_attribute(instance) or instance.image
+
+
 class GiftCardStoreSerializer(serializers.ModelSerializer):
   image = serializers.ImageField(use_url=True)
   class Meta:
@@ -25,9 +39,12 @@ class GiftCardNameSerializer(serializers.ModelSerializer):
 
 class GiftCardOrderSerializer(serializers.ModelSerializer):
     card = GiftCardNameSerializer()
+    image_review = OrderImageVariantField()
+    image_thumbnail = OrderImageVariantField()
+    rate = serializers.DecimalField(source='rate_version.rate', max_digits=12, decimal_places=2, read_only=True, allow_null=True)
     class Meta:
         model = GiftCardOrder
-        fields = ["id", 'type', 'card', 'image', 'amount', 'e_code_pin', 'status']
+        fields = ["id", 'type', 'card', 'image', 'image_review', 'image_thumbnail', 'amount', 'rate', 'payout_amount', 'e_code_pin', 'status']
 class GiftCardOrderListSerializer(serializers.ModelSerializer):
     card = GiftCardNameListSerializer()
     class Meta:
@@ -37,10 +54,11 @@ class GiftCardOrderListSerializer(serializers.ModelSerializer):
 
 class GiftCardOrderHistorySerializer(serializers.ModelSerializer):
     card = GiftCardNameListSerializer()
+    image_thumbnail = OrderImageVariantField()
 
     class Meta:
         model = GiftCardOrder
-        fields = ["id", "type", "card", "amount", "status", "created_at"]
+        fields = ["id", "type", "card", "image_thumbnail", "amount", "payout_amount", "status", "created_at"]
 
 
 class GiftCardOrderCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,76 @@
+"""
+Reviewer assignment for pending orders.
+
+Reviewers claim the next pending orders for a limited time. Claims take
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it, so
+concurrent claimers walk past each other's rows instead of queueing on them.
+Every lease is also taken with a conditional write, which keeps claims
+exclusive on databases without SKIP LOCKED (SQLite); there a losing claimer
+may simply receive fewer orders than it asked for.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from order.models import GiftCardOrder, OrderReviewLease
+
+REVIEWABLE_STATUS = 'Pending'
+
+
+def get_review_lease_seconds() -> int:
+    return int(getattr(settings, 'ORDER_REVIEW_LEASE_SECONDS', 900))
+
+
+def _take_lease(order: GiftCardOrder, reviewer, now, expires_at) -> bool:
+    taken = OrderReviewLease.objects.filter(order=order, expires_at__lte=now).update(
+        reviewer=reviewer,
+        claimed_at=now,
+        expires_at=expires_at,
+    )
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            OrderReviewLease.objects.create(order=order, reviewer=reviewer, claimed_at=now, expires_at=expires_at)
+    except IntegrityError:
+        # Someone else holds an active lease on this order.
+        return False
+    return True
+
+
+def claim_orders_for_review(reviewer, count: int, lease_seconds: int | None = None) -> tuple[list[GiftCardOrder], datetime]:
+    """
+    Lease up to ``count`` unclaimed pending orders, oldest first, to
+    ``reviewer``. Returns the claimed orders and the lease expiry.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=lease_seconds or get_review_lease_seconds())
+
+    with transaction.atomic():
+        candidates = (
+            GiftCardOrder.objects.select_related('user__referred_by', 'card__store')
+            .prefetch_related('duplicate_matches')
+            .filter(status=REVIEWABLE_STATUS)
+            .filter(Q(review_lease__isnull=True) | Q(review_lease__expires_at__lte=now))
+            .order_by('created_at', 'id')
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+
+        claimed = [order for order in candidates[:count] if _take_lease(order, reviewer, now, expires_at)]
+    return claimed, expires_at
+
+
+def release_order_lease(order: GiftCardOrder | int, reviewer=None) -> bool:
+    """
+    Give an order back to the pool. With ``reviewer`` only that reviewer's
+    lease is released.
+    """
+    leases = OrderReviewLease.objects.filter(order_id=getattr(order, 'pk', order))
+    if reviewer is not None:
+        leases = leases.filter(reviewer=reviewer)
+    deleted, _ = leases.delete()
+    return bool(deleted)
@@ -1,41 +1,27 @@
 """
 Django signals for automatic balance updates and notifications.
 """
-from decimal import Decimal
+import logging
 
-from django.db.models.signals import pre_save, post_save, post_delete
-from django.dispatch import receiver
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
-from order.models import GiftCardOrder
-from account.models import UserProfile
+from order.fingerprints import record_code_fingerprint
+from order.models import GiftCardOrder, OrderReviewLease
+from order.rollups import record_order_changed, record_order_created, record_order_deleted
+from account.balances import (
+    WITHDRAWABLE_STATUSES,
+    apply_balance_delta,
+    is_owner_deletion,
+    order_contribution,
+)
 from notification.services import (
     notify_order_created,
     notify_order_status_changed,
 )
 
-
-PENDING_STATUSES = {'Pending'}
-WITHDRAWABLE_STATUSES = {'Approved', 'Completed'}
-WITHDRAWAL_RESERVED_STATUSES = {'Pending', 'Processing', 'Approved', 'Completed'}
-
-
-def _as_decimal(amount: int | float | Decimal) -> Decimal:
-    return Decimal(str(amount))
-
-
-@receiver(pre_save, sender=GiftCardOrder)
-def capture_old_order_status(sender, instance, **kwargs):
-    """
-    Capture the old status before save so post_save can compare transitions.
-    """
-    if not instance.pk:
-        instance._old_status = None
-        return
-
-    old_status = GiftCardOrder.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
-    instance._old_status = old_status
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=GiftCardOrder)
@@ -43,12 +29,16 @@ def handle_order_created(sender, instance, created, **kwargs):
     """
     Handle order creation side effects:
     - notify user
-    - reconcile balances for newly-created orders
+    - apply the new order to the user's balances
     """
     if not created:
         return
 
-    recalculate_user_balances(instance.user)
+    apply_balance_delta(
+        instance.user_id,
+        order_contribution(instance.status, instance.amount),
+        source=instance,
+    )
     if instance.status in WITHDRAWABLE_STATUSES:
         from account.services import process_referral_commission_for_order
 
@@ -60,21 +50,75 @@ def handle_order_created(sender, instance, created, **kwargs):
     )
 
 
+def enqueue_order_image_processing(order_id: int) -> None:
+    from order.tasks import process_order_image_task
+
+    try:
+        process_order_image_task.delay(order_id)
+    except Exception as exc:
+        # The order stands without processed images; serializers fall back
+        # to the original upload.
+        logger.warning("Could not queue image processing for order %s: %s", order_id, exc)
+
+
 @receiver(post_save, sender=GiftCardOrder)
-def handle_order_status_change(sender, instance, **kwargs):
+def record_order_code_fingerprint(sender, instance, created, **kwargs):
+    """
+    Index the e-code pin of new orders so resubmitted codes are flagged.
+    """
+    if created and instance.e_code_pin:
+        record_code_fingerprint(instance)
+
+
+@receiver(post_save, sender=GiftCardOrder)
+def queue_order_image_processing(sender, instance, created, **kwargs):
+    """
+    Process uploaded photos in the background once the order is committed.
+    """
+    if created and instance.image:
+        transaction.on_commit(lambda: enqueue_order_image_processing(instance.pk))
+
+
+@receiver(post_save, sender=GiftCardOrder)
+def update_order_volume_rollups(sender, instance, created, **kwargs):
+    """
+    Keep the per day, card and status volume rollups in step with the order.
+    """
+    if created:
+        record_order_created(instance)
+    else:
+        record_order_changed(instance)
+
+
+@receiver(post_save, sender=GiftCardOrder)
+def handle_order_status_change(sender, instance, created, **kwargs):
     """
     Handle balance updates when order status changes.
-    This signal updates pending_balance and withdrawable_balance automatically.
+    This signal applies the status transition as a delta to
+    pending_balance and withdrawable_balance.
     """
-    old_status = getattr(instance, '_old_status', None)
+    if created:
+        return
+
+    # Only process if status or amount actually changed
+    changed = instance.changed_fields()
+    if 'status' not in changed and 'amount' not in changed:
+        return
+
+    old_status = instance.initial_value('status')
     if old_status is None:
         return
+    old_amount = instance.initial_value('amount')
+    status_changed = 'status' in changed
 
-    # Only process if status actually changed
-    if old_status == instance.status:
+    apply_balance_delta(
+        instance.user_id,
+        order_contribution(instance.status, instance.amount) - order_contribution(old_status, old_amount),
+        source=instance,
+    )
+    if not status_changed:
         return
 
-    recalculate_user_balances(instance.user)
     if instance.status in WITHDRAWABLE_STATUSES:
         from account.services import process_referral_commission_for_order
 
@@ -89,62 +133,14 @@ def handle_order_status_change(sender, instance, **kwargs):
     )
 
 
-def recalculate_user_balances(user: UserProfile) -> tuple[Decimal, Decimal]:
+@receiver(post_save, sender=GiftCardOrder)
+def release_review_lease(sender, instance, created, **kwargs):
     """
-    Recalculate user balances from scratch based on their orders.
-    This is useful for data consistency checks or migration.
-
-    Returns:
-        Tuple of (pending_balance, withdrawable_balance)
+    Return the reviewer's lease once an order leaves the review queue.
     """
-    from withdrawal.models import Withdrawal
-    from account.models import ReferralCommission
-    from account.services import REFERRAL_COMMISSION_PAID_STATUS
-
-    with transaction.atomic():
-        locked_user = UserProfile.objects.select_for_update().get(pk=user.pk)
-
-        # Pending = sum of orders currently pending review.
-        pending_result = GiftCardOrder.objects.filter(
-            user_id=locked_user.pk,
-            status__in=PENDING_STATUSES
-        ).aggregate(total=Sum('amount'))
-        pending_balance = _as_decimal(pending_result['total'] or 0)
-
-        # Gross withdrawable = all approved/completed orders.
-        gross_withdrawable_result = GiftCardOrder.objects.filter(
-            user_id=locked_user.pk,
-            status__in=WITHDRAWABLE_STATUSES
-        ).aggregate(total=Sum('amount'))
-        gross_withdrawable = _as_decimal(gross_withdrawable_result['total'] or 0)
-
-        referral_commissions_result = ReferralCommission.objects.filter(
-            referrer_id=locked_user.pk,
-            status=REFERRAL_COMMISSION_PAID_STATUS,
-        ).aggregate(total=Sum('amount'))
-        referral_commissions_total = _as_decimal(referral_commissions_result['total'] or 0)
-
-        # Reserve funds for all active or completed withdrawals.
-        # This ensures:
-        # - Pending withdrawals are deducted immediately
-        # - Approved/Completed withdrawals stay deducted
-        # - Rejected/Cancelled/Failed withdrawals are returned automatically
-        reserved_withdrawals_result = Withdrawal.objects.filter(
-            user_id=locked_user.pk,
-            status__in=WITHDRAWAL_RESERVED_STATUSES,
-        ).aggregate(total=Sum('amount'))
-        reserved_withdrawals_total = _as_decimal(reserved_withdrawals_result['total'] or 0)
-
-        withdrawable_balance = max(
-            Decimal('0.00'),
-            gross_withdrawable + referral_commissions_total - reserved_withdrawals_total
-        )
-
-        locked_user.pending_balance = pending_balance
-        locked_user.withdrawable_balance = withdrawable_balance
-        locked_user.save(update_fields=['pending_balance', 'withdrawable_balance'])
-
-    return pending_balance, withdrawable_balance
+    if created or instance.status == 'Pending' or not instance.has_changed('status'):
+        return
+    OrderReviewLease.objects.filter(order=instance).delete()
 
 
 @receiver(post_delete, sender=GiftCardOrder)
@@ -152,4 +148,17 @@ def handle_order_deleted(sender, instance, **kwargs):
     """
     Keep balances consistent if an order is deleted.
     """
-    recalculate_user_balances(instance.user)
+    if is_owner_deletion(kwargs.get('origin'), instance.user_id):
+        return
+
+    apply_balance_delta(
+        instance.user_id,
+        -order_contribution(instance.status, instance.amount),
+        rebuild_missing=False,
+        source=instance,
+    )
+
+
+@receiver(post_delete, sender=GiftCardOrder)
+def remove_deleted_order_from_rollups(sender, instance, **kwargs):
+    record_order_deleted(instance)
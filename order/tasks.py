@@ -0,0 +1,19 @@
+import logging
+
+from celery import shared_task
+
+from order.images import process_order_image
+from order.models import GiftCardOrder
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name="order.tasks.process_order_image", autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def process_order_image_task(order_id: int):
+    """Strip metadata from an order's upload and build its smaller variants."""
+    order = GiftCardOrder.objects.filter(pk=order_id).first()
+    if order is None:
+        logger.info("Skipping image processing for missing order %s", order_id)
+        return None
+    return process_order_image(order)
@@ -1,3 +1,166 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageDraw
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from account.models import UserProfile
+from cards.models import GiftCardNames, GiftCardStore
+from order.fingerprints import hash_bands, image_hash
+from order.images import process_order_image
+from order.models import GiftCardOrder, OrderDuplicateMatch
+from order.serializers import GiftCardOrderHistorySerializer
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    ORDER_IMAGE_FORMAT='WEBP',
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OrderImageProcessingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def make_photo(self, size=(2400, 1800)):
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'  # Make
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('card.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_processing_strips_exif_and_builds_variants(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=user, type='Physical', card=None, amount=100, image=self.make_photo())
+        original_name = order.image.name
+
+        paths = process_order_image(order)
+
+        order.refresh_from_db()
+        self.assertIsNotNone(order.image_processed_at)
+        self.assertEqual(order.image.name, paths['image'])
+        self.assertFalse(order.image.storage.exists(original_name))
+        expected = {'image': (1800, 2400), 'image_review': (1200, 1600), 'image_thumbnail': (240, 320)}
+        for field_name, size in expected.items():
+            with getattr(order, field_name).open('rb') as stored, Image.open(stored) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, size)
+                self.assertEqual(len(image.getexif()), 0)
+
+        # Already processed orders are left alone.
+        self.assertIsNone(process_order_image(order))
+
+    def test_history_serializer_returns_thumbnail_with_fallback(self):
+        user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        order = GiftCardOrder.objects.create(user=user, type='Physical', card=None, amount=100, image=self.make_photo((64, 48)))
+
+        self.assertEqual(GiftCardOrderHistorySerializer(order).data['image_thumbnail'], order.image.url)
+
+        process_order_image(order)
+        order.refresh_from_db()
+        self.assertEqual(GiftCardOrderHistorySerializer(order).data['image_thumbnail'], order.image_thumbnail.url)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DuplicateCardDetectionTests(TestCase):
+    def setUp(self):
+        self.first = UserProfile.objects.create_user(email='first@example.com', password='StrongPassword123')
+        self.second = UserProfile.objects.create_user(email='second@example.com', password='StrongPassword123')
+
+    def make_photo(self, quality):
+        image = Image.new('RGB', (400, 300), 'white')
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((40, 40, 200, 160), fill='navy')
+        draw.ellipse((220, 120, 360, 260), fill='orange')
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=quality)
+        return SimpleUploadedFile('card.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_resubmitted_code_is_matched_across_accounts(self):
+        original = GiftCardOrder.objects.create(user=self.first, type='E-Code', card=None, amount=100, e_code_pin='abcd-1234 efgh')
+        GiftCardOrder.objects.create(user=self.first, type='E-Code', card=None, amount=100, e_code_pin='ZZZZ-0000')
+        resubmitted = GiftCardOrder.objects.create(user=self.second, type='E-Code', card=None, amount=100, e_code_pin='ABCD1234EFGH')
+
+        self.assertEqual(
+            list(OrderDuplicateMatch.objects.filter(order=resubmitted).values_list('matched_order_id', 'kind')),
+            [(original.id, 'code')],
+        )
+        self.assertTrue(OrderDuplicateMatch.objects.filter(order=original, matched_order=resubmitted).exists())
+
+    def test_reencoded_photo_is_matched_by_perceptual_hash(self):
+        original = GiftCardOrder.objects.create(user=self.first, type='Physical', card=None, amount=100, image=self.make_photo(95))
+        copy = GiftCardOrder.objects.create(user=self.second, type='Physical', card=None, amount=100, image=self.make_photo(40))
+        process_order_image(original)
+        process_order_image(copy)
+
+        match = OrderDuplicateMatch.objects.get(order=copy)
+        self.assertEqual(match.matched_order_id, original.id)
+        self.assertEqual(match.kind, 'image')
+        self.assertLessEqual(match.distance, 3)
+
+    def test_image_hash_is_split_into_four_16_bit_bands(self):
+        with Image.open(self.make_photo(95)) as photo:
+            self.assertLess(image_hash(photo), 1 << 64)
+        self.assertEqual(hash_bands(0x0001000200030004), [4, 3, 2, 1])
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class IdempotentOrderCreationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create_user(email='seller@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.user)
+        store = GiftCardStore.objects.create(name='Apple', category='Popular')
+        self.card = GiftCardNames.objects.create(store=store, name='Apple US', type='E-code')
+
+    def create_order(self, key):
+        return self.client.post(
+            reverse('create_order'),
+            {'type': 'E-Code', 'card': self.card.id, 'amount': 500, 'e_code_pin': 'ABCD-1234'},
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.create_order('upload-1')
+        retry = self.create_order('upload-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(GiftCardOrder.objects.filter(user=self.user).count(), 1)
+
+    def test_failed_attempt_can_be_retried_with_the_same_key(self):
+        response = self.client.post(
+            reverse('create_order'), {'type': 'E-Code', 'card': self.card.id, 'amount': 500}, HTTP_IDEMPOTENCY_KEY='upload-1',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.create_order('upload-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(GiftCardOrder.objects.filter(user=self.user).count(), 1)
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.assertEqual(self.create_order('upload-1').status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(
+            reverse('create_order'),
+            {'type': 'E-Code', 'card': self.card.id, 'amount': 900, 'e_code_pin': 'ABCD-1234'},
+            HTTP_IDEMPOTENCY_KEY='upload-1',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(GiftCardOrder.objects.filter(user=self.user).count(), 1)
 
-# Create your tests here.
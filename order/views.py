@@ -5,6 +5,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.views.generic import TemplateView
 
+from cards.rates import lock_payout_quote
+from gtx.idempotency import idempotent
+
 from .models import GiftCardOrder
 from .serializers import GiftCardOrderCreateSerializer
 
@@ -18,24 +21,34 @@ class CreateGiftCardOrderView(APIView):
     parser_classes = [MultiPartParser, FormParser]
     serializer_class = GiftCardOrderCreateSerializer
 
+    @idempotent('order.create')
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
 
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        GiftCardOrder.objects.create(
+        card = serializer.validated_data['card']
+        amount = serializer.validated_data['amount']
+        quote = lock_payout_quote(card, amount) if card is not None else None
+
+        order = GiftCardOrder.objects.create(
             user=request.user,
             type=serializer.validated_data['type'],
-            card=serializer.validated_data['card'],
+            card=card,
             image=serializer.validated_data.get('image', None),
             e_code_pin=serializer.validated_data.get('e_code_pin', None),
-            amount=serializer.validated_data['amount'],
+            amount=amount,
+            rate_version_id=quote.rate_version_id if quote else None,
+            payout_amount=quote.payout if quote else None,
         )
 
         return Response(
             {
                 'detail': 'Order created successfully.',
+                'order_id': order.id,
+                'rate': quote.rate if quote else None,
+                'payout_amount': quote.payout if quote else None,
             },
             status=status.HTTP_201_CREATED
         )
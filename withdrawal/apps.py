@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WithdrawalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'withdrawal'
+
+    def ready(self):
+        # Import signals to connect them
+        import withdrawal.signals
@@ -2,8 +2,10 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+from gtx.tracking import TrackedFieldsMixin
 
-class Withdrawal(models.Model):
+
+class Withdrawal(TrackedFieldsMixin, models.Model):
     """
     Withdrawal request model for users to withdraw their withdrawable balance.
     """
@@ -16,6 +18,7 @@ class Withdrawal(models.Model):
         ('Completed', 'Completed'),
         ('Failed', 'Failed'),
     ]
+    tracked_fields = ('status', 'amount')
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -79,8 +82,6 @@ class Withdrawal(models.Model):
         Approve the withdrawal request.
         This should be called within a transaction.
         """
-        from order.signals import recalculate_user_balances
-        
         if self.status != 'Pending':
             raise ValueError(f"Cannot approve withdrawal with status: {self.status}")
         
@@ -90,15 +91,10 @@ class Withdrawal(models.Model):
         self.transaction_reference = transaction_reference
         self.save()
 
-        # Recalculate to keep balances consistent with source transactions.
-        recalculate_user_balances(self.user)
-
     def reject(self, admin_user: settings.AUTH_USER_MODEL, reason: str):
         """
         Reject the withdrawal request.
         """
-        from order.signals import recalculate_user_balances
-
         if self.status != 'Pending':
             raise ValueError(f"Cannot reject withdrawal with status: {self.status}")
         
@@ -106,28 +102,22 @@ class Withdrawal(models.Model):
         self.processed_by = admin_user
         self.processed_at = timezone.now()
         self.rejection_reason = reason
+        # Saving releases the reserved amount back to the withdrawable balance.
         self.save()
 
-        # Recalculate so rejected amount is returned to withdrawable balance.
-        recalculate_user_balances(self.user)
-
     def can_cancel(self) -> bool:
         """Check if the withdrawal can be cancelled by the user."""
         return self.status == 'Pending'
 
     def cancel(self):
         """Cancel the withdrawal request."""
-        from order.signals import recalculate_user_balances
-
         if not self.can_cancel():
             raise ValueError(f"Cannot cancel withdrawal with status: {self.status}")
         
         self.status = 'Cancelled'
+        # Saving releases the reserved amount back to the withdrawable balance.
         self.save()
 
-        # Recalculate so cancelled amount is returned to withdrawable balance.
-        recalculate_user_balances(self.user)
-
 
 class WithdrawalAuditLog(models.Model):
     """
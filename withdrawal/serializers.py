@@ -1,7 +1,6 @@
 from rest_framework import serializers
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import extend_schema_field
-from decimal import Decimal
+from datetime import timedelta
+from django.utils import timezone
 from .models import Withdrawal
 from account.models import UserProfile
 
@@ -20,11 +19,14 @@ class WithdrawalCreateSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Amount must be greater than zero.")
 
-        # Check if user has sufficient withdrawable balance
-        user = self.context['request'].user
-        if value > user.withdrawable_balance:
+        # Check if user has sufficient withdrawable balance. The view passes
+        # the balance read under lock; fall back to the stored wallet.
+        withdrawable_balance = self.context.get('withdrawable_balance')
+        if withdrawable_balance is None:
+            withdrawable_balance = self.context['request'].user.wallet.withdrawable_balance
+        if value > withdrawable_balance:
             raise serializers.ValidationError(
-                f"Insufficient withdrawable balance. Your current withdrawable balance is ₦{user.withdrawable_balance:,.2f}."
+                f"Insufficient withdrawable balance. Your current withdrawable balance is ₦{withdrawable_balance:,.2f}."
             )
 
         return value
@@ -87,13 +89,46 @@ class WithdrawalDetailSerializer(serializers.ModelSerializer):
 
 
 class UserBalanceSerializer(serializers.Serializer):
-    """Serializer for user balance information."""
+    """
+    Serializer for user balance information.
+
+    Serializes the snapshot from account.balances.get_balance_snapshot plus
+    the user's transaction limit.
+    """
+    balance_version = serializers.IntegerField(read_only=True)
     pending_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     withdrawable_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     transaction_limit = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
-    total_balance = serializers.SerializerMethodField()
+    total_balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    total_earned = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    total_withdrawn = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    referral_earnings = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+
+
+class BalanceCurveQuerySerializer(serializers.Serializer):
+    """Query parameters for the balance curve endpoint."""
+    MAX_DAYS = 366
+    DEFAULT_DAYS = 30
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=self.DEFAULT_DAYS - 1)
+        if start > end:
+            raise serializers.ValidationError({"start": "Start date must be on or before end date."})
+        if (end - start).days + 1 > self.MAX_DAYS:
+            raise serializers.ValidationError(
+                {"start": f"Date range cannot be longer than {self.MAX_DAYS} days."}
+            )
+        return {'start': start, 'end': end}
+
 
-    @extend_schema_field(OpenApiTypes.NUMBER)
-    def get_total_balance(self, obj) -> Decimal:
-        # obj is the user profile
-        return obj.pending_balance + obj.withdrawable_balance
+class BalanceCurvePointSerializer(serializers.Serializer):
+    """One day of a user's balance curve."""
+    date = serializers.DateField(read_only=True)
+    pending_balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    withdrawable_balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    lifetime_approved = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    lifetime_withdrawn = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
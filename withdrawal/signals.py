@@ -0,0 +1,43 @@
+"""
+Django signals for keeping balances in step with withdrawal transitions.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from account.balances import apply_balance_delta, is_owner_deletion, withdrawal_contribution
+from withdrawal.models import Withdrawal
+
+
+@receiver(post_save, sender=Withdrawal)
+def handle_withdrawal_saved(sender, instance, created, **kwargs):
+    """
+    Reserve the amount of new withdrawals and release or re-reserve it
+    when a withdrawal moves between reserved and returned statuses.
+    """
+    if created:
+        delta = withdrawal_contribution(instance.status, instance.amount)
+    else:
+        delta = (
+            withdrawal_contribution(instance.status, instance.amount)
+            - withdrawal_contribution(
+                instance.initial_value('status'),
+                instance.initial_value('amount'),
+            )
+        )
+    apply_balance_delta(instance.user_id, delta, source=instance)
+
+
+@receiver(post_delete, sender=Withdrawal)
+def handle_withdrawal_deleted(sender, instance, **kwargs):
+    """
+    Keep balances consistent if a withdrawal is deleted.
+    """
+    if is_owner_deletion(kwargs.get('origin'), instance.user_id):
+        return
+
+    apply_balance_delta(
+        instance.user_id,
+        -withdrawal_contribution(instance.status, instance.amount),
+        rebuild_missing=False,
+        source=instance,
+    )
@@ -1,10 +1,17 @@
+from datetime import datetime
 from decimal import Decimal
+from unittest import mock
 
+from django.core.cache import cache
 from django.test import override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from account.models import Level2Credentials, UserProfile
+from account import balances
+from account.ledger import post_transaction
+from account.models import LedgerEntry, Level2Credentials, UserBalanceAggregate, UserProfile
+from account.tasks import snapshot_daily_balances
 from order.models import GiftCardOrder
 from withdrawal.models import Withdrawal
 
@@ -153,3 +160,149 @@ class WithdrawalLimitTests(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_retried_withdrawal_with_idempotency_key_is_created_once(self):
+        cache.clear()
+        user = self.create_verified_user()
+        payload = {
+            'amount': '1000.00',
+            'transaction_pin': '1234',
+            'bank_name': 'Test Bank',
+            'account_name': 'Test User',
+            'account_number': '1234567890',
+        }
+
+        first = self.client.post('/withdrawal/requests/create/', payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        retry = self.client.post('/withdrawal/requests/create/', payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Withdrawal.objects.filter(user=user).count(), 1)
+
+        other = self.client.post('/withdrawal/requests/create/', payload, format='json', HTTP_IDEMPOTENCY_KEY='retry-2')
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Withdrawal.objects.filter(user=user).count(), 2)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class UserBalanceViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create_user(email='user@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_balance_is_cached_until_a_balance_write_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=1000, status='Approved')
+
+        first = self.client.get('/withdrawal/balance/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['withdrawable_balance'], '1000.00')
+
+        # Reads hit the cache only: no locking, recalculation or writes.
+        with self.assertNumQueries(0):
+            cached = self.client.get('/withdrawal/balance/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=250)
+
+        second = self.client.get('/withdrawal/balance/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['pending_balance'], '250.00')
+        self.assertGreater(second.data['balance_version'], first.data['balance_version'])
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+
+    def test_snapshot_read_during_a_write_is_not_served_after_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=1000, status='Approved')
+
+        def write_meanwhile(aggregate):
+            with self.captureOnCommitCallbacks(execute=True):
+                GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=250)
+            return snapshot_of(aggregate)
+
+        snapshot_of = balances.balance_snapshot
+        with mock.patch('account.balances.balance_snapshot', side_effect=write_meanwhile):
+            stale = balances.get_balance_snapshot(self.user)
+        self.assertEqual(stale['pending_balance'], Decimal('0.00'))
+
+        self.assertEqual(balances.get_balance_snapshot(self.user)['pending_balance'], Decimal('250.00'))
+
+    def test_user_without_aggregate_is_read_without_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GiftCardOrder.objects.create(user=self.user, type='E-Code', card=None, amount=1000, status='Approved')
+        UserBalanceAggregate.objects.filter(user=self.user).delete()
+
+        response = self.client.get('/withdrawal/balance/')
+
+        self.assertEqual(response.data['withdrawable_balance'], '1000.00')
+        self.assertFalse(UserBalanceAggregate.objects.filter(user=self.user).exists())
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class BalanceCurveTests(APITestCase):
+    def at(self, day):
+        noon = timezone.make_aware(datetime.fromisoformat(f'{day}T12:00'))
+        return mock.patch('django.utils.timezone.now', return_value=noon)
+
+    def test_curve_carries_snapshots_forward_over_the_range(self):
+        with self.at('2026-01-01'):
+            user = UserProfile.objects.create_user(email='user@example.com', password='StrongPassword123')
+            idle = UserProfile.objects.create_user(email='idle@example.com', password='StrongPassword123')
+            GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=1000, status='Approved')
+        with self.at('2026-01-02'):
+            Withdrawal.objects.create(user=user, amount=Decimal('400.00'), status='Approved')
+
+        # Snapshots record each day as it stood at its end, whenever they run.
+        self.assertEqual(snapshot_daily_balances('2026-01-01')['written'], 1)
+        self.assertEqual(snapshot_daily_balances('2026-01-02')['written'], 1)
+        # Unchanged users get no new row.
+        self.assertEqual(snapshot_daily_balances('2026-01-03')['written'], 0)
+        self.assertFalse(idle.daily_balance_snapshots.exists())
+
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/withdrawal/balance/curve/', {'start': '2025-12-31', 'end': '2026-01-04'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        points = response.data['points']
+        self.assertEqual([point['date'] for point in points], [
+            '2025-12-31', '2026-01-01', '2026-01-02', '2026-01-03', '2026-01-04',
+        ])
+        self.assertEqual(
+            [point['withdrawable_balance'] for point in points],
+            ['0.00', '1000.00', '600.00', '600.00', '600.00'],
+        )
+        self.assertEqual(points[-1]['lifetime_withdrawn'], '400.00')
+
+    def test_snapshot_lifetime_totals_include_history_from_before_the_ledger(self):
+        with self.at('2026-01-01'):
+            user = UserProfile.objects.create_user(email='user@example.com', password='StrongPassword123')
+            GiftCardOrder.objects.create(user=user, type='E-Code', card=None, amount=1500, status='Approved')
+            Withdrawal.objects.create(user=user, amount=Decimal('500.00'), status='Completed')
+            # As migrated: the history is folded into one opening balance.
+            LedgerEntry.objects.filter(user=user).delete()
+            post_transaction(user.pk, {LedgerEntry.ACCOUNT_WITHDRAWABLE: Decimal('1000.00')}, source_type='opening')
+
+        snapshot_daily_balances('2026-01-01')
+
+        snapshot = user.daily_balance_snapshots.get()
+        self.assertEqual(
+            (snapshot.withdrawable_balance, snapshot.lifetime_approved, snapshot.lifetime_withdrawn),
+            (Decimal('1000.00'), Decimal('1500.00'), Decimal('500.00')),
+        )
+
+    def test_curve_rejects_inverted_range(self):
+        user = UserProfile.objects.create_user(email='user@example.com', password='StrongPassword123')
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get('/withdrawal/balance/curve/', {'start': '2026-02-01', 'end': '2026-01-01'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,7 @@
 from django.urls import path
 from .views import (
     UserBalanceView,
+    BalanceCurveView,
     WithdrawalListView,
     WithdrawalCreateView,
     WithdrawalDetailView,
@@ -12,6 +13,7 @@ app_name = 'withdrawal'
 urlpatterns = [
     # User endpoints
     path('balance/', UserBalanceView.as_view(), name='user-balance'),
+    path('balance/curve/', BalanceCurveView.as_view(), name='user-balance-curve'),
     path('requests/', WithdrawalListView.as_view(), name='withdrawal-list'),
     path('requests/create/', WithdrawalCreateView.as_view(), name='withdrawal-create'),
     path('requests/<int:pk>/', WithdrawalDetailView.as_view(), name='withdrawal-detail'),
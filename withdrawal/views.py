@@ -5,19 +5,23 @@ from rest_framework import serializers, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.db import transaction
-from drf_spectacular.utils import extend_schema, inline_serializer
+from django.utils.cache import get_conditional_response
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, inline_serializer, OpenApiParameter
 
-from account.models import UserProfile
 from .models import Withdrawal, WithdrawalAuditLog
 from .serializers import (
     WithdrawalCreateSerializer,
     WithdrawalListSerializer,
     WithdrawalDetailSerializer,
     UserBalanceSerializer,
+    BalanceCurveQuerySerializer,
+    BalanceCurvePointSerializer,
 )
-from order.signals import recalculate_user_balances
+from account.balances import get_balance_curve, get_balance_snapshot, get_user_balances
 from notification.services import notify_withdrawal_created
 from withdrawal.services import WithdrawalLimitService
+from gtx.idempotency import idempotent
 
 
 class UserBalanceView(APIView):
@@ -27,11 +31,53 @@ class UserBalanceView(APIView):
 
     @extend_schema(responses=UserBalanceSerializer)
     def get(self, request):
+        # Read-only: served from the versioned balance cache. Reconciliation
+        # happens on writes and in background checks, not here.
         user = request.user
-        recalculate_user_balances(user)
-        user.refresh_from_db(fields=['pending_balance', 'withdrawable_balance'])
-        serializer = UserBalanceSerializer(user)
-        return Response(serializer.data)
+        snapshot = get_balance_snapshot(user)
+        etag = f'"balance-{snapshot["balance_version"]}-{user.transaction_limit}"'
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = UserBalanceSerializer({**snapshot, 'transaction_limit': user.transaction_limit})
+        response = Response(serializer.data)
+        response['ETag'] = etag
+        return response
+
+
+class BalanceCurveView(APIView):
+    """Daily balance curve for the current user, built from nightly snapshots."""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('start', OpenApiTypes.DATE, description="First day. Defaults to 30 days before end."),
+            OpenApiParameter('end', OpenApiTypes.DATE, description="Last day. Defaults to today."),
+        ],
+        responses={
+            200: inline_serializer(
+                name="BalanceCurveResponse",
+                fields={
+                    "start": serializers.DateField(),
+                    "end": serializers.DateField(),
+                    "points": BalanceCurvePointSerializer(many=True),
+                },
+            )
+        },
+    )
+    def get(self, request):
+        query = BalanceCurveQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end = query.validated_data['start'], query.validated_data['end']
+
+        points = get_balance_curve(request.user, start, end)
+        return Response({
+            'start': start,
+            'end': end,
+            'points': BalanceCurvePointSerializer(points, many=True).data,
+        })
 
 
 class WithdrawalListView(ListAPIView):
@@ -48,14 +94,16 @@ class WithdrawalCreateView(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = WithdrawalCreateSerializer
 
+    @idempotent('withdrawal.create')
     @transaction.atomic
     def post(self, request):
         user = request.user
 
-        # Reconcile before validation so available amount is never stale.
-        recalculate_user_balances(user)
-        user = UserProfile.objects.select_for_update().get(pk=user.pk)
-        request.user.withdrawable_balance = user.withdrawable_balance
+        # Validate against the locked aggregate so the available amount is
+        # never stale, even while stored balances wait for the request to end.
+        # The aggregate lock also serializes concurrent withdrawals for this
+        # user without locking the UserProfile or Wallet rows.
+        _, withdrawable_balance = get_user_balances(user, for_update=True)
 
         # Check if user has a transaction PIN set
         if not user.has_pin:
@@ -71,15 +119,14 @@ class WithdrawalCreateView(APIView):
 
         serializer = self.serializer_class(
             data=request.data,
-            context={'request': request}
+            context={'request': request, 'withdrawable_balance': withdrawable_balance}
         )
         serializer.is_valid(raise_exception=True)
         WithdrawalLimitService.validate_withdrawal(user, serializer.validated_data['amount'])
         
         withdrawal = serializer.save()
         WithdrawalLimitService.refresh_usage_for_user(user)
-        recalculate_user_balances(user)
-        user.refresh_from_db(fields=['withdrawable_balance'])
+        _, withdrawable_balance = get_user_balances(user)
 
         notify_withdrawal_created(
             user=user,
@@ -101,7 +148,7 @@ class WithdrawalCreateView(APIView):
             'withdrawal_id': withdrawal.id,
             'amount': str(withdrawal.amount),
             'status': withdrawal.status,
-            'withdrawable_balance': str(user.withdrawable_balance),
+            'withdrawable_balance': str(withdrawable_balance),
         }, status=status.HTTP_201_CREATED)
 
 